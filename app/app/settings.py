@@ -100,6 +100,29 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+
+# locmem is only shared by the threads of one process, when running several
+# processes use a shared backend (e.g. FileBasedCache or RedisCache), so a write
+# in one process invalidates the responses cached by the others
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    }
+}
+
+# seconds a recipe, tag or ingredient response stays cached, responses are
+# invalidated as soon as the user's recipes, tags or ingredients change anyway
+RESPONSE_CACHE_TIMEOUT = 300
+
+# authors with more followers are merged into feeds when they are read rather
+# than added to the timeline of each follower, see recipe.feed
+FEED_FANOUT_LIMIT = 1000
+# recipes of a newly followed author added to the follower's timeline
+FEED_BACKFILL = 100
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -118,6 +141,23 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# passwords are hashed by the first hasher, the others verify the passwords
+# hashed before, which are rehashed by the first on the next login, see
+# users.hashers
+PASSWORD_HASHERS = [
+    "users.hashers.Argon2PasswordHasher",
+    "users.hashers.PBKDF2PasswordHasher",
+    "django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher",
+    "django.contrib.auth.hashers.ScryptPasswordHasher",
+]
+# argon2id costs, memory in KiB, the OWASP minimum rather than Django's
+# 100 MiB so many logins can hash at once
+PASSWORD_ARGON2_TIME_COST = 2
+PASSWORD_ARGON2_MEMORY_COST = 19 * 1024
+PASSWORD_ARGON2_PARALLELISM = 1
+# threads of a process hashing passwords, 0 to hash on the request thread
+PASSWORD_HASH_POOL_SIZE = 0
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/4.2/topics/i18n/
@@ -135,7 +175,7 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/4.2/howto/static-files/
 
 STATIC_URL = "static/"
-STATIC_TOOT = "/vol/web/static"
+STATIC_ROOT = "/vol/web/static"
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
@@ -153,14 +193,69 @@ AUTH_USER_MODEL = "users.CustomUser"
 #     "DEFAULT_PERMISSION_CLASSES": ("rest_framework.permissions.IsAuthenticated",),
 # }
 
+REST_FRAMEWORK = {
+    "DEFAULT_PAGINATION_CLASS": "recipe.pagination.RecipeCursorPagination",
+    # default number of items in a page of recipes, tags and ingredients,
+    # clients can ask for another size with the page_size query param
+    "PAGE_SIZE": 50,
+    # requests per second, min, hour or day, kept by users.throttling, None
+    # for no limit
+    "DEFAULT_THROTTLE_RATES": {
+        # token requests of an IP and for an email
+        "login": "30/min",
+        "login_email": "10/min",
+        "token_refresh": "60/min",
+        "signup": "10/min",
+        # writes of a user to the recipes, tags and ingredients
+        "recipe_write": None,
+    },
+}
+
+# the largest page size clients can ask for
+MAX_PAGE_SIZE = 200
+
+# the most items a bulk create, update or delete request can have
+BULK_MAX_ITEMS = 1000
+
+# recipes read, prefetched and written at a time by the export
+RECIPE_EXPORT_CHUNK_SIZE = 500
+# recipes inserted at a time by an import, each batch is a transaction
+RECIPE_IMPORT_BATCH_SIZE = 1000
+
+# completions of a tag or ingredient prefix, by default and at most
+AUTOCOMPLETE_LIMIT = 10
+AUTOCOMPLETE_MAX_LIMIT = 50
+# answer completions from a trie of the user's names kept in each process
+# rather than from the database, see recipe.autocomplete
+AUTOCOMPLETE_TRIE = True
+# the users whose tries a process keeps
+AUTOCOMPLETE_TRIE_USERS = 1000
+
+# recipes of a match of ingredients, by default, at most MAX_PAGE_SIZE
+RECIPE_MATCH_LIMIT = 20
+# the users whose ingredient indexes a process keeps, see recipe.matching
+RECIPE_MATCH_INDEX_USERS = 1000
+
+# similar recipes kept for each recipe, the most a client can ask for, and
+# the number returned by default, see recipe.similarity
+SIMILAR_RECIPES_K = 20
+SIMILAR_RECIPES_LIMIT = 10
+# the users whose similar recipes a process keeps
+SIMILAR_RECIPES_USERS = 100
+
 
 from datetime import timedelta
 
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(hours=1),
     "REFRESH_TOKEN_LIFETIME": timedelta(days=1),
+    "TOKEN_OBTAIN_SERIALIZER": "users.serializers.TokenObtainSerializer",
+    "TOKEN_REFRESH_SERIALIZER": "users.serializers.TokenRefreshWithRevokeSerializer",
 }
 
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = '/vol/web/media'
+# uploaded media are served by Django when DEBUG is on or this is set, in
+# production they are better served by a proxy in front of the app
+SERVE_MEDIA = False
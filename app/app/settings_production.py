@@ -0,0 +1,173 @@
+"""
+Production settings, read from the environment.
+
+Run with DJANGO_SETTINGS_MODULE=app.settings_production behind gunicorn (see
+gunicorn.conf.py) rather than with runserver. Unlike app.settings, DEBUG is
+off, so the SQL of each query isn't kept in connection.queries, and static
+files are served precompressed by WhiteNoise after collectstatic.
+"""
+
+import os
+
+from django.core.exceptions import ImproperlyConfigured
+
+from app.settings import *  # noqa: F401,F403
+from app.settings import (
+    MIDDLEWARE,
+    PASSWORD_HASHERS,
+    PASSWORD_ARGON2_TIME_COST,
+    PASSWORD_ARGON2_MEMORY_COST,
+    PASSWORD_ARGON2_PARALLELISM,
+    REST_FRAMEWORK,
+)
+
+
+def env_bool(name, default=False):
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return value.lower() in ("1", "true", "yes", "on")
+
+
+def env_list(name, default=""):
+    items = os.environ.get(name, default).split(",")
+    return [item.strip() for item in items if item.strip()]
+
+
+SECRET_KEY = os.environ.get("DJANGO_SECRET_KEY")
+if not SECRET_KEY:
+    raise ImproperlyConfigured("DJANGO_SECRET_KEY must be set in production")
+
+DEBUG = env_bool("DJANGO_DEBUG")
+
+ALLOWED_HOSTS = env_list("DJANGO_ALLOWED_HOSTS", "localhost,127.0.0.1")
+CSRF_TRUSTED_ORIGINS = env_list("DJANGO_CSRF_TRUSTED_ORIGINS")
+
+# "wsgi" for gunicorn's own workers, "asgi" for uvicorn workers, also read by
+# gunicorn.conf.py
+INTERFACE = os.environ.get("DJANGO_INTERFACE", "wsgi")
+
+
+# Database
+
+DATABASES = {
+    "default": {
+        "ENGINE": "django.db.backends.postgresql",
+        "NAME": os.environ.get("DB_NAME", "recipe_api"),
+        "USER": os.environ.get("DB_USER", "recipe_api_user"),
+        "PASSWORD": os.environ.get("DB_PASSWORD", ""),
+        "HOST": os.environ.get("DB_HOST", "db"),
+        "PORT": os.environ.get("DB_PORT", "5432"),
+        # keep the connection of a worker open across requests instead of
+        # connecting for each one. Under ASGI a connection belongs to the
+        # thread that ran the view and isn't reused, so it's closed at once
+        "CONN_MAX_AGE": int(
+            os.environ.get("DB_CONN_MAX_AGE", 600 if INTERFACE == "wsgi" else 0)
+        ),
+        # ping a kept connection before a request reuses it, so a restarted
+        # database costs a reconnect rather than a failed request
+        "CONN_HEALTH_CHECKS": True,
+    }
+}
+
+
+# Cache
+
+# the response cache and the revoked tokens must be seen by every worker
+# process, which the locmem cache of app.settings isn't
+if os.environ.get("REDIS_URL"):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.environ["REDIS_URL"],
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+            "LOCATION": os.environ.get("DJANGO_CACHE_DIR", "/vol/web/cache"),
+        }
+    }
+
+
+# Passwords
+
+# "argon2" or "pbkdf2", the hasher of new passwords, the passwords of the other
+# are rehashed on login
+PASSWORD_HASHER = os.environ.get("DJANGO_PASSWORD_HASHER", "argon2")
+if PASSWORD_HASHER not in ("argon2", "pbkdf2"):
+    raise ImproperlyConfigured("DJANGO_PASSWORD_HASHER must be argon2 or pbkdf2")
+PASSWORD_HASHERS = sorted(
+    PASSWORD_HASHERS,
+    key=lambda path: not path.lower().endswith(f".{PASSWORD_HASHER}passwordhasher"),
+)
+PASSWORD_ARGON2_TIME_COST = int(
+    os.environ.get("PASSWORD_ARGON2_TIME_COST", PASSWORD_ARGON2_TIME_COST)
+)
+PASSWORD_ARGON2_MEMORY_COST = int(
+    os.environ.get("PASSWORD_ARGON2_MEMORY_COST", PASSWORD_ARGON2_MEMORY_COST)
+)
+PASSWORD_ARGON2_PARALLELISM = int(
+    os.environ.get("PASSWORD_ARGON2_PARALLELISM", PASSWORD_ARGON2_PARALLELISM)
+)
+# a worker hashes on at most this many cores at once, keeping the others for
+# the other requests during a burst of logins
+PASSWORD_HASH_POOL_SIZE = int(os.environ.get("PASSWORD_HASH_POOL_SIZE", 0))
+
+
+# Static and media files
+
+STATIC_ROOT = os.environ.get("DJANGO_STATIC_ROOT", "/vol/web/static")
+MEDIA_ROOT = os.environ.get("DJANGO_MEDIA_ROOT", "/vol/web/media")
+
+MIDDLEWARE = MIDDLEWARE.copy()
+MIDDLEWARE.insert(
+    MIDDLEWARE.index("django.middleware.security.SecurityMiddleware") + 1,
+    "whitenoise.middleware.WhiteNoiseMiddleware",
+)
+
+STORAGES = {
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    # collectstatic writes hashed names and a gzip (and brotli, when installed)
+    # copy of each file, served with a far future expiry and without
+    # compressing them on each request
+    "staticfiles": {
+        "BACKEND": "whitenoise.storage.CompressedManifestStaticFilesStorage"
+    },
+}
+
+SERVE_MEDIA = env_bool("DJANGO_SERVE_MEDIA")
+
+
+# Security
+
+SECURE_PROXY_SSL_HEADER = ("HTTP_X_FORWARDED_PROTO", "https")
+SESSION_COOKIE_SECURE = env_bool("DJANGO_SECURE_COOKIES", True)
+CSRF_COOKIE_SECURE = SESSION_COOKIE_SECURE
+
+
+# Throttling
+
+# the proxies in front of the app, the client IP the logins are throttled by
+# is then read from X-Forwarded-For rather than being the proxy's
+if os.environ.get("DJANGO_NUM_PROXIES"):
+    REST_FRAMEWORK = {
+        **REST_FRAMEWORK,
+        "NUM_PROXIES": int(os.environ["DJANGO_NUM_PROXIES"]),
+    }
+
+
+# Logging
+
+# without DEBUG, Django only mails errors to the admins, log them to the
+# console where gunicorn collects them instead
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {"console": {"class": "logging.StreamHandler"}},
+    "root": {
+        "handlers": ["console"],
+        "level": os.environ.get("DJANGO_LOG_LEVEL", "WARNING"),
+    },
+}
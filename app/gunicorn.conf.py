@@ -0,0 +1,39 @@
+"""
+gunicorn settings, read from the environment like app.settings_production.
+
+Start the app with:
+
+    gunicorn -c gunicorn.conf.py
+"""
+
+import multiprocessing
+import os
+
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:8000")
+
+# the API mostly waits on the database, so a couple of workers per core keep
+# the cores busy while the others wait
+workers = int(os.environ.get("GUNICORN_WORKERS", multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get("GUNICORN_THREADS", 1))
+
+if os.environ.get("DJANGO_INTERFACE", "wsgi") == "asgi":
+    wsgi_app = "app.asgi:application"
+    worker_class = "uvicorn_worker.UvicornWorker"
+else:
+    wsgi_app = "app.wsgi:application"
+    worker_class = "gthread" if threads > 1 else "sync"
+
+# import the app once in the master, so a broken deploy fails at start and the
+# workers share its memory
+preload_app = True
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 30))
+graceful_timeout = 30
+keepalive = 5
+
+# restart a worker after that many requests, so a leak can't grow forever, the
+# jitter keeps the workers from restarting together
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", 1000))
+max_requests_jitter = max_requests // 10
+
+accesslog = "-"
+errorlog = "-"
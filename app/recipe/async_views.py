@@ -0,0 +1,121 @@
+'''Async variants of the recipe, tag and ingredient reads.
+
+DRF's views are synchronous, so under ASGI each request holds a thread for as
+long as it runs. These views are plain async Django views that authenticate,
+query and answer like their viewsets in recipe.views, sharing their
+querysets, paginators and serializers, but await the ORM, so one uvicorn
+worker can wait on many slow clients at once. Their responses are cached and
+validated by recipe.cache like the viewsets'.'''
+from django.http import Http404
+from django.views import View
+from rest_framework import exceptions
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.views import exception_handler
+from recipe import serializers
+from recipe.cache import acache_response
+from recipe.models import Tag, Ingredient, Recipe
+from recipe.pagination import RecipeCursorPagination, RecipeAttrCursorPagination
+from recipe.views import RecipeQueryMixin, RecipeAttrQueryMixin
+from users.authentication import StatelessJWTAuthentication
+
+
+class AsyncAPIView(View):
+    '''an async view answering like the DRF views: the user is authenticated
+    by a JWT, the data and the errors are rendered as JSON'''
+
+    authentication_class = StatelessJWTAuthentication
+    renderer_class = JSONRenderer
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.request = Request(request)
+        # rendered as JSON only, the etags of recipe.cache include the format
+        self.request.accepted_renderer = self.renderer_class()
+        self.request.accepted_media_type = self.renderer_class.media_type
+        self.authenticator = self.authentication_class()
+        try:
+            user_auth = await self.authenticator.aauthenticate(self.request)
+            if user_auth is None:
+                raise exceptions.NotAuthenticated()
+            self.request.user, self.request.auth = user_auth
+            response = await super().dispatch(self.request, *args, **kwargs)
+        except Exception as exc:
+            response = self.handle_exception(exc)
+        return self.finalize_response(response)
+
+    def handle_exception(self, exc):
+        if isinstance(
+            exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)
+        ):
+            # answered with a 401 and a WWW-Authenticate header, as DRF does
+            exc.auth_header = self.authenticator.authenticate_header(self.request)
+        response = exception_handler(exc, {"view": self, "request": self.request})
+        if response is None:
+            raise exc
+        return response
+
+    def finalize_response(self, response):
+        if isinstance(response, Response):
+            response.accepted_renderer = self.request.accepted_renderer
+            response.accepted_media_type = self.request.accepted_media_type
+            response.renderer_context = {
+                "view": self,
+                "request": self.request,
+                "response": response,
+            }
+        return response
+
+    def get_serializer_class(self):
+        return self.serializer_class
+
+    def get_serializer(self, *args, **kwargs):
+        kwargs["context"] = {"request": self.request, "view": self}
+        return self.get_serializer_class()(*args, **kwargs)
+
+
+class AsyncListView(AsyncAPIView):
+    '''a page of the queryset'''
+
+    action = "list"
+    detail = False
+    serializer_class = None
+    pagination_class = None
+
+    @acache_response
+    async def get(self, request, *args, **kwargs):
+        paginator = self.pagination_class()
+        page = await paginator.apaginate_queryset(self.get_queryset(), request, self)
+        serializer = self.get_serializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+
+class AsyncRecipeListView(RecipeQueryMixin, AsyncListView):
+    serializer_class = serializers.RecipeSerializer
+    pagination_class = RecipeCursorPagination
+
+
+class AsyncRecipeDetailView(RecipeQueryMixin, AsyncAPIView):
+    action = "retrieve"
+    detail = True
+    serializer_class = serializers.RecipeDetailSerializer
+
+    @acache_response
+    async def get(self, request, pk):
+        try:
+            recipe = await self.get_queryset().aget(pk=pk)
+        except Recipe.DoesNotExist:
+            raise Http404("No Recipe matches the given query.")
+        return Response(self.get_serializer(recipe).data)
+
+
+class AsyncTagListView(RecipeAttrQueryMixin, AsyncListView):
+    queryset = Tag.objects.all()
+    serializer_class = serializers.TagSerializer
+    pagination_class = RecipeAttrCursorPagination
+
+
+class AsyncIngredientListView(RecipeAttrQueryMixin, AsyncListView):
+    queryset = Ingredient.objects.all()
+    serializer_class = serializers.IngredientSerializer
+    pagination_class = RecipeAttrCursorPagination
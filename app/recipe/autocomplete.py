@@ -0,0 +1,87 @@
+'''Type-ahead over the names of a user's tags and ingredients.
+
+Completions are the user's objects whose name starts with a prefix, whatever
+its case, the most used first. They are read from the database by the
+lowercased name, which PostgreSQL finds with the text_pattern_ops index of
+migration 0012, or with AUTOCOMPLETE_TRIE from a trie of the user's names kept
+in each process. Each node of the trie keeps the best completions of its
+prefix, so a lookup walks the letters of the prefix and returns a list it
+already has.
+
+A trie is built from one query and kept in a recipe.cache.VersionedLRU, so a
+write in any process has it built again, the tries of the process are also
+dropped by recipe.signals as tags and ingredients are saved or deleted.'''
+from django.conf import settings
+from django.db.models.functions import Lower
+from recipe.cache import VersionedLRU
+
+
+def filter_prefix(queryset, prefix):
+    return queryset.annotate(name_lower=Lower("name")).filter(
+        name_lower__startswith=prefix.lower()
+    )
+
+
+def query_completions(model, user_id, prefix, limit):
+    queryset = filter_prefix(model.objects.filter(user_id=user_id), prefix)
+    return list(
+        queryset.order_by("-recipe_count", "name_lower", "id").values("name", "id")[
+            :limit
+        ]
+    )
+
+
+class TrieNode:
+    __slots__ = ("children", "best")
+
+    def __init__(self):
+        self.children = {}
+        self.best = []
+
+
+class Trie:
+    '''the names of objects, each node with the first size completions of its
+    prefix in the order of query_completions'''
+
+    def __init__(self, objects, size):
+        self.root = TrieNode()
+        # inserted best first, so each node keeps the first it sees
+        ranked = sorted(objects, key=lambda obj: (-obj[2], obj[1].lower(), obj[0]))
+        for pk, name, count in ranked:
+            completion = {"name": name, "id": pk}
+            nodes = [self.root]
+            for letter in name.lower():
+                nodes.append(nodes[-1].children.setdefault(letter, TrieNode()))
+            for node in nodes:
+                if len(node.best) < size:
+                    node.best.append(completion)
+
+    def complete(self, prefix, limit):
+        node = self.root
+        for letter in prefix.lower():
+            node = node.children.get(letter)
+            if node is None:
+                return []
+        return node.best[:limit]
+
+
+def build_trie(previous, user_id, model):
+    return Trie(
+        model.objects.filter(user_id=user_id).values_list("id", "name", "recipe_count"),
+        settings.AUTOCOMPLETE_MAX_LIMIT,
+    )
+
+
+_tries = VersionedLRU(build_trie, "AUTOCOMPLETE_TRIE_USERS")
+
+
+def invalidate(model, user_id):
+    _tries.invalidate(user_id, model)
+
+
+def complete(model, user_id, prefix, limit):
+    '''the names and ids of the user's objects starting with the prefix, the
+    ones with the most recipes first'''
+    if settings.AUTOCOMPLETE_TRIE:
+        return _tries.get(user_id, model).complete(prefix, limit)
+    return query_completions(model, user_id, prefix, limit)
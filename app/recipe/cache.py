@@ -0,0 +1,210 @@
+from collections import OrderedDict
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from rest_framework.response import Response
+import functools
+import hashlib
+import threading
+import time
+
+
+def version_key(user_id):
+    return f"recipe:version:{user_id}"
+
+
+def get_version(user_id):
+    '''the version of a user's recipes, tags and ingredients, responses are
+    cached under it, so bumping it invalidates all of them at once'''
+    version = cache.get(version_key(user_id))
+    if version is None:
+        # start from the time rather than from 1, so a version evicted from the
+        # cache doesn't start over and find responses cached before it
+        version = time.time_ns()
+        if not cache.add(version_key(user_id), version, timeout=None):
+            version = cache.get(version_key(user_id))
+    return version
+
+
+async def aget_version(user_id):
+    version = await cache.aget(version_key(user_id))
+    if version is None:
+        version = time.time_ns()
+        if not await cache.aadd(version_key(user_id), version, timeout=None):
+            version = await cache.aget(version_key(user_id))
+    return version
+
+
+def bump_version(user_id):
+    try:
+        cache.incr(version_key(user_id))
+    except ValueError:
+        cache.set(version_key(user_id), time.time_ns(), timeout=None)
+
+
+def invalidate_responses(user_id):
+    '''drop the cached responses of a user after a write'''
+    bump_version(user_id)
+    # requests running before a write in a transaction is committed still read
+    # the old rows, so the version is bumped again once it's committed
+    transaction.on_commit(lambda: bump_version(user_id))
+
+
+class VersionedLRU:
+    '''values built from a user's data, kept in the process along with the
+    version of the data, e.g. the tries of recipe.autocomplete. A lookup
+    finding another version builds the value again with
+    build(previous, user_id, *args), previous being the outdated value or
+    None, and the least recently used values past the size_setting are
+    dropped'''
+
+    def __init__(self, build, size_setting):
+        self.build = build
+        self.size_setting = size_setting
+        self.values = OrderedDict()
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.values)
+
+    def get(self, user_id, *args):
+        key = (user_id, *args)
+        # read before the data, so a write while it's read is seen next time
+        version = get_version(user_id)
+        with self.lock:
+            cached = self.values.get(key)
+            if cached is not None and cached[0] == version:
+                self.values.move_to_end(key)
+                return cached[1]
+        value = self.build(None if cached is None else cached[1], user_id, *args)
+        with self.lock:
+            self.values[key] = (version, value)
+            self.values.move_to_end(key)
+            while len(self.values) > getattr(settings, self.size_setting):
+                self.values.popitem(last=False)
+        return value
+
+    def invalidate(self, user_id, *args):
+        with self.lock:
+            self.values.pop((user_id, *args), None)
+
+
+def touch_updated_at(model, pks):
+    '''mark rows as updated for the etags, e.g. after writes that skip
+    auto_now like update() and bulk_update()'''
+    model.objects.filter(pk__in=pks).update(updated_at=timezone.now())
+
+
+def make_etag(request, count, latest):
+    '''a strong etag of a response, built from the number and the last update
+    of the rows it's rendered from rather than from the rendered body'''
+    stamp = ":".join(
+        [
+            str(request.user.id),
+            request.accepted_renderer.format,
+            request.get_full_path(),
+            str(count),
+            latest.isoformat() if latest else "",
+        ]
+    )
+    return f'"{hashlib.md5(stamp.encode()).hexdigest()}"'
+
+
+def set_validators(response, etag, last_modified):
+    response["ETag"] = etag
+    if last_modified:
+        response["Last-Modified"] = http_date(last_modified.timestamp())
+    return response
+
+
+def response_key(request, version):
+    path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+    return f"recipe:response:{request.user.id}:{version}:{path}"
+
+
+def get_validators(view, request, cached, stamp):
+    '''the etag and last modified time of a response, from its cached entry or
+    else from the change stamp of the view'''
+    if cached is not None:
+        etag, last_modified, data = cached
+        return etag, last_modified
+    count, latest = stamp
+    return make_etag(request, count, latest), latest if view.detail else None
+
+
+def get_shortcut_response(request, cached, etag, last_modified):
+    '''a 304 when the client's copy is current, or else the cached response,
+    None when the response has to be built'''
+    not_modified = get_conditional_response(
+        request,
+        etag=etag,
+        last_modified=last_modified and int(last_modified.timestamp()),
+    )
+    if not_modified is not None:
+        return set_validators(not_modified, etag, last_modified)
+    if cached is not None:
+        return set_validators(Response(cached[2]), etag, last_modified)
+    return None
+
+
+def cache_response(method):
+    '''cache the data of a successful response per user and url, until the
+    user's version is bumped by recipe.signals, and answer conditional GETs
+
+    The view provides get_change_stamp(), returning the number and the latest
+    update time of the rows the response is rendered from, the etag is built
+    from them, so a client's copy is validated with one aggregate query, or
+    none when it's cached. Only detail responses get a Last-Modified, a list
+    can change by a row being deleted, which no update time tells.'''
+
+    @functools.wraps(method)
+    def wrapper(self, request, *args, **kwargs):
+        # the version is read before the response is built, so data read
+        # while it's being bumped is cached under the version it's replaced by
+        key = response_key(request, get_version(request.user.id))
+        cached = cache.get(key)
+        stamp = self.get_change_stamp() if cached is None else None
+        etag, last_modified = get_validators(self, request, cached, stamp)
+        response = get_shortcut_response(request, cached, etag, last_modified)
+        if response is not None:
+            return response
+        response = method(self, request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(
+                key,
+                (etag, last_modified, response.data),
+                settings.RESPONSE_CACHE_TIMEOUT,
+            )
+            set_validators(response, etag, last_modified)
+        return response
+
+    return wrapper
+
+
+def acache_response(method):
+    '''cache_response for the async views, whose aget_change_stamp() is
+    awaited'''
+
+    @functools.wraps(method)
+    async def wrapper(self, request, *args, **kwargs):
+        key = response_key(request, await aget_version(request.user.id))
+        cached = await cache.aget(key)
+        stamp = await self.aget_change_stamp() if cached is None else None
+        etag, last_modified = get_validators(self, request, cached, stamp)
+        response = get_shortcut_response(request, cached, etag, last_modified)
+        if response is not None:
+            return response
+        response = await method(self, request, *args, **kwargs)
+        if response.status_code == 200:
+            await cache.aset(
+                key,
+                (etag, last_modified, response.data),
+                settings.RESPONSE_CACHE_TIMEOUT,
+            )
+            set_validators(response, etag, last_modified)
+        return response
+
+    return wrapper
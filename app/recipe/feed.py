@@ -0,0 +1,90 @@
+'''Feeds of the recipes of the users one follows.
+
+Recipes are fanned out on write: a new recipe is added to the timeline of each
+follower of its author, so a feed page is a range scan of the reader's
+TimelineEntry rows. Authors with more than FEED_FANOUT_LIMIT followers are
+flagged fanout_on_read instead, their recipes stay out of the timelines and
+are merged into the page when the feed is read, again from an index on
+(user, id).'''
+from collections import defaultdict
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from recipe.models import Recipe, TimelineEntry
+
+
+def get_follow_model():
+    return get_user_model().following.through
+
+
+def fan_out(recipes):
+    '''add new recipes to the timelines of their authors' followers, unless
+    the authors are fanned out on read'''
+    recipes_by_author = defaultdict(list)
+    for recipe in recipes:
+        recipes_by_author[recipe.user_id].append(recipe.id)
+    follows = get_follow_model().objects.filter(
+        to_customuser_id__in=recipes_by_author,
+        to_customuser__fanout_on_read=False,
+    ).values_list("to_customuser_id", "from_customuser_id")
+    TimelineEntry.objects.bulk_create(
+        (
+            TimelineEntry(user_id=follower_id, recipe_id=recipe_id)
+            for author_id, follower_id in follows.iterator()
+            for recipe_id in recipes_by_author[author_id]
+        ),
+        batch_size=1000,
+        ignore_conflicts=True,
+    )
+
+
+def follow(follower_id, author_ids):
+    '''add the latest recipes of newly followed authors to the follower's
+    timeline, and switch authors who got too many followers to fan-out on
+    read'''
+    authors = get_user_model().objects.filter(id__in=author_ids)
+    for author_id in authors.filter(fanout_on_read=False).values_list(
+        "id", flat=True
+    ):
+        recipe_ids = Recipe.objects.filter(user_id=author_id).order_by(
+            "-id"
+        ).values_list("id", flat=True)[: settings.FEED_BACKFILL]
+        TimelineEntry.objects.bulk_create(
+            (
+                TimelineEntry(user_id=follower_id, recipe_id=recipe_id)
+                for recipe_id in recipe_ids
+            ),
+            ignore_conflicts=True,
+        )
+    # for good, the recipes the followers got stay in their timelines; the
+    # new follows are counted by users.signals, connected before these
+    authors.filter(
+        fanout_on_read=False, followers_count__gt=settings.FEED_FANOUT_LIMIT
+    ).update(fanout_on_read=True)
+
+
+def unfollow(follower_id, author_ids):
+    '''drop the recipes of the authors from the follower's timeline'''
+    TimelineEntry.objects.filter(
+        user_id=follower_id, recipe__user_id__in=author_ids
+    ).delete()
+
+
+def get_feed(user_id, limit, before=None):
+    '''the latest recipes of the authors the user follows, newest first, or
+    those before the recipe with the id before'''
+    pushed = Recipe.objects.filter(timeline_entries__user_id=user_id)
+    pulled = Recipe.objects.filter(
+        user__followers=user_id, user__fanout_on_read=True
+    )
+    recipes = {}
+    for queryset in (pushed, pulled):
+        queryset = queryset.defer("search_vector").order_by("-id")
+        if before is not None:
+            queryset = queryset.filter(id__lt=before)
+        # a recipe fanned out before its author was switched to fan-out on
+        # read is in both
+        for recipe in queryset[:limit]:
+            recipes.setdefault(recipe.id, recipe)
+    return sorted(recipes.values(), key=lambda recipe: recipe.id, reverse=True)[
+        :limit
+    ]
@@ -0,0 +1,121 @@
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+from PIL import Image, ImageOps
+from recipe.models import Recipe
+from recipe.cache import invalidate_responses
+from io import BytesIO
+import hashlib
+import os
+
+# the largest size of each rendition of a recipe image, every rendition is
+# stored in the format of the uploaded image and as WebP
+RENDITIONS = {
+    "thumb": (150, 150),
+    "card": (300, 300),
+    "full": (1200, 1200),
+}
+
+
+def content_hash(file):
+    sha256 = hashlib.sha256()
+    for chunk in file.chunks():
+        sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def image_directory(digest):
+    '''images are stored in a directory named after the hash of their content,
+    so identical uploads share the same files'''
+    return os.path.join("uploads/recipe/", digest[:2], digest)
+
+
+def rendition_names(image_name):
+    '''storage names of the renditions of a stored image by size and format,
+    e.g. {"thumb": {"jpg": ..., "webp": ...}, ...}'''
+    directory, original = os.path.split(image_name)
+    ext = os.path.splitext(original)[1].lower().lstrip(".")
+    return {
+        size: {
+            format: os.path.join(directory, f"{size}.{format}")
+            for format in (ext, "webp")
+        }
+        for size in RENDITIONS
+    }
+
+
+def save_file(name, content):
+    # a leftover of an interrupted run is overwritten instead of being saved
+    # under another name
+    if default_storage.exists(name):
+        default_storage.delete(name)
+    default_storage.save(name, ContentFile(content))
+
+
+def store_image(image):
+    '''store the uploaded image and its renditions in the directory of its
+    hash, unless an identical image is stored already, and return the name of
+    the stored original'''
+    with image.open("rb"):
+        digest = content_hash(image)
+    ext = os.path.splitext(image.name)[1].lower()
+    name = os.path.join(image_directory(digest), f"original{ext}")
+    if default_storage.exists(name):
+        return name
+    with image.open("rb"), Image.open(image) as img:
+        img_format = img.format
+        img = ImageOps.exif_transpose(img)
+        for size, formats in rendition_names(name).items():
+            rendition = img.copy()
+            rendition.thumbnail(RENDITIONS[size])
+            for ext, rendition_name in formats.items():
+                buffer = BytesIO()
+                rendition.save(buffer, "WEBP" if ext == "webp" else img_format)
+                save_file(rendition_name, buffer.getvalue())
+        # the original is stored last, so it only exists once all of its
+        # renditions have been created
+        image.seek(0)
+        save_file(name, image.read())
+    return name
+
+
+def process_recipe_image(recipe):
+    '''store the image of a recipe with its renditions and mark it as ready,
+    or as failed when the file is not an image that can be processed'''
+    uploaded_name = recipe.image.name
+    try:
+        name = store_image(recipe.image)
+    except (OSError, ValueError, Image.DecompressionBombError):
+        Recipe.objects.filter(pk=recipe.pk, image=uploaded_name).update(
+            image_status=Recipe.ImageStatus.FAILED, updated_at=timezone.now()
+        )
+        invalidate_responses(recipe.user_id)
+        return Recipe.ImageStatus.FAILED
+    # only mark the image that was processed, if another one has been uploaded
+    # in the meantime it's still waiting to be processed
+    Recipe.objects.filter(pk=recipe.pk, image=uploaded_name).update(
+        image=name, image_status=Recipe.ImageStatus.READY, updated_at=timezone.now()
+    )
+    # update() sends no post_save and skips auto_now, so the cached responses
+    # are invalidated here
+    invalidate_responses(recipe.user_id)
+    if uploaded_name != name:
+        default_storage.delete(uploaded_name)
+    return Recipe.ImageStatus.READY
+
+
+def process_pending_images(batch_size=10):
+    '''process a batch of the images waiting to be processed and return how
+    many were processed, workers running at the same time skip the recipes
+    locked by each other'''
+    with transaction.atomic():
+        recipes = list(
+            Recipe.objects.select_for_update(skip_locked=True)
+            .filter(image_status=Recipe.ImageStatus.PROCESSING)
+            .only("id", "image", "user_id")
+            .order_by("id")[:batch_size]
+        )
+        for recipe in recipes:
+            process_recipe_image(recipe)
+    return len(recipes)
@@ -0,0 +1,204 @@
+'''Streaming imports of recipe datasets, run by the import_recipes command and
+the import action of RecipeViewSet.
+
+The rows are read one at a time from NDJSON, the format of the export, or from
+CSV, whose tags and ingredients columns are names separated by "|". They are
+validated and inserted a batch at a time with bulk_create. Tag and ingredient
+names are resolved through maps of the user's names to ids, loaded once and
+completed with the names each batch creates. The number of rows done is saved
+in a RecipeImport checkpoint in the transaction of each batch, so an import
+run again with the same key carries on after the last batch it committed. The
+key is the hash of the file's content unless given, so only the same file
+carries on or is reported as already imported, and a fixed file carries on
+from where the broken one stopped when given the key of the first import.'''
+from django.conf import settings
+from django.db import transaction
+from django.db.models.functions import Lower
+from rest_framework.exceptions import ValidationError
+from rest_framework.settings import api_settings
+from recipe.cache import invalidate_responses
+from recipe.feed import fan_out
+from recipe.models import Tag, Ingredient, Recipe, RecipeImport
+from recipe.search import update_search_index
+from recipe.serializers import RecipeImportSerializer
+import csv
+import gzip
+import hashlib
+import itertools
+import json
+import time
+import zlib
+
+NAME_SEPARATOR = "|"
+# bytes of a file hashed at a time
+HASH_CHUNK_SIZE = 64 * 1024
+
+
+def read_ndjson(lines):
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            yield number, json.loads(line)
+        except ValueError as e:
+            raise ValidationError(
+                {number: {api_settings.NON_FIELD_ERRORS_KEY: [f"Invalid JSON: {e}"]}}
+            )
+
+
+def read_csv(lines):
+    reader = csv.DictReader(lines)
+    for row in reader:
+        # cells missing from a short row are None
+        row = {k: v for k, v in row.items() if k is not None and v is not None}
+        for field in ("tags", "ingredients"):
+            if field in row:
+                row[field] = [
+                    name.strip()
+                    for name in row[field].split(NAME_SEPARATOR)
+                    if name.strip()
+                ]
+        yield reader.line_num, row
+
+
+def content_key(file):
+    '''the default key of the import of a binary file, the hash of its
+    content, the file is read from its start again after'''
+    sha256 = hashlib.sha256()
+    file.seek(0)
+    while chunk := file.read(HASH_CHUNK_SIZE):
+        sha256.update(chunk)
+    file.seek(0)
+    return f"sha256:{sha256.hexdigest()}"
+
+
+def read_rows(file, name, format=None):
+    '''the line numbers and rows of a binary file of recipes, the format is
+    told by the name unless given, which can also end with .gz'''
+    if name.endswith(".gz"):
+        file = gzip.GzipFile(fileobj=file)
+        name = name[: -len(".gz")]
+    if format is None:
+        format = "csv" if name.endswith(".csv") else "ndjson"
+    lines = decode_lines(file)
+    return read_csv(lines) if format == "csv" else read_ndjson(lines)
+
+
+def decode_lines(file):
+    '''the lines of a binary file decoded from UTF-8 one at a time, so a line
+    that can't be read or decoded, or a corrupt gzip, raises a ValidationError
+    with its number'''
+    lines = iter(file)
+    for number in itertools.count(1):
+        try:
+            line = next(lines, None)
+            if line is None:
+                return
+            line = line.decode("utf-8-sig" if number == 1 else "utf-8")
+        except (UnicodeDecodeError, OSError, EOFError, zlib.error) as e:
+            raise ValidationError(
+                {number: {api_settings.NON_FIELD_ERRORS_KEY: [f"Unreadable line: {e}"]}}
+            )
+        yield line
+
+
+def validate(batch):
+    '''the validated rows of a batch, with a serializer of many, which builds
+    its fields once rather than once a row'''
+    serializer = RecipeImportSerializer(data=[row for number, row in batch], many=True)
+    if not serializer.is_valid():
+        # the shape of the errors of many depends on the DRF version, the
+        # rows are validated again one at a time to find the first invalid
+        for number, row in batch:
+            serializer = RecipeImportSerializer(data=row)
+            if not serializer.is_valid():
+                raise ValidationError({number: serializer.errors})
+    return serializer.validated_data
+
+
+def load_names(model, user_id):
+    return dict(
+        model.objects.filter(user_id=user_id)
+        .annotate(name_lower=Lower("name"))
+        .values_list("name_lower", "id")
+    )
+
+
+def resolve_names(model, user_id, names, ids):
+    '''the ids of the names, creating the ones not in the ids map yet, which
+    is keyed by the names lowercased by the database like load_names'''
+    keys = model.objects.lower_names(names)
+    missing = [name for name in names if keys[name] not in ids]
+    if missing:
+        objs = model.objects.get_or_create_many(user_id, missing)
+        for name, obj in zip(missing, objs):
+            ids[keys[name]] = obj.id
+    return [ids[keys[name]] for name in names]
+
+
+def insert_batch(user_id, items, name_ids):
+    recipes = Recipe.objects.bulk_create(
+        Recipe(
+            user_id=user_id,
+            **{k: v for k, v in item.items() if k not in ("tags", "ingredients")},
+        )
+        for item in items
+    )
+    for field, model in (("tags", Tag), ("ingredients", Ingredient)):
+        names = [name for item in items for name in item.get(field, [])]
+        ids = iter(resolve_names(model, user_id, names, name_ids[model]))
+        pks = [[next(ids) for name in item.get(field, [])] for item in items]
+        through = getattr(Recipe, field).through
+        fk = f"{model._meta.model_name}_id"
+        through.objects.bulk_create(
+            through(recipe_id=recipe.id, **{fk: pk})
+            for recipe, recipe_pks in zip(recipes, pks)
+            for pk in dict.fromkeys(recipe_pks)
+        )
+        model.objects.update_recipe_counts(
+            {pk for recipe_pks in pks for pk in recipe_pks}
+        )
+    # bulk_create sends no signals
+    update_search_index(recipe.id for recipe in recipes)
+    fan_out(recipes)
+    invalidate_responses(user_id)
+
+
+def import_recipes(user_id, rows, key, batch_size=None, restart=False, progress=None):
+    '''insert the recipes of the rows for the user, a batch per transaction,
+    skipping the rows an earlier import with the key committed, and call
+    progress(rows, seconds) after each batch. Raises a ValidationError for
+    the first invalid row, the rows of the batches before it are kept. An
+    import whose key already finished imports nothing and is reported as
+    already_imported.'''
+    batch_size = batch_size or settings.RECIPE_IMPORT_BATCH_SIZE
+    checkpoint, _ = RecipeImport.objects.get_or_create(user_id=user_id, key=key)
+    if restart:
+        checkpoint.rows, checkpoint.finished = 0, False
+    resumed_from = checkpoint.rows
+    already_imported = checkpoint.finished
+    imported = 0
+    start = time.perf_counter()
+    if not checkpoint.finished:
+        name_ids = {model: load_names(model, user_id) for model in (Tag, Ingredient)}
+        rows = itertools.islice(rows, resumed_from, None)
+        while batch := list(itertools.islice(rows, batch_size)):
+            items = validate(batch)
+            with transaction.atomic():
+                insert_batch(user_id, items, name_ids)
+                checkpoint.rows += len(items)
+                checkpoint.save()
+            imported += len(items)
+            if progress is not None:
+                progress(imported, time.perf_counter() - start)
+        checkpoint.finished = True
+        checkpoint.save()
+    seconds = time.perf_counter() - start
+    return {
+        "key": key,
+        "imported": imported,
+        "resumed_from": resumed_from,
+        "seconds": round(seconds, 3),
+        "rows_per_second": round(imported / seconds, 1) if imported else 0,
+        "already_imported": already_imported,
+    }
@@ -0,0 +1,127 @@
+from concurrent.futures import ThreadPoolExecutor
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from recipe.management.commands.benchmark_recipe_filters import BENCHMARK_EMAIL
+from users.serializers import TokenObtainSerializer
+from urllib.error import HTTPError, URLError
+from urllib.parse import urljoin
+from urllib.request import Request, urlopen
+import itertools
+import json
+import statistics
+import time
+
+DEFAULT_PATHS = ["/api/recipe/recipes/", "/api/recipe/tags/", "/api/auth/me/"]
+
+
+class Command(BaseCommand):
+    '''Django command to load a running server with concurrent API requests
+    and print its throughput and latencies, to compare ways of serving the
+    app, e.g. runserver with app.settings against gunicorn with
+    app.settings_production'''
+
+    def add_arguments(self, parser):
+        parser.add_argument("--url", default="http://127.0.0.1:8000")
+        parser.add_argument(
+            "--path",
+            action="append",
+            dest="paths",
+            help=f"path to request, can be repeated, by default {DEFAULT_PATHS}",
+        )
+        parser.add_argument("--requests", type=int, default=2000)
+        parser.add_argument("--concurrency", type=int, default=16)
+        parser.add_argument(
+            "--warmup",
+            type=int,
+            default=50,
+            help="requests sent before timing, to open connections and fill caches",
+        )
+        parser.add_argument(
+            "--email",
+            help="sign in as this user through the API, by default a token of "
+            "the benchmark user is made with the local settings, which must "
+            "then share the server's SECRET_KEY",
+        )
+        parser.add_argument("--password")
+        parser.add_argument("--timeout", type=float, default=30)
+        parser.add_argument(
+            "--min-rps",
+            type=float,
+            help="fail when the server answers fewer requests per second",
+        )
+
+    def handle(self, *args, **options):
+        paths = options["paths"] or DEFAULT_PATHS
+        urls = [urljoin(options["url"], path) for path in paths]
+        headers = {"Authorization": f"Bearer {self.get_token(options)}"}
+
+        def fetch(url):
+            start = time.perf_counter()
+            try:
+                with urlopen(
+                    Request(url, headers=headers), timeout=options["timeout"]
+                ) as response:
+                    response.read()
+                    status = response.status
+            except HTTPError as e:
+                status = e.code
+            except (URLError, OSError):
+                status = None
+            return url, status, time.perf_counter() - start
+
+        requests = itertools.cycle(urls)
+        with ThreadPoolExecutor(options["concurrency"]) as pool:
+            warmup = list(
+                pool.map(fetch, itertools.islice(requests, options["warmup"]))
+            )
+            if warmup and all(status is None for url, status, t in warmup):
+                raise CommandError(f"{options['url']} can't be reached")
+            start = time.perf_counter()
+            results = list(
+                pool.map(fetch, itertools.islice(requests, options["requests"]))
+            )
+            elapsed = time.perf_counter() - start
+
+        for url in urls:
+            self.report(url, [r for r in results if r[0] == url])
+        self.report("all", results)
+        rps = len(results) / elapsed
+        self.stdout.write(
+            f"{len(results)} requests in {elapsed:.2f}s with "
+            f"{options['concurrency']} clients: {rps:.1f} req/s"
+        )
+        if options["min_rps"] is not None and rps < options["min_rps"]:
+            raise CommandError(f"{rps:.1f} req/s is below {options['min_rps']}")
+
+    def get_token(self, options):
+        if options["email"]:
+            request = Request(
+                urljoin(options["url"], "/api/auth/token/"),
+                data=json.dumps(
+                    {"email": options["email"], "password": options["password"]}
+                ).encode(),
+                headers={"Content-Type": "application/json"},
+            )
+            try:
+                with urlopen(request, timeout=options["timeout"]) as response:
+                    return json.load(response)["access"]
+            except (HTTPError, URLError) as e:
+                raise CommandError(f"Couldn't sign in as {options['email']}: {e}")
+        User = get_user_model()
+        user = User.objects.filter(email=BENCHMARK_EMAIL).first()
+        if user is None:
+            # without a password, nobody can sign in as the benchmark user
+            user = User.objects.create_user(email=BENCHMARK_EMAIL)
+        return str(TokenObtainSerializer.get_token(user).access_token)
+
+    def report(self, name, results):
+        if not results:
+            return
+        times = sorted(t * 1000 for url, status, t in results)
+        errors = sum(1 for url, status, t in results if status != 200)
+        percentiles = statistics.quantiles(times, n=100, method="inclusive")
+        self.stdout.write(
+            f"{name}: {len(results)} requests, {errors} errors, "
+            f"p50 {percentiles[49]:.1f} ms, p95 {percentiles[94]:.1f} ms, "
+            f"p99 {percentiles[98]:.1f} ms, max {times[-1]:.1f} ms"
+        )
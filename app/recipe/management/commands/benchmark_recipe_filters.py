@@ -0,0 +1,170 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from recipe.models import Tag, Ingredient, Recipe, RecipeTag, RecipeIngredient
+import random
+import statistics
+import time
+
+BENCHMARK_EMAIL = "benchmark@recipe.invalid"
+
+
+class Command(BaseCommand):
+    '''Django command to time the recipe list filtered by tags and ingredients
+    on a large synthetic dataset and print the query plans'''
+
+    def add_arguments(self, parser):
+        parser.add_argument("--recipes", type=int, default=100_000)
+        parser.add_argument("--tags", type=int, default=200)
+        parser.add_argument("--ingredients", type=int, default=1000)
+        parser.add_argument(
+            "--per-recipe",
+            type=int,
+            default=5,
+            help="tags and ingredients of each recipe",
+        )
+        parser.add_argument(
+            "--filter-ids",
+            type=int,
+            default=3,
+            help="tag and ingredient ids of each filter",
+        )
+        parser.add_argument("--runs", type=int, default=20)
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--max-ms",
+            type=float,
+            help="fail when the median time of a filter exceeds it",
+        )
+        parser.add_argument(
+            "--analyze",
+            action="store_true",
+            help="run the queries for their plans, PostgreSQL only",
+        )
+        parser.add_argument(
+            "--flush",
+            action="store_true",
+            help="delete the benchmark data instead of timing",
+        )
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        if options["flush"]:
+            User.objects.filter(email=BENCHMARK_EMAIL).delete()
+            self.stdout.write(self.style.SUCCESS("Benchmark data deleted"))
+            return
+        user = User.objects.filter(email=BENCHMARK_EMAIL).first()
+        if user is None:
+            # without a password, nobody can sign in as the benchmark user
+            user = User.objects.create_user(email=BENCHMARK_EMAIL)
+        if not Recipe.objects.filter(user=user).exists():
+            self.seed(user, random.Random(options["seed"]), options)
+        else:
+            self.stdout.write("Reusing the recipes seeded before")
+        rng = random.Random(options["seed"])
+        tag_ids = list(Tag.objects.filter(user=user).values_list("id", flat=True))
+        ingredient_ids = list(
+            Ingredient.objects.filter(user=user).values_list("id", flat=True)
+        )
+        count = options["filter_ids"]
+        filters = {
+            "tags": {"tags": rng.sample(tag_ids, min(count, len(tag_ids)))},
+            "ingredients": {
+                "ingredients": rng.sample(
+                    ingredient_ids, min(count, len(ingredient_ids))
+                )
+            },
+        }
+        filters["tags+ingredients"] = {**filters["tags"], **filters["ingredients"]}
+
+        slow = []
+        for name, ids in filters.items():
+            queryset = self.get_queryset(user, ids)
+            self.stdout.write(f"\n== {name} {ids}")
+            self.stdout.write(self.explain(queryset, options["analyze"]))
+            timings = self.time(queryset, options["runs"])
+            median = statistics.median(timings)
+            p95 = timings[max(0, round(len(timings) * 0.95) - 1)]
+            self.stdout.write(
+                f"{name}: median {median:.2f} ms, p95 {p95:.2f} ms, "
+                f"max {timings[-1]:.2f} ms over {len(timings)} runs"
+            )
+            if options["max_ms"] is not None and median > options["max_ms"]:
+                slow.append(name)
+        if slow:
+            raise CommandError(
+                f"median over {options['max_ms']} ms: {', '.join(slow)}"
+            )
+
+    def get_queryset(self, user, ids):
+        '''the first page of the recipe list, as RecipeViewSet queries it'''
+        queryset = Recipe.objects.all()
+        if "tags" in ids:
+            queryset = queryset.with_any_tags(ids["tags"])
+        if "ingredients" in ids:
+            queryset = queryset.with_any_ingredients(ids["ingredients"])
+        page_size = settings.REST_FRAMEWORK["PAGE_SIZE"]
+        # cursor pagination reads one more row to know there is a next page
+        return queryset.filter(user_id=user.id).order_by("id")[: page_size + 1]
+
+    def explain(self, queryset, analyze):
+        if analyze and connection.vendor == "postgresql":
+            return queryset.explain(analyze=True, buffers=True)
+        return queryset.explain()
+
+    def time(self, queryset, runs):
+        '''sorted times of the query in milliseconds'''
+        timings = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            list(queryset.all())
+            timings.append((time.perf_counter() - start) * 1000)
+        return sorted(timings)
+
+    def seed(self, user, rng, options):
+        self.stdout.write(f"Seeding {options['recipes']} recipes ...")
+        start = time.perf_counter()
+        batch_size = options["batch_size"]
+        per_recipe = options["per_recipe"]
+        with transaction.atomic():
+            tags = Tag.objects.bulk_create(
+                Tag(user=user, name=f"tag{i}") for i in range(options["tags"])
+            )
+            ingredients = Ingredient.objects.bulk_create(
+                Ingredient(user=user, name=f"ingredient{i}")
+                for i in range(options["ingredients"])
+            )
+            tag_ids = [tag.id for tag in tags]
+            ingredient_ids = [ingredient.id for ingredient in ingredients]
+            for offset in range(0, options["recipes"], batch_size):
+                count = min(batch_size, options["recipes"] - offset)
+                recipes = Recipe.objects.bulk_create(
+                    Recipe(
+                        user=user,
+                        title=f"recipe{offset + i}",
+                        price=rng.randint(100, 9999) / 100,
+                        time_minutes=rng.randint(5, 120),
+                    )
+                    for i in range(count)
+                )
+                RecipeTag.objects.bulk_create(
+                    RecipeTag(recipe_id=recipe.id, tag_id=pk)
+                    for recipe in recipes
+                    for pk in rng.sample(tag_ids, min(per_recipe, len(tag_ids)))
+                )
+                RecipeIngredient.objects.bulk_create(
+                    RecipeIngredient(recipe_id=recipe.id, ingredient_id=pk)
+                    for recipe in recipes
+                    for pk in rng.sample(
+                        ingredient_ids, min(per_recipe, len(ingredient_ids))
+                    )
+                )
+        if connection.vendor == "postgresql":
+            # fresh statistics, or the planner guesses at the new rows
+            with connection.cursor() as cursor:
+                for model in (Recipe, RecipeTag, RecipeIngredient):
+                    cursor.execute(f"ANALYZE {model._meta.db_table}")
+        elapsed = time.perf_counter() - start
+        self.stdout.write(f"Seeded in {elapsed:.1f} s")
@@ -0,0 +1,70 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from recipe.importer import content_key, import_recipes, read_rows
+from rest_framework.exceptions import ValidationError
+
+
+class Command(BaseCommand):
+    '''Django command to import the recipes of an NDJSON or CSV file for a
+    user, an import that failed carries on from its last batch when run again
+    with the key it reports'''
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="a .ndjson or .csv file, can be gzipped")
+        parser.add_argument("--email", required=True, help="the user to import for")
+        parser.add_argument("--format", choices=["ndjson", "csv"])
+        parser.add_argument(
+            "--key",
+            help="the checkpoint of the import, by default the hash of the file",
+        )
+        parser.add_argument("--batch-size", type=int)
+        parser.add_argument(
+            "--restart",
+            action="store_true",
+            help="import the file from its first row again",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            user = get_user_model().objects.get(email=options["email"])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f"No user with the email {options['email']}")
+        path = options["path"]
+
+        def progress(rows, seconds):
+            self.stdout.write(f"{rows} rows, {rows / seconds:.0f} rows/s")
+
+        try:
+            with open(path, "rb") as file:
+                key = options["key"] or content_key(file)
+                result = import_recipes(
+                    user.id,
+                    read_rows(file, path, options["format"]),
+                    key,
+                    batch_size=options["batch_size"],
+                    restart=options["restart"],
+                    progress=progress,
+                )
+        except OSError as e:
+            raise CommandError(e)
+        except ValidationError as e:
+            (number, errors), = e.detail.items()
+            raise CommandError(
+                f"Invalid row on line {number}: {errors}, the rows before its "
+                f"batch are imported, run again with --key {key} to carry on"
+            )
+        if result["already_imported"]:
+            self.stdout.write(
+                self.style.WARNING(
+                    "Already imported, run again with --restart to import it again"
+                )
+            )
+            return
+        if result["resumed_from"]:
+            self.stdout.write(f"Resumed after {result['resumed_from']} rows")
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Imported {result['imported']} recipes in {result['seconds']}s, "
+                f"{result['rows_per_second']} rows/s"
+            )
+        )
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+from recipe.images import process_pending_images
+import time
+
+
+class Command(BaseCommand):
+    '''Django command to thumbnail uploaded recipe images in the background'''
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=10)
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=1,
+            help="seconds to wait when no images are waiting to be processed",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="exit when no images are waiting instead of polling for more",
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write("Processing recipe images ...")
+        while True:
+            processed = process_pending_images(options["batch_size"])
+            if processed:
+                self.stdout.write(f"Processed {processed} images")
+            elif options["once"]:
+                break
+            else:
+                time.sleep(options["interval"])
+        self.stdout.write(self.style.SUCCESS("No images waiting"))
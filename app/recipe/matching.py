@@ -0,0 +1,140 @@
+'''"What can I cook": a user's recipes ranked by the ingredients one has.
+
+A recipe matches a set of ingredients in one of three ways:
+
+- all: it uses all of them
+- any: it uses at least one of them
+- missing: it uses at least one of them and needs at most max_missing others
+
+and the matches are ranked by coverage, the share of the recipe's ingredients
+in the set, then by the fewest missing ones.
+
+The matches are found in an inverted index of the user's recipes kept in each
+process. The recipes and the ingredients are numbered from 0, each ingredient
+has the bitset of the numbers of its recipes and each recipe the bitset of the
+numbers of its ingredients, Python ints whose and, or and bit_count run in C
+over a machine word of recipes at a time. The candidates of a query are the and
+(all) or the or (any, missing) of the bitsets of its ingredients, and the
+ingredients a candidate misses are its bitset less the query's.
+
+Like the tries of recipe.autocomplete, an index is built from one query and
+kept in a recipe.cache.VersionedLRU, so a write in any process has it built
+again, the indexes of the process are also dropped by recipe.signals as the
+ingredients of recipes change.'''
+from collections import namedtuple
+from recipe.cache import VersionedLRU
+from recipe.models import Recipe
+import functools
+import heapq
+import operator
+
+ALL, ANY, MISSING = "all", "any", "missing"
+
+Match = namedtuple("Match", ("recipe_id", "matched", "missing_ids", "coverage"))
+
+
+def bits(bitset):
+    '''the numbers of the set bits of a bitset, lowest first'''
+    while bitset:
+        low = bitset & -bitset
+        yield low.bit_length() - 1
+        bitset ^= low
+
+
+def to_bitset(numbers, size):
+    '''the bitset of numbers below size, set in a buffer rather than or-ed one
+    at a time, which copies the int each time'''
+    buffer = bytearray(size // 8 + 1)
+    for number in numbers:
+        buffer[number >> 3] |= 1 << (number & 7)
+    return int.from_bytes(buffer, "little")
+
+
+class IngredientIndex:
+    '''the recipes of each ingredient and the ingredients of each recipe, of
+    the (recipe id, ingredient id) pairs of a recipe's ingredients'''
+
+    def __init__(self, pairs):
+        recipe_numbers = {}
+        ingredient_numbers = {}
+        recipes = []
+        ingredients = []
+        for recipe_id, ingredient_id in pairs:
+            recipe = recipe_numbers.setdefault(recipe_id, len(recipe_numbers))
+            if recipe == len(recipes):
+                recipes.append([])
+            ingredient = ingredient_numbers.setdefault(
+                ingredient_id, len(ingredient_numbers)
+            )
+            if ingredient == len(ingredients):
+                ingredients.append([])
+            recipes[recipe].append(ingredient)
+            ingredients[ingredient].append(recipe)
+        self.recipe_ids = list(recipe_numbers)
+        self.ingredient_ids = list(ingredient_numbers)
+        self.recipes = [to_bitset(numbers, len(ingredients)) for numbers in recipes]
+        # by id, a query ingredient without recipes isn't in them
+        self.ingredients = {
+            ingredient_id: (1 << number, to_bitset(ingredients[number], len(recipes)))
+            for ingredient_id, number in ingredient_numbers.items()
+        }
+
+    def find(self, ingredient_ids, match=MISSING, max_missing=0, limit=None):
+        '''the number of the recipes matching the ingredients and the limit
+        best matches'''
+        found = [self.ingredients.get(pk, (0, 0)) for pk in set(ingredient_ids)]
+        query = functools.reduce(operator.or_, (bit for bit, _ in found), 0)
+        postings = [recipes for _, recipes in found]
+        if not postings:
+            return 0, []
+        if match == ALL:
+            candidates = functools.reduce(operator.and_, postings)
+        else:
+            candidates = functools.reduce(operator.or_, postings)
+        matches = []
+        for number in bits(candidates):
+            recipe = self.recipes[number]
+            missing = recipe & ~query
+            missed = missing.bit_count()
+            if match == MISSING and missed > max_missing:
+                continue
+            matched = recipe.bit_count() - missed
+            matches.append((matched / (matched + missed), missed, number, missing))
+        count = len(matches)
+        # the highest coverage, then the fewest missing, then the oldest recipe
+        ranked = heapq.nsmallest(
+            count if limit is None else limit,
+            matches,
+            key=lambda m: (-m[0], m[1], self.recipe_ids[m[2]]),
+        )
+        return count, [
+            Match(
+                self.recipe_ids[number],
+                self.recipes[number].bit_count() - missed,
+                sorted(self.ingredient_ids[i] for i in bits(missing)),
+                coverage,
+            )
+            for coverage, missed, number, missing in ranked
+        ]
+
+
+def build_index(previous, user_id):
+    return IngredientIndex(
+        Recipe.ingredients.through.objects.filter(recipe__user_id=user_id)
+        .order_by("recipe_id", "ingredient_id")
+        .values_list("recipe_id", "ingredient_id")
+        .iterator()
+    )
+
+
+_indexes = VersionedLRU(build_index, "RECIPE_MATCH_INDEX_USERS")
+
+
+def invalidate(user_id):
+    _indexes.invalidate(user_id)
+
+
+def match_recipes(user_id, ingredients, match=MISSING, max_missing=0, limit=None):
+    '''the number of the user's recipes matching the ingredient ids and the
+    limit best Matches, with the ids of the ingredients each recipe misses'''
+    return _indexes.get(user_id).find(ingredients, match, max_missing, limit)
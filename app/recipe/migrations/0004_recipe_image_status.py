@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipe', '0003_alter_ingredient_name_alter_tag_name'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='image_status',
+            field=models.CharField(choices=[('processing', 'Processing'), ('ready', 'Ready'), ('failed', 'Failed')], db_index=True, max_length=10, null=True),
+        ),
+    ]
@@ -0,0 +1,83 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:23
+
+import django.db.models.functions.text
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models.functions import Lower
+
+
+def merge_case_duplicates(apps, schema_editor):
+    """merge each user's tags and ingredients whose names only differ in case
+    into the oldest of them, the unique constraints below fail on them"""
+    recipe = apps.get_model("recipe", "Recipe")
+    for name, field in (("tag", "tags"), ("ingredient", "ingredients")):
+        model = apps.get_model("recipe", name)
+        through = getattr(recipe, field).through
+        fk = f"{name}_id"
+        names = model.objects.annotate(lowered=Lower("name"))
+        kept_ids = {}
+        for user_id, lowered, pk in (
+            names.values("user_id", "lowered")
+            .annotate(count=models.Count("pk"), kept=models.Min("pk"))
+            .filter(count__gt=1)
+            .values_list("user_id", "lowered", "kept")
+        ):
+            kept_ids[(user_id, lowered)] = pk
+        if not kept_ids:
+            continue
+        # the duplicate of each kept id
+        duplicates = {}
+        for pk, user_id, lowered in names.filter(
+            user_id__in={user_id for user_id, _ in kept_ids}
+        ).values_list("pk", "user_id", "lowered"):
+            kept = kept_ids.get((user_id, lowered), pk)
+            if kept != pk:
+                duplicates[pk] = kept
+        # a recipe with both a duplicate and the kept one keeps one row
+        related = set(
+            through.objects.filter(**{f"{fk}__in": kept_ids.values()}).values_list(
+                "recipe_id", fk
+            )
+        )
+        moved = {}
+        for pk, recipe_id, duplicate in through.objects.filter(
+            **{f"{fk}__in": duplicates}
+        ).values_list("pk", "recipe_id", fk):
+            pair = (recipe_id, duplicates[duplicate])
+            if pair not in related:
+                related.add(pair)
+                moved.setdefault(pair[1], []).append(pk)
+        for kept, pks in moved.items():
+            through.objects.filter(pk__in=pks).update(**{fk: kept})
+        through.objects.filter(**{f"{fk}__in": duplicates}).delete()
+        model.objects.filter(pk__in=duplicates).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipe', '0005_ingredient_updated_at_recipe_updated_at_tag_updated_at'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='ingredient',
+            name='name',
+            field=models.CharField(max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='tag',
+            name='name',
+            field=models.CharField(max_length=255),
+        ),
+        migrations.RunPython(merge_case_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='ingredient',
+            constraint=models.UniqueConstraint(models.F('user'), django.db.models.functions.text.Lower('name'), name='recipe_ingredient_user_name_ci_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='tag',
+            constraint=models.UniqueConstraint(models.F('user'), django.db.models.functions.text.Lower('name'), name='recipe_tag_user_name_ci_uniq'),
+        ),
+    ]
@@ -0,0 +1,162 @@
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    """Index recipes by (user, id) and the relation tables in both directions.
+
+    The through models take over the tables Django created for the M2M fields,
+    so only their state changes before their single column indexes are
+    replaced by composite ones.
+    """
+
+    dependencies = [
+        ("recipe", "0006_per_user_names"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="recipe",
+            index=models.Index(fields=["user", "id"], name="recipe_recipe_user_id_idx"),
+        ),
+        migrations.AlterField(
+            model_name="recipe",
+            name="user",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name="RecipeTag",
+                    fields=[
+                        (
+                            "id",
+                            models.BigAutoField(
+                                auto_created=True,
+                                primary_key=True,
+                                serialize=False,
+                                verbose_name="ID",
+                            ),
+                        ),
+                        (
+                            "recipe",
+                            models.ForeignKey(
+                                on_delete=django.db.models.deletion.CASCADE,
+                                to="recipe.recipe",
+                            ),
+                        ),
+                        (
+                            "tag",
+                            models.ForeignKey(
+                                on_delete=django.db.models.deletion.CASCADE,
+                                to="recipe.tag",
+                            ),
+                        ),
+                    ],
+                    options={
+                        "db_table": "recipe_recipe_tags",
+                        "unique_together": {("recipe", "tag")},
+                    },
+                ),
+                migrations.AlterField(
+                    model_name="recipe",
+                    name="tags",
+                    field=models.ManyToManyField(
+                        through="recipe.RecipeTag", to="recipe.tag"
+                    ),
+                ),
+                migrations.CreateModel(
+                    name="RecipeIngredient",
+                    fields=[
+                        (
+                            "id",
+                            models.BigAutoField(
+                                auto_created=True,
+                                primary_key=True,
+                                serialize=False,
+                                verbose_name="ID",
+                            ),
+                        ),
+                        (
+                            "recipe",
+                            models.ForeignKey(
+                                on_delete=django.db.models.deletion.CASCADE,
+                                to="recipe.recipe",
+                            ),
+                        ),
+                        (
+                            "ingredient",
+                            models.ForeignKey(
+                                on_delete=django.db.models.deletion.CASCADE,
+                                to="recipe.ingredient",
+                            ),
+                        ),
+                    ],
+                    options={
+                        "db_table": "recipe_recipe_ingredients",
+                        "unique_together": {("recipe", "ingredient")},
+                    },
+                ),
+                migrations.AlterField(
+                    model_name="recipe",
+                    name="ingredients",
+                    field=models.ManyToManyField(
+                        through="recipe.RecipeIngredient", to="recipe.ingredient"
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="recipetag",
+            index=models.Index(fields=["tag", "recipe"], name="recipe_tag_recipe_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="recipeingredient",
+            index=models.Index(
+                fields=["ingredient", "recipe"], name="recipe_ingredient_recipe_idx"
+            ),
+        ),
+        # the unique (recipe, ...) and the composite indexes cover them
+        migrations.AlterField(
+            model_name="recipetag",
+            name="recipe",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                to="recipe.recipe",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="recipetag",
+            name="tag",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                to="recipe.tag",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="recipeingredient",
+            name="recipe",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                to="recipe.recipe",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="recipeingredient",
+            name="ingredient",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                to="recipe.ingredient",
+            ),
+        ),
+    ]
@@ -0,0 +1,82 @@
+import django.contrib.postgres.search
+from django.db import migrations
+
+# the SQL of recipe.search when the index was added, copied so later changes
+# to the app don't change this migration
+SEARCH_INDEX = "recipe_recipe_search_vector_gin"
+FTS_TABLE = "recipe_recipe_fts"
+
+FTS_CREATE_SQL = f"""
+CREATE VIRTUAL TABLE {FTS_TABLE}
+USING fts5(title, instruction, tags, ingredients, tokenize='porter unicode61')
+"""
+
+# the names of the tags and ingredients of the recipe r, joined by {agg}
+TAG_NAMES_SQL = (
+    "(SELECT {agg}(t.name, ' ') FROM recipe_recipe_tags rt JOIN recipe_tag t "
+    "ON t.id = rt.tag_id WHERE rt.recipe_id = r.id)"
+)
+INGREDIENT_NAMES_SQL = (
+    "(SELECT {agg}(i.name, ' ') FROM recipe_recipe_ingredients ri "
+    "JOIN recipe_ingredient i ON i.id = ri.ingredient_id WHERE ri.recipe_id = r.id)"
+)
+
+# title A, tag and ingredient names B, instruction C
+POSTGRES_FILL_SQL = """
+UPDATE recipe_recipe r SET search_vector =
+    setweight(to_tsvector('english', r.title), 'A')
+    || setweight(to_tsvector('english', coalesce({tags}, '')), 'B')
+    || setweight(to_tsvector('english', coalesce({ingredients}, '')), 'B')
+    || setweight(to_tsvector('english', r.instruction), 'C')
+""".format(
+    tags=TAG_NAMES_SQL.format(agg="string_agg"),
+    ingredients=INGREDIENT_NAMES_SQL.format(agg="string_agg"),
+)
+
+FTS_FILL_SQL = """
+INSERT INTO {table} (rowid, title, instruction, tags, ingredients)
+SELECT r.id, r.title, r.instruction, {tags}, {ingredients}
+FROM recipe_recipe r
+""".format(
+    table=FTS_TABLE,
+    tags=TAG_NAMES_SQL.format(agg="group_concat"),
+    ingredients=INGREDIENT_NAMES_SQL.format(agg="group_concat"),
+)
+
+
+def create_search_index(apps, schema_editor):
+    """index the search vector on PostgreSQL, or create the FTS5 table the
+    other databases search, and index the existing recipes"""
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute(
+            f"CREATE INDEX {SEARCH_INDEX} ON recipe_recipe USING gin (search_vector)"
+        )
+        schema_editor.execute(POSTGRES_FILL_SQL)
+    else:
+        schema_editor.execute(FTS_CREATE_SQL)
+        schema_editor.execute(FTS_FILL_SQL)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute(f"DROP INDEX {SEARCH_INDEX}")
+    else:
+        schema_editor.execute(f"DROP TABLE {FTS_TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("recipe", "0007_recipe_relation_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="recipe",
+            name="search_vector",
+            field=django.contrib.postgres.search.SearchVectorField(
+                editable=False, null=True
+            ),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-17 19:14
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def count_recipes(apps, schema_editor):
+    """count the recipes of the existing tags and ingredients"""
+    for name in ("tag", "ingredient"):
+        model = apps.get_model("recipe", name)
+        through = apps.get_model("recipe", f"recipe{name}")
+        counts = (
+            through.objects.filter(**{name: models.OuterRef("pk")})
+            .order_by()
+            .values(name)
+            .annotate(count=models.Count("*"))
+            .values("count")
+        )
+        model.objects.update(recipe_count=Coalesce(models.Subquery(counts), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipe', '0010_recipeimport'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ingredient',
+            name='recipe_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='tag',
+            name='recipe_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='ingredient',
+            index=models.Index(fields=['user', '-recipe_count'], name='recipe_ingr_user_count_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tag',
+            index=models.Index(fields=['user', '-recipe_count'], name='recipe_tag_user_count_idx'),
+        ),
+        migrations.RunPython(count_recipes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,36 @@
+from django.db import migrations
+
+# the prefixes of the lowercased names autocompleted by recipe.autocomplete,
+# text_pattern_ops lets a LIKE 'prefix%' use the index whatever the collation
+PREFIX_INDEXES = {
+    "recipe_tag": "recipe_tag_user_name_prefix_idx",
+    "recipe_ingredient": "recipe_ingr_user_name_prefix_idx",
+}
+
+
+def create_prefix_indexes(apps, schema_editor):
+    """PostgreSQL only, SQLite has no operator classes"""
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for table, index in PREFIX_INDEXES.items():
+        schema_editor.execute(
+            f"CREATE INDEX {index} ON {table} (user_id, LOWER(name) text_pattern_ops)"
+        )
+
+
+def drop_prefix_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for index in PREFIX_INDEXES.values():
+        schema_editor.execute(f"DROP INDEX {index}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("recipe", "0011_recipe_counts"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_prefix_indexes, drop_prefix_indexes),
+    ]
@@ -1,22 +1,118 @@
-from django.db import models
+from django.contrib.postgres.search import SearchVectorField
+from django.db import connections, models
+from django.db.models.functions import Coalesce, Lower
+from django.utils import timezone
 from django.conf import settings
 import uuid
 import os
-from PIL import Image
+
+
+class RecipeAttrManager(models.Manager):
+    # names lowercased by a query, below the parameter limits of the backends
+    LOWER_BATCH_SIZE = 500
+
+    def lower_names(self, names):
+        '''map the names to their LOWER() in the database, the key of the
+        unique constraint. Python's lower() folds some characters otherwise,
+        e.g. SQLite only lowercases ASCII'''
+        names = list(dict.fromkeys(names))
+        keys = {}
+        with connections[self.db].cursor() as cursor:
+            for start in range(0, len(names), self.LOWER_BATCH_SIZE):
+                batch = names[start:start + self.LOWER_BATCH_SIZE]
+                cursor.execute("SELECT " + ", ".join(["LOWER(%s)"] * len(batch)), batch)
+                keys.update(zip(batch, cursor.fetchone()))
+        return keys
+
+    def get_or_create_many(self, user_id, names):
+        '''get the user's objects with the names, matched case-insensitively,
+        creating the missing ones with a single INSERT ... ON CONFLICT DO NOTHING,
+        and return them in the order of the names'''
+        keys = self.lower_names(names)
+        spellings = {}
+        for name in names:
+            spellings.setdefault(keys[name], name)
+        self.bulk_create(
+            [self.model(user_id=user_id, name=name) for name in spellings.values()],
+            ignore_conflicts=True,
+        )
+        objs = {
+            obj.name_lower: obj
+            for obj in self.annotate(name_lower=Lower("name")).filter(
+                user_id=user_id, name_lower__in=spellings
+            )
+        }
+        return [objs[keys[name]] for name in names]
+
+    def update_recipe_counts(self, pks):
+        '''recount the recipes of the objects after their relations changed,
+        with one UPDATE counting their rows of the through table. The count is
+        rendered by the listings, so the objects are marked as updated too'''
+        name = self.model._meta.model_name
+        through = self.model.recipe_set.through
+        counts = (
+            through.objects.filter(**{name: models.OuterRef("pk")})
+            .order_by()
+            .values(name)
+            .annotate(count=models.Count("*"))
+            .values("count")
+        )
+        self.filter(pk__in=pks).update(
+            recipe_count=Coalesce(models.Subquery(counts), 0),
+            updated_at=timezone.now(),
+        )
 
 
 # Create your models here.
 class Tag(models.Model):
-    name = models.CharField(max_length=255, unique=True)
+    name = models.CharField(max_length=255)
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    updated_at = models.DateTimeField(auto_now=True)
+    # the number of recipes with the tag, kept by recipe.signals and the bulk
+    # writes, so listings filter and sort by it without counting
+    recipe_count = models.PositiveIntegerField(default=0)
+
+    objects = RecipeAttrManager()
+
+    class Meta:
+        constraints = [
+            # names are unique per user, whatever their case
+            models.UniqueConstraint(
+                "user", Lower("name"), name="recipe_tag_user_name_ci_uniq"
+            ),
+        ]
+        indexes = [
+            # the user's tags with recipes, by usage
+            models.Index(
+                fields=["user", "-recipe_count"], name="recipe_tag_user_count_idx"
+            ),
+        ]
 
     def __str__(self):
         return self.name
 
 
 class Ingredient(models.Model):
-    name = models.CharField(max_length=255, unique=True)
+    name = models.CharField(max_length=255)
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    updated_at = models.DateTimeField(auto_now=True)
+    # the number of recipes with the ingredient, see Tag.recipe_count
+    recipe_count = models.PositiveIntegerField(default=0)
+
+    objects = RecipeAttrManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                "user", Lower("name"), name="recipe_ingredient_user_name_ci_uniq"
+            ),
+        ]
+        indexes = [
+            # the user's ingredients with recipes, by usage
+            models.Index(
+                fields=["user", "-recipe_count"], name="recipe_ingr_user_count_idx"
+            ),
+        ]
 
     def __str__(self):
         return self.name
@@ -28,24 +124,164 @@ def recipe_image_path(instance, filename):
     return os.path.join("uploads/recipe/", new_path)
 
 
+class RecipeQuerySet(models.QuerySet):
+    def with_any_tags(self, tag_ids):
+        '''recipes with at least one of the tags, an EXISTS subquery rather
+        than a join, so the recipes need no DISTINCT'''
+        return self.filter(
+            models.Exists(
+                RecipeTag.objects.filter(recipe=models.OuterRef("pk"), tag__in=tag_ids)
+            )
+        )
+
+    def with_any_ingredients(self, ingredient_ids):
+        '''recipes with at least one of the ingredients'''
+        return self.filter(
+            models.Exists(
+                RecipeIngredient.objects.filter(
+                    recipe=models.OuterRef("pk"), ingredient__in=ingredient_ids
+                )
+            )
+        )
+
+    def facet_counts(self):
+        '''the number of the recipes with each tag and each ingredient, as
+        {"tags": {id: count}, "ingredients": {id: count}}, grouping the rows
+        of both through tables of the recipes in one query'''
+        recipe_ids = self.order_by().values("pk")
+
+        def grouped(through, field):
+            return (
+                through.objects.filter(recipe__in=recipe_ids)
+                .order_by()
+                .values(field)
+                .annotate(
+                    facet=models.Value(field, output_field=models.CharField()),
+                    count=models.Count("*"),
+                )
+                .values_list("facet", field, "count")
+            )
+
+        counts = {"tags": {}, "ingredients": {}}
+        rows = grouped(RecipeTag, "tag").union(
+            grouped(RecipeIngredient, "ingredient"), all=True
+        )
+        for facet, pk, count in rows:
+            counts["tags" if facet == "tag" else "ingredients"][pk] = count
+        return counts
+
+
 class Recipe(models.Model):
+    class ImageStatus(models.TextChoices):
+        PROCESSING = "processing"
+        READY = "ready"
+        FAILED = "failed"
+
     title = models.CharField(max_length=255)
     price = models.DecimalField(max_digits=5, decimal_places=2)
     instruction = models.TextField(blank=True)
     time_minutes = models.IntegerField()
     image = models.ImageField(null=True, upload_to=recipe_image_path)
+    # null while the recipe has no image, images are thumbnailed in the
+    # background by the process_images command
+    image_status = models.CharField(
+        max_length=10, choices=ImageStatus.choices, null=True, db_index=True
+    )
 
-    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
-    ingredients = models.ManyToManyField("Ingredient")
-    tags = models.ManyToManyField("Tag")
+    # also bumped when tags or ingredients are added or removed, see
+    # recipe.signals
+    updated_at = models.DateTimeField(auto_now=True)
+    # the words searched on PostgreSQL, kept by recipe.search and GIN indexed
+    # by migration 0008, as SQLite can't have the index
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    # indexed by the (user, id) index below, which lists a user's recipes in
+    # the order they are paginated
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, db_index=False
+    )
+    ingredients = models.ManyToManyField("Ingredient", through="RecipeIngredient")
+    tags = models.ManyToManyField("Tag", through="RecipeTag")
+
+    objects = RecipeQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "id"], name="recipe_recipe_user_id_idx"),
+        ]
 
     def __str__(self):
         return self.title
 
-    def save(self, *args, **kwargs):
-        super(Recipe, self).save(*args, **kwargs)
-        img = Image.open(self.image.path)
-        if img.height > 300 or img.width > 300:
-            output_size = (300, 300)
-            img.thumbnail(output_size)
-            img.save(self.image.path)
+
+# The through tables of the recipe relations, they keep the tables Django
+# created for them. The unique (recipe, tag) index serves lookups by recipe
+# and the (tag, recipe) one lookups by tag, both without reading the rows.
+class RecipeTag(models.Model):
+    recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE, db_index=False)
+    tag = models.ForeignKey(Tag, on_delete=models.CASCADE, db_index=False)
+
+    class Meta:
+        db_table = "recipe_recipe_tags"
+        unique_together = [("recipe", "tag")]
+        indexes = [
+            models.Index(fields=["tag", "recipe"], name="recipe_tag_recipe_idx"),
+        ]
+
+
+class RecipeIngredient(models.Model):
+    recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE, db_index=False)
+    ingredient = models.ForeignKey(
+        Ingredient, on_delete=models.CASCADE, db_index=False
+    )
+
+    class Meta:
+        db_table = "recipe_recipe_ingredients"
+        unique_together = [("recipe", "ingredient")]
+        indexes = [
+            models.Index(
+                fields=["ingredient", "recipe"], name="recipe_ingredient_recipe_idx"
+            ),
+        ]
+
+
+class TimelineEntry(models.Model):
+    '''a recipe in the feed of a follower of its author, see recipe.feed'''
+
+    # indexed by the unique (user, recipe) constraint, which a feed page is a
+    # range scan of
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        db_index=False,
+        related_name="timeline_entries",
+    )
+    recipe = models.ForeignKey(
+        Recipe, on_delete=models.CASCADE, related_name="timeline_entries"
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "recipe"], name="recipe_timeline_user_recipe_uniq"
+            ),
+        ]
+
+
+class RecipeImport(models.Model):
+    '''the checkpoint of an import, the number of rows of its file imported
+    so far, see recipe.importer'''
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    # names the file imported, e.g. its name
+    key = models.CharField(max_length=255)
+    rows = models.PositiveIntegerField(default=0)
+    finished = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "key"], name="recipe_import_user_key_uniq"
+            ),
+        ]
@@ -0,0 +1,130 @@
+from django.conf import settings
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination, _reverse_ordering
+import json
+
+
+class RecipeCursorPagination(CursorPagination):
+    '''paginate recipes by a cursor on their id, so any page is read with an
+    indexed range scan instead of an OFFSET over all the previous pages.
+
+    DRF's cursor holds the value of the first field of the ordering only and
+    skips the rows tied with it by an OFFSET, capped at offset_cutoff. The
+    cursor here holds the values of all the fields, whose last is unique, and
+    a page starts after them, so ties never need an OFFSET.'''
+
+    ordering = ("id",)
+    page_size_query_param = "page_size"
+    max_page_size = settings.MAX_PAGE_SIZE
+    # search results come best first, the cursor is on their rank
+    search_ordering = ("-search_rank", "-id")
+
+    def get_ordering(self, request, queryset, view):
+        if "search_rank" in queryset.query.annotations:
+            return self.search_ordering
+        return super().get_ordering(request, queryset, view)
+
+    def _get_position_from_instance(self, instance, ordering):
+        values = [
+            instance[name] if isinstance(instance, dict) else getattr(instance, name)
+            for name in (field.lstrip("-") for field in ordering)
+        ]
+        return json.dumps(values)
+
+    def filter_position(self, queryset, position, reverse):
+        '''the rows after the position in the ordering, or before it for a
+        reversed cursor, compared on all the fields of the ordering'''
+        try:
+            values = json.loads(position)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(values, list):
+            # a cursor on the id issued before the positions were lists
+            values = [values]
+        if len(values) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        # (a > x) or (a = x and b > y) or (a = x and b = y and c > z) ...
+        after = Q()
+        equal = {}
+        for field, value in zip(self.ordering, values):
+            name = field.lstrip("-")
+            lookup = "__lt" if reverse != field.startswith("-") else "__gt"
+            after |= Q(**equal, **{name + lookup: value})
+            equal[name] = value
+        return queryset.filter(after)
+
+    def get_page_queryset(self, queryset, request, view):
+        '''the rows of the page and the one after it, None without a page
+        size'''
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+        if self.cursor is None:
+            offset, reverse, current_position = 0, False, None
+        else:
+            offset, reverse, current_position = self.cursor
+        if reverse:
+            queryset = queryset.order_by(*_reverse_ordering(self.ordering))
+        else:
+            queryset = queryset.order_by(*self.ordering)
+        if current_position is not None:
+            queryset = self.filter_position(queryset, current_position, reverse)
+        # one more than the page tells whether there is a next one
+        return queryset[offset:offset + self.page_size + 1]
+
+    def set_page(self, results):
+        offset, reverse, current_position = self.cursor or (0, False, None)
+        self.page = results[: self.page_size]
+        has_following = len(results) > len(self.page)
+        following_position = None
+        if has_following:
+            following_position = self._get_position_from_instance(
+                results[-1], self.ordering
+            )
+        moved = current_position is not None or offset > 0
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.next_position = moved, current_position
+            self.has_previous, self.previous_position = (
+                has_following,
+                following_position,
+            )
+        else:
+            self.has_next, self.next_position = has_following, following_position
+            self.has_previous, self.previous_position = moved, current_position
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+        return self.page
+
+    def paginate_queryset(self, queryset, request, view=None):
+        page = self.get_page_queryset(queryset, request, view)
+        if page is None:
+            return None
+        return self.set_page(list(page))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        '''paginate_queryset for the async views, reading the page with the
+        async ORM'''
+        page = self.get_page_queryset(queryset, request, view)
+        if page is None:
+            return [obj async for obj in queryset]
+        return self.set_page([obj async for obj in page])
+
+
+class RecipeAttrCursorPagination(RecipeCursorPagination):
+    '''paginate tags and ingredients by a cursor on (name, id), or on their
+    number of recipes, most used first, with ?ordering=-recipe_count'''
+
+    ordering = ("name", "id")
+    orderings = {"-recipe_count": ("-recipe_count", "name", "id")}
+
+    def get_ordering(self, request, queryset, view):
+        ordering = request.query_params.get("ordering")
+        return self.orderings.get(ordering) or super().get_ordering(
+            request, queryset, view
+        )
@@ -0,0 +1,119 @@
+'''Full-text search over the title, instruction, tag and ingredient names of
+recipes.
+
+On PostgreSQL the words of a recipe are stored in Recipe.search_vector, a
+weighted tsvector with a GIN index, and results are ranked with ts_rank. Other
+databases (SQLite, for tests and local runs) keep them in the FTS5 table
+recipe_recipe_fts, whose rowids are the recipe ids, and rank with bm25.
+
+update_search_index is called by recipe.signals when recipes, their relations
+or the names of their tags and ingredients change, and by the bulk endpoints,
+which send no signals.'''
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connection
+from django.db.models import F, FloatField
+from django.db.models.expressions import RawSQL
+import re
+
+SEARCH_CONFIG = "english"
+FTS_TABLE = "recipe_recipe_fts"
+
+# the names of the tags and ingredients of the recipe r, joined by {agg}
+TAG_NAMES_SQL = (
+    "(SELECT {agg}(t.name, ' ') FROM recipe_recipe_tags rt JOIN recipe_tag t "
+    "ON t.id = rt.tag_id WHERE rt.recipe_id = r.id)"
+)
+INGREDIENT_NAMES_SQL = (
+    "(SELECT {agg}(i.name, ' ') FROM recipe_recipe_ingredients ri "
+    "JOIN recipe_ingredient i ON i.id = ri.ingredient_id WHERE ri.recipe_id = r.id)"
+)
+
+# title A, tag and ingredient names B, instruction C
+POSTGRES_UPDATE_SQL = """
+UPDATE recipe_recipe r SET search_vector =
+    setweight(to_tsvector(%(config)s, r.title), 'A')
+    || setweight(to_tsvector(%(config)s, coalesce({tags}, '')), 'B')
+    || setweight(to_tsvector(%(config)s, coalesce({ingredients}, '')), 'B')
+    || setweight(to_tsvector(%(config)s, r.instruction), 'C')
+WHERE r.id = ANY(%(ids)s)
+""".format(
+    tags=TAG_NAMES_SQL.format(agg="string_agg"),
+    ingredients=INGREDIENT_NAMES_SQL.format(agg="string_agg"),
+)
+
+FTS_CREATE_SQL = f"""
+CREATE VIRTUAL TABLE {FTS_TABLE}
+USING fts5(title, instruction, tags, ingredients, tokenize='porter unicode61')
+"""
+
+FTS_INSERT_SQL = """
+INSERT INTO {table} (rowid, title, instruction, tags, ingredients)
+SELECT r.id, r.title, r.instruction, {tags}, {ingredients}
+FROM recipe_recipe r WHERE r.id IN ({{placeholders}})
+""".format(
+    table=FTS_TABLE,
+    tags=TAG_NAMES_SQL.format(agg="group_concat"),
+    ingredients=INGREDIENT_NAMES_SQL.format(agg="group_concat"),
+)
+
+# bm25 weights of the columns of the FTS table, in the order of FTS_CREATE_SQL
+FTS_WEIGHTS = "10.0, 2.0, 5.0, 5.0"
+
+# ids indexed per statement, within SQLite's limit on parameters
+BATCH_SIZE = 500
+
+
+def is_postgresql(conn=connection):
+    return conn.vendor == "postgresql"
+
+
+def update_search_index(recipe_ids, conn=connection):
+    '''index the current words of the recipes, the ids of deleted recipes
+    are dropped from the index'''
+    ids = list(recipe_ids)
+    with conn.cursor() as cursor:
+        for start in range(0, len(ids), BATCH_SIZE):
+            batch = ids[start:start + BATCH_SIZE]
+            if is_postgresql(conn):
+                cursor.execute(
+                    POSTGRES_UPDATE_SQL, {"config": SEARCH_CONFIG, "ids": batch}
+                )
+                continue
+            placeholders = ", ".join(["%s"] * len(batch))
+            cursor.execute(
+                f"DELETE FROM {FTS_TABLE} WHERE rowid IN ({placeholders})", batch
+            )
+            cursor.execute(FTS_INSERT_SQL.format(placeholders=placeholders), batch)
+
+
+def fts_query(text):
+    '''an FTS5 query matching all the words of the text, each quoted so the
+    text can't use the query syntax'''
+    return " ".join(f'"{word}"' for word in re.findall(r"\w+", text))
+
+
+def search_recipes(queryset, text):
+    '''the recipes of the queryset with all the words of the text, annotated
+    with their search_rank, higher is better'''
+    if is_postgresql():
+        query = SearchQuery(text, search_type="websearch", config=SEARCH_CONFIG)
+        return queryset.filter(search_vector=query).annotate(
+            search_rank=SearchRank(F("search_vector"), query)
+        )
+    match = fts_query(text)
+    if not match:
+        return queryset.none()
+    table = queryset.model._meta.db_table
+    return queryset.filter(
+        pk__in=RawSQL(
+            f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", (match,)
+        )
+    ).annotate(
+        # bm25 is lower for better matches
+        search_rank=RawSQL(
+            f"SELECT -bm25({FTS_TABLE}, {FTS_WEIGHTS}) FROM {FTS_TABLE} "
+            f"WHERE {FTS_TABLE} MATCH %s AND rowid = {table}.id",
+            (match,),
+            output_field=FloatField(),
+        )
+    )
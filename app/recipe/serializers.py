@@ -1,5 +1,12 @@
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
 from rest_framework import serializers
 from recipe.models import Tag, Ingredient, Recipe
+from recipe.images import rendition_names
+from recipe.search import update_search_index
+from recipe.feed import fan_out
 
 
 class TagSerializer(serializers.ModelSerializer):
@@ -14,11 +21,80 @@ class IngredientSerializer(serializers.ModelSerializer):
         fields = ["name", "id"]
 
 
-class RecipeSerializer(serializers.ModelSerializer):
+class TagCountSerializer(TagSerializer):
+    '''a tag of a listing, with the number of recipes it has'''
+
+    class Meta(TagSerializer.Meta):
+        fields = TagSerializer.Meta.fields + ["recipe_count"]
+        read_only_fields = fields
+
+
+class IngredientCountSerializer(IngredientSerializer):
+    class Meta(IngredientSerializer.Meta):
+        fields = IngredientSerializer.Meta.fields + ["recipe_count"]
+        read_only_fields = fields
+
+
+class RecipeNamesMixin:
+    '''tags and ingredients can also be given by name in tag_names and
+    ingredient_names, the ones the user doesn't have yet are created'''
+
+    name_fields = {
+        "tag_names": ("tags", Tag),
+        "ingredient_names": ("ingredients", Ingredient),
+    }
+
+    def resolve_names(self, items, user_id):
+        '''replace the names of the items by ids added to their relations,
+        with one upsert per model for all the items'''
+        for names_field, (field, model) in self.name_fields.items():
+            given = [item for item in items if names_field in item]
+            if not given:
+                continue
+            names = [name for item in given for name in item[names_field]]
+            objs = iter(model.objects.get_or_create_many(user_id, names))
+            for item in given:
+                named = [next(objs).id for name in item.pop(names_field)]
+                item[field] = list(item.get(field, [])) + named
+
+
+def names_field():
+    return serializers.ListField(
+        child=serializers.CharField(max_length=255),
+        max_length=settings.BULK_MAX_ITEMS,
+        write_only=True,
+        required=False,
+    )
+
+
+class SparseFieldsMixin:
+    '''render only the fields given in fields, and the relations given in
+    expand nested by the serializer of expanded_fields rather than by id'''
+
+    expanded_fields = {}
+
+    def __init__(self, *args, fields=None, expand=(), **kwargs):
+        super().__init__(*args, **kwargs)
+        for name in expand:
+            self.fields[name] = self.expanded_fields[name](many=True, read_only=True)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+
+class RecipeSerializer(
+    SparseFieldsMixin, RecipeNamesMixin, serializers.ModelSerializer
+):
     ingredients = serializers.PrimaryKeyRelatedField(
-        many=True, queryset=Ingredient.objects.all()
+        many=True, queryset=Ingredient.objects.all(), required=False
     )
-    tags = serializers.PrimaryKeyRelatedField(many=True, queryset=Tag.objects.all())
+    tags = serializers.PrimaryKeyRelatedField(
+        many=True, queryset=Tag.objects.all(), required=False
+    )
+    ingredient_names = names_field()
+    tag_names = names_field()
+    image_renditions = serializers.SerializerMethodField()
+    expanded_fields = {"tags": TagSerializer, "ingredients": IngredientSerializer}
 
     class Meta:
         model = Recipe
@@ -29,10 +105,66 @@ class RecipeSerializer(serializers.ModelSerializer):
             "price",
             "time_minutes",
             "image",
+            "image_status",
+            "image_renditions",
             "ingredients",
             "tags",
+            "ingredient_names",
+            "tag_names",
         )
-        read_only_fields = ("id", "image")
+        read_only_fields = ("id", "image", "image_status")
+
+    def create(self, validated_data):
+        self.resolve_names([validated_data], validated_data["user_id"])
+        return super().create(validated_data)
+
+    def update(self, instance, validated_data):
+        '''save only the fields given, a full save would write back the image
+        and image_status read before the image worker replaced them'''
+        self.resolve_names([validated_data], instance.user_id)
+        relations = {
+            field: validated_data.pop(field)
+            for field in ("tags", "ingredients")
+            if field in validated_data
+        }
+        for attr, value in validated_data.items():
+            setattr(instance, attr, value)
+        instance.save(update_fields=[*validated_data, "updated_at"])
+        for field, value in relations.items():
+            getattr(instance, field).set(value)
+        return instance
+
+    def get_image_renditions(self, recipe):
+        '''urls of the renditions of the image by size and format, once the
+        image has been processed'''
+        if recipe.image_status != Recipe.ImageStatus.READY:
+            return None
+        request = self.context.get("request")
+        renditions = {}
+        for size, formats in rendition_names(recipe.image.name).items():
+            renditions[size] = {}
+            for format, name in formats.items():
+                url = default_storage.url(name)
+                if request is not None:
+                    url = request.build_absolute_uri(url)
+                renditions[size][format] = url
+        return renditions
+
+
+class FeedRecipeSerializer(RecipeSerializer):
+    '''a recipe of a feed, with the id of its author'''
+
+    class Meta(RecipeSerializer.Meta):
+        fields = RecipeSerializer.Meta.fields + ("user",)
+        read_only_fields = fields
+
+
+class FeedParamsSerializer(serializers.Serializer):
+    '''the query params of the feed, a page_size above the max page size is
+    capped like the listings' one'''
+
+    page_size = serializers.IntegerField(min_value=1, required=False)
+    before = serializers.IntegerField(required=False)
 
 
 class RecipeDetailSerializer(RecipeSerializer):
@@ -40,7 +172,243 @@ class RecipeDetailSerializer(RecipeSerializer):
     tags = TagSerializer(many=True, read_only=True)
 
 
+class RecipeExportSerializer(serializers.ModelSerializer):
+    '''a recipe of an export, with the names of its tags and ingredients,
+    which stay meaningful outside of the user's account'''
+
+    tags = serializers.SlugRelatedField(many=True, read_only=True, slug_field="name")
+    ingredients = serializers.SlugRelatedField(
+        many=True, read_only=True, slug_field="name"
+    )
+
+    class Meta:
+        model = Recipe
+        fields = (
+            "id",
+            "title",
+            "instruction",
+            "price",
+            "time_minutes",
+            "tags",
+            "ingredients",
+        )
+        read_only_fields = fields
+
+
+class RecipeImportSerializer(serializers.ModelSerializer):
+    '''a row of an import, its tags and ingredients are names'''
+
+    tags = names_field()
+    ingredients = names_field()
+
+    class Meta:
+        model = Recipe
+        fields = (
+            "title",
+            "instruction",
+            "price",
+            "time_minutes",
+            "tags",
+            "ingredients",
+        )
+
+
+class RecipeImportFileSerializer(serializers.Serializer):
+    file = serializers.FileField()
+    format = serializers.ChoiceField(["ndjson", "csv"], required=False)
+    # the checkpoint of the import, the hash of the file's content by default
+    key = serializers.CharField(max_length=255, required=False)
+    restart = serializers.BooleanField(default=False)
+
+
+class AutocompleteSerializer(serializers.Serializer):
+    '''the query params of a tag or ingredient autocomplete'''
+
+    prefix = serializers.CharField(
+        max_length=255, default="", allow_blank=True, trim_whitespace=False
+    )
+    limit = serializers.IntegerField(
+        min_value=1,
+        max_value=settings.AUTOCOMPLETE_MAX_LIMIT,
+        default=settings.AUTOCOMPLETE_LIMIT,
+    )
+
+
+class RecipeMatchSerializer(serializers.Serializer):
+    '''the query params of the recipes matching ingredients, see
+    recipe.matching'''
+
+    ingredients = serializers.CharField()
+    match = serializers.ChoiceField(
+        choices=("all", "any", "missing"), default="missing"
+    )
+    max_missing = serializers.IntegerField(min_value=0, default=0)
+    limit = serializers.IntegerField(
+        min_value=1,
+        max_value=settings.MAX_PAGE_SIZE,
+        default=settings.RECIPE_MATCH_LIMIT,
+    )
+
+    def validate_ingredients(self, value):
+        try:
+            return [int(pk) for pk in value.split(",") if pk.strip()]
+        except ValueError:
+            raise serializers.ValidationError("Expected comma separated ids.")
+
+
+class SimilarRecipesSerializer(serializers.Serializer):
+    limit = serializers.IntegerField(
+        min_value=1,
+        max_value=settings.SIMILAR_RECIPES_K,
+        default=settings.SIMILAR_RECIPES_LIMIT,
+    )
+
+
 class RecipeUploadImageSerializer(serializers.ModelSerializer):
     class Meta:
         model = Recipe
-        fields = ("image",)
+        fields = ("image", "image_status")
+        read_only_fields = ("image_status",)
+
+    def update(self, instance, validated_data):
+        # the new image is thumbnailed later by the process_images command
+        validated_data["image_status"] = Recipe.ImageStatus.PROCESSING
+        return super().update(instance, validated_data)
+
+
+class BulkDestroySerializer(serializers.Serializer):
+    ids = serializers.ListField(
+        child=serializers.IntegerField(),
+        allow_empty=False,
+        max_length=settings.BULK_MAX_ITEMS,
+    )
+
+
+class RecipeBulkListSerializer(RecipeNamesMixin, serializers.ListSerializer):
+    '''create or update many recipes with a fixed number of queries
+
+    The tags and ingredients the items refer to are validated with one query
+    each, recipes and their relations are inserted with bulk_create and
+    updated with bulk_update, all in one transaction.'''
+
+    relations = {"tags": Tag, "ingredients": Ingredient}
+
+    def validate(self, items):
+        user_id = self.context["request"].user.id
+        errors = {}
+        for field, model in self.relations.items():
+            ids = {pk for item in items for pk in item.get(field, [])}
+            owned = set(
+                model.objects.filter(user_id=user_id, id__in=ids).values_list(
+                    "id", flat=True
+                )
+            )
+            for index, item in enumerate(items):
+                missing = [pk for pk in item.get(field, []) if pk not in owned]
+                if missing:
+                    errors.setdefault(index, {})[field] = [
+                        f'Invalid pk "{pk}" - object does not exist.' for pk in missing
+                    ]
+        if self.instance is not None:
+            ids = [item.get("id") for item in items]
+            self.recipes = self.instance.in_bulk([pk for pk in ids if pk])
+            for index, pk in enumerate(ids):
+                if pk not in self.recipes:
+                    message = "This field is required." if pk is None else (
+                        f'Invalid pk "{pk}" - object does not exist.'
+                    )
+                    errors.setdefault(index, {})["id"] = [message]
+        if errors:
+            raise serializers.ValidationError(errors)
+        return items
+
+    def set_relations(self, recipes, items):
+        '''replace the relations of the recipes that are given in the items'''
+        for field, model in self.relations.items():
+            through = getattr(Recipe, field).through
+            fk = f"{model._meta.model_name}_id"
+            given = [
+                (recipe, item[field])
+                for recipe, item in zip(recipes, items)
+                if field in item
+            ]
+            if not given:
+                continue
+            recipe_ids = [recipe.id for recipe, pks in given]
+            # the relations dropped and added both change the tags/ingredients
+            old = through.objects.filter(recipe_id__in=recipe_ids)
+            changed = set(old.values_list(fk, flat=True))
+            old.delete()
+            through.objects.bulk_create(
+                through(recipe_id=recipe.id, **{fk: pk})
+                for recipe, pks in given
+                for pk in dict.fromkeys(pks)
+            )
+            changed.update(pk for recipe, pks in given for pk in pks)
+            model.objects.update_recipe_counts(changed)
+
+    def create(self, validated_data):
+        with transaction.atomic():
+            self.resolve_names(validated_data, self.context["request"].user.id)
+            recipes = Recipe.objects.bulk_create(
+                Recipe(
+                    **{
+                        k: v
+                        for k, v in item.items()
+                        if k not in self.relations and k != "id"
+                    }
+                )
+                for item in validated_data
+            )
+            self.set_relations(recipes, validated_data)
+            update_search_index(recipe.id for recipe in recipes)
+            # bulk_create sends no post_save
+            fan_out(recipes)
+        return recipes
+
+    def update(self, instance, validated_data):
+        recipes = [self.recipes[item["id"]] for item in validated_data]
+        with transaction.atomic():
+            # the tags and ingredients created for the names are rolled back
+            # with the recipes
+            self.resolve_names(validated_data, self.context["request"].user.id)
+            fields = {"updated_at"}
+            now = timezone.now()
+            for recipe, item in zip(recipes, validated_data):
+                for field, value in item.items():
+                    if field not in self.relations and field != "id":
+                        setattr(recipe, field, value)
+                        fields.add(field)
+                recipe.updated_at = now
+            Recipe.objects.bulk_update(recipes, fields)
+            self.set_relations(recipes, validated_data)
+            update_search_index(recipe.id for recipe in recipes)
+        return recipes
+
+
+class RecipeBulkSerializer(serializers.ModelSerializer):
+    '''an item of a bulk request, tags and ingredients are plain ids validated
+    for the whole list by RecipeBulkListSerializer'''
+
+    id = serializers.IntegerField(required=False)
+    ingredients = serializers.ListField(
+        child=serializers.IntegerField(), required=False
+    )
+    tags = serializers.ListField(child=serializers.IntegerField(), required=False)
+    ingredient_names = names_field()
+    tag_names = names_field()
+
+    class Meta:
+        model = Recipe
+        fields = (
+            "id",
+            "title",
+            "instruction",
+            "price",
+            "time_minutes",
+            "ingredients",
+            "tags",
+            "ingredient_names",
+            "tag_names",
+        )
+        list_serializer_class = RecipeBulkListSerializer
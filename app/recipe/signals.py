@@ -0,0 +1,236 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_save, post_delete, pre_delete, m2m_changed
+from django.dispatch import receiver
+from recipe import autocomplete, feed, matching
+from recipe.models import Tag, Ingredient, Recipe
+from recipe.cache import invalidate_responses, touch_updated_at
+from recipe.search import update_search_index
+from contextlib import contextmanager
+import threading
+
+# the model whose objects deleting_in_bulk is deleting, the receivers of their
+# deletes leave their work to it
+_local = threading.local()
+
+
+def is_bulk_deleted(model):
+    return getattr(_local, "bulk_model", None) is model
+
+
+@contextmanager
+def deleting_in_bulk(model, pks):
+    '''delete objects of the model with a few queries for all of them rather
+    than a few for each, which the receivers of their deletes would run'''
+    pks = list(pks)
+    if model is Recipe:
+        related = {
+            related_model: list(
+                getattr(Recipe, field).through.objects.filter(recipe_id__in=pks)
+                .values_list(f"{related_model._meta.model_name}_id", flat=True)
+                .distinct()
+            )
+            for field, related_model in (("tags", Tag), ("ingredients", Ingredient))
+        }
+    else:
+        recipe_ids = list(
+            model.recipe_set.through.objects.filter(
+                **{f"{model._meta.model_name}_id__in": pks}
+            )
+            .values_list("recipe_id", flat=True)
+            .distinct()
+        )
+        touch_updated_at(Recipe, recipe_ids)
+    _local.bulk_model = model
+    try:
+        yield
+    finally:
+        _local.bulk_model = None
+    if model is Recipe:
+        for related_model, related_pks in related.items():
+            related_model.objects.update_recipe_counts(related_pks)
+        update_search_index(pks)
+    else:
+        update_search_index(recipe_ids)
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+def invalidate_owner_responses(sender, instance, **kwargs):
+    invalidate_responses(instance.user_id)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+def invalidate_autocomplete(sender, instance, **kwargs):
+    # the other processes see the version of the responses change
+    autocomplete.invalidate(sender, instance.user_id)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def invalidate_relation_owner_responses(sender, instance, action, **kwargs):
+    # instance is the recipe, or the tag or ingredient when the relation is
+    # changed from their side, they all belong to the same user
+    if action.startswith("post_"):
+        invalidate_responses(instance.user_id)
+
+
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_delete, sender=Ingredient)
+def invalidate_ingredient_index(sender, instance, action="post_delete", **kwargs):
+    # deletes cascade to the relation rows without an m2m_changed
+    if action.startswith("post_"):
+        matching.invalidate(instance.user_id)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def touch_relation_sides(sender, instance, action, model, pk_set, **kwargs):
+    '''a relation change changes both sides, e.g. the tag ids of the recipe and
+    whether the tag is assigned, so both are marked as updated'''
+    if action == "pre_clear":
+        # the through model has a foreign key named after each side
+        pk_set = sender.objects.filter(
+            **{instance._meta.model_name: instance.pk}
+        ).values_list(f"{model._meta.model_name}_id", flat=True)
+    if action in ("pre_add", "pre_remove", "pre_clear"):
+        touch_updated_at(type(instance), [instance.pk])
+        touch_updated_at(model, pk_set)
+
+
+@receiver(pre_delete, sender=Tag)
+@receiver(pre_delete, sender=Ingredient)
+def touch_recipes_of_deleted(sender, instance, **kwargs):
+    if is_bulk_deleted(sender):
+        return
+    # the relation rows are deleted by the cascade, which sends no m2m_changed
+    instance.recipe_ids = list(instance.recipe_set.values_list("pk", flat=True))
+    touch_updated_at(Recipe, instance.recipe_ids)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def update_relation_recipe_counts(
+    sender, instance, action, reverse, model, pk_set, **kwargs
+):
+    '''recount the recipes of the tags or ingredients added or removed, or of
+    the tag or ingredient itself when changed from its side'''
+    if reverse:
+        if action in ("post_add", "post_remove", "post_clear"):
+            type(instance).objects.update_recipe_counts([instance.pk])
+    elif action == "pre_clear":
+        instance.cleared_ids = list(
+            sender.objects.filter(recipe=instance.pk).values_list(
+                f"{model._meta.model_name}_id", flat=True
+            )
+        )
+    elif action == "post_clear":
+        model.objects.update_recipe_counts(instance.cleared_ids)
+    elif action in ("post_add", "post_remove"):
+        model.objects.update_recipe_counts(pk_set)
+
+
+@receiver(pre_delete, sender=Recipe)
+def remember_deleted_recipe_relations(sender, instance, **kwargs):
+    if is_bulk_deleted(sender):
+        return
+    # the relation rows are deleted by the cascade, which sends no m2m_changed
+    instance.related_ids = {
+        Tag: list(instance.tags.values_list("pk", flat=True)),
+        Ingredient: list(instance.ingredients.values_list("pk", flat=True)),
+    }
+
+
+@receiver(post_delete, sender=Recipe)
+def update_deleted_recipe_counts(sender, instance, **kwargs):
+    if is_bulk_deleted(sender):
+        return
+    for model, pks in instance.related_ids.items():
+        model.objects.update_recipe_counts(pks)
+
+
+@receiver(post_save, sender=Recipe)
+def update_recipe_search_index(sender, instance, **kwargs):
+    update_search_index([instance.pk])
+
+
+@receiver(post_delete, sender=Recipe)
+def update_deleted_recipe_search_index(sender, instance, **kwargs):
+    if not is_bulk_deleted(sender):
+        update_search_index([instance.pk])
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def update_relation_search_index(sender, instance, action, reverse, pk_set, **kwargs):
+    '''the names of the tags and ingredients of a recipe are searched too'''
+    if not reverse:
+        if action.startswith("post_"):
+            update_search_index([instance.pk])
+    elif action == "pre_clear":
+        # the recipes the tag or ingredient is removed from
+        instance.recipe_ids = list(instance.recipe_set.values_list("pk", flat=True))
+    elif action == "post_clear":
+        update_search_index(instance.recipe_ids)
+    elif action in ("post_add", "post_remove"):
+        update_search_index(pk_set)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+def update_renamed_search_index(sender, instance, created, **kwargs):
+    if not created:
+        update_search_index(instance.recipe_set.values_list("pk", flat=True))
+
+
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+def update_deleted_search_index(sender, instance, **kwargs):
+    if is_bulk_deleted(sender):
+        return
+    update_search_index(instance.recipe_ids)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def invalidate_new_user_responses(sender, instance, created, **kwargs):
+    # a new user may get the id of a deleted one, e.g. when tests roll back
+    if created:
+        invalidate_responses(instance.id)
+
+
+@receiver(post_save, sender=Recipe)
+def fan_out_new_recipe(sender, instance, created, **kwargs):
+    if created:
+        feed.fan_out([instance])
+
+
+@receiver(m2m_changed, sender=get_user_model().following.through)
+def update_follower_timelines(sender, instance, action, reverse, pk_set, **kwargs):
+    '''fill or empty the timelines of the followers when they follow or
+    unfollow authors, from either side of the relation'''
+    if action == "pre_clear":
+        related = instance.followers if reverse else instance.following
+        instance.cleared_follow_ids = set(related.values_list("pk", flat=True))
+        return
+    if action == "post_clear":
+        pk_set = instance.cleared_follow_ids
+    elif action not in ("post_add", "post_remove"):
+        return
+    # pairs of (follower, authors)
+    if reverse:
+        pairs = [(follower_id, [instance.pk]) for follower_id in pk_set]
+    else:
+        pairs = [(instance.pk, pk_set)]
+    for follower_id, author_ids in pairs:
+        if action == "post_add":
+            feed.follow(follower_id, author_ids)
+        else:
+            feed.unfollow(follower_id, author_ids)
@@ -0,0 +1,233 @@
+'''Similar recipes, by the cosine similarity of their features.
+
+A recipe is a sparse vector of a 1 for each of its tags and ingredients, plus
+its price and time, each scaled into [0, 1) by a fixed reference and weighted
+by NUMBER_WEIGHT. The scales are fixed rather than taken from the range of the
+user's recipes so a changed recipe doesn't change the vectors of the others.
+The vectors are the unit rows of a SciPy CSR matrix, so the similarities of a
+block of recipes to all of them are one sparse product, and the k most similar
+of each recipe are kept in NumPy arrays.
+
+The neighbours of a user's recipes are kept in each process in a
+recipe.cache.VersionedLRU. A lookup finding another version of the user's data
+reads the updated_at of the recipes, which every change of a recipe or of its
+tags and ingredients sets, and only reads the features of the new and changed
+ones. Their neighbours are computed again, and so are those of the recipes a
+changed or deleted one was a neighbour of. The neighbours of the others can
+only gain a changed recipe, so they are merged with its similarities.'''
+from django.conf import settings
+from recipe.cache import VersionedLRU
+from recipe.models import Recipe
+import numpy as np
+import scipy.sparse as sp
+
+# the price and the minutes at which their features are 0.5
+PRICE_SCALE = 10
+TIME_SCALE = 30
+NUMBER_WEIGHT = 0.5
+NUMBER_COLUMNS = 2
+# the similarities of this many pairs are computed at once
+BLOCK_SIZE = 4_000_000
+# similarities are compared rounded, so the pairs computed in another order
+# rank the same
+DECIMALS = 9
+
+
+class SimilarityIndex:
+    '''the vectors of recipes and the ids and similarities of the k most
+    similar of each, a row of each array per recipe'''
+
+    def __init__(self, k):
+        self.k = k
+        self.ids = np.empty(0, dtype=np.int64)
+        self.stamps = {}
+        # the column of each ("tags" or "ingredients", id), after the numbers
+        self.columns = {}
+        self.matrix = sp.csr_matrix((0, NUMBER_COLUMNS))
+        self.neighbour_ids = np.empty((0, k), dtype=np.int64)
+        self.similarities = np.empty((0, k))
+
+    def get_changed(self, stamps):
+        '''the ids of the recipes whose stamps aren't the ones indexed'''
+        return [pk for pk, stamp in stamps.items() if self.stamps.get(pk) != stamp]
+
+    def updated(self, recipes, relations):
+        '''a copy for the recipes, (id, updated_at, price, time_minutes) rows,
+        given the (id, "tags" or "ingredients", id) relations of the ones whose
+        updated_at changed'''
+        index = SimilarityIndex(self.k)
+        index.stamps = {pk: stamp for pk, stamp, price, minutes in recipes}
+        index.columns = dict(self.columns)
+        changed = [row for row in recipes if self.stamps.get(row[0]) != row[1]]
+        stale = np.array(
+            [pk for pk in self.stamps if index.stamps.get(pk) != self.stamps[pk]],
+            dtype=np.int64,
+        )
+        kept = ~np.isin(self.ids, stale)
+        vectors = index.vectorize(changed, relations)
+        matrix = self.matrix[kept]
+        matrix = sp.csr_matrix(
+            (matrix.data, matrix.indices, matrix.indptr),
+            shape=(matrix.shape[0], vectors.shape[1]),
+        )
+        index.matrix = sp.vstack([matrix, vectors], format="csr")
+        index.ids = np.concatenate(
+            [self.ids[kept], np.array([row[0] for row in changed], dtype=np.int64)]
+        )
+        index.neighbour_ids = np.concatenate(
+            [self.neighbour_ids[kept], np.zeros((len(changed), self.k), np.int64)]
+        )
+        index.similarities = np.concatenate(
+            [self.similarities[kept], np.zeros((len(changed), self.k))]
+        )
+        old = np.flatnonzero(kept).size
+        # the recipes a stale one was a neighbour of lost it, their next best
+        # can be any recipe
+        lost = np.isin(index.neighbour_ids[:old], stale) & (
+            index.similarities[:old] > 0
+        )
+        recompute = np.concatenate(
+            [np.flatnonzero(lost.any(axis=1)), np.arange(old, len(index.ids))]
+        )
+        merge = np.flatnonzero(~lost.any(axis=1))
+        if len(changed):
+            index.merge_neighbours(merge, np.arange(old, len(index.ids)))
+        index.compute_neighbours(recompute)
+        return index
+
+    def vectorize(self, recipes, relations):
+        '''the unit vectors of the recipes'''
+        rows = {pk: number for number, (pk, *_) in enumerate(recipes)}
+        row_numbers, columns, values = [], [], []
+        for number, (pk, stamp, price, minutes) in enumerate(recipes):
+            price, minutes = max(float(price), 0), max(minutes, 0)
+            row_numbers += [number, number]
+            columns += [0, 1]
+            values += [
+                NUMBER_WEIGHT * price / (price + PRICE_SCALE),
+                NUMBER_WEIGHT * minutes / (minutes + TIME_SCALE),
+            ]
+        for pk, relation, related_id in relations:
+            if pk not in rows:
+                continue
+            key = (relation, related_id)
+            column = self.columns.setdefault(key, NUMBER_COLUMNS + len(self.columns))
+            row_numbers.append(rows[pk])
+            columns.append(column)
+            values.append(1.0)
+        matrix = sp.csr_matrix(
+            (values, (row_numbers, columns)),
+            shape=(len(recipes), NUMBER_COLUMNS + len(self.columns)),
+        )
+        # duplicates are summed, a recipe has a tag or ingredient once
+        matrix.data = np.minimum(matrix.data, 1.0)
+        norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+        norms[norms == 0] = 1
+        return sp.csr_matrix(sp.diags(1 / norms) @ matrix)
+
+    def blocks(self, rows, width):
+        '''the rows in blocks of at most BLOCK_SIZE similarities of width'''
+        size = max(BLOCK_SIZE // max(width, 1), 1)
+        for start in range(0, len(rows), size):
+            yield rows[start:start + size]
+
+    def compute_neighbours(self, rows):
+        '''the k most similar of the rows, of all the recipes'''
+        transposed = self.matrix.T.tocsc()
+        for block in self.blocks(rows, len(self.ids)):
+            scores = np.round((self.matrix[block] @ transposed).toarray(), DECIMALS)
+            # not its own neighbour
+            scores[np.arange(len(block)), block] = 0
+            self.set_best(block, scores, np.broadcast_to(self.ids, scores.shape))
+
+    def merge_neighbours(self, rows, changed):
+        '''add the changed recipes to the neighbours of the rows'''
+        transposed = self.matrix[changed].T.tocsc()
+        for block in self.blocks(rows, len(changed) + self.k):
+            scores = np.round((self.matrix[block] @ transposed).toarray(), DECIMALS)
+            # only the rows a changed recipe ranks among, or ties with
+            gaining = ((scores > 0) & (scores >= self.similarities[block, -1:])).any(
+                axis=1
+            )
+            block, scores = block[gaining], scores[gaining]
+            ids = np.broadcast_to(self.ids[changed], scores.shape)
+            self.set_best(
+                block,
+                np.hstack([self.similarities[block], scores]),
+                np.hstack([self.neighbour_ids[block], ids]),
+            )
+
+    def set_best(self, block, scores, ids):
+        '''keep the k highest positive scores of each row, the lower id first
+        among equal ones'''
+        k = min(self.k, scores.shape[1])
+        for number, row in enumerate(block):
+            row_scores, row_ids = scores[number], ids[number]
+            if row_scores.size > k:
+                # the kth highest, and the ones equal to it
+                threshold = np.partition(row_scores, -k)[-k]
+                candidates = np.flatnonzero(row_scores >= threshold)
+            else:
+                candidates = np.arange(row_scores.size)
+            candidates = candidates[row_scores[candidates] > 0]
+            best = candidates[
+                np.lexsort((row_ids[candidates], -row_scores[candidates]))[:k]
+            ]
+            self.neighbour_ids[row] = 0
+            self.similarities[row] = 0
+            self.neighbour_ids[row, :len(best)] = row_ids[best]
+            self.similarities[row, :len(best)] = row_scores[best]
+
+    def similar(self, recipe_id, limit):
+        '''the ids and similarities of the limit recipes most similar to the
+        recipe, None for a recipe not indexed'''
+        rows = np.flatnonzero(self.ids == recipe_id)
+        if not rows.size:
+            return None
+        row = rows[0]
+        return [
+            (int(pk), float(score))
+            for pk, score in zip(
+                self.neighbour_ids[row, :limit], self.similarities[row, :limit]
+            )
+            if score > 0
+        ]
+
+
+def read_relations(user_id, recipe_ids=None):
+    '''the (recipe id, "tags" or "ingredients", id) of the user's recipes, or of
+    the recipe ids'''
+    for field, fk in (("tags", "tag_id"), ("ingredients", "ingredient_id")):
+        through = getattr(Recipe, field).through.objects
+        if recipe_ids is None:
+            through = through.filter(recipe__user_id=user_id)
+        else:
+            through = through.filter(recipe_id__in=recipe_ids)
+        for recipe_id, related_id in through.values_list("recipe_id", fk).iterator():
+            yield recipe_id, field, related_id
+
+
+def update_index(index, user_id):
+    '''the index of the user's recipes, updated from the outdated one'''
+    if index is None:
+        index = SimilarityIndex(settings.SIMILAR_RECIPES_K)
+    recipes = list(
+        Recipe.objects.filter(user_id=user_id)
+        .order_by("id")
+        .values_list("id", "updated_at", "price", "time_minutes")
+    )
+    changed = index.get_changed({row[0]: row[1] for row in recipes})
+    # all the user's relations are read at once for a new index
+    relations = read_relations(
+        user_id, None if len(changed) == len(recipes) else changed
+    )
+    return index.updated(recipes, list(relations))
+
+
+_indexes = VersionedLRU(update_index, "SIMILAR_RECIPES_USERS")
+
+
+def similar_recipes(user_id, recipe_id, limit):
+    '''the ids and cosine similarities of the limit recipes of the user most
+    similar to the recipe, the most similar first'''
+    return _indexes.get(user_id).similar(recipe_id, limit)
@@ -0,0 +1,160 @@
+from recipe.tests.utils import AuthenticatedAPITestCase, create_recipe
+from recipe.models import Recipe, Ingredient, Tag
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from rest_framework import status
+from rest_framework_simplejwt.tokens import AccessToken
+from users.authentication import revoke_tokens
+from asgiref.sync import async_to_sync, sync_to_async
+from freezegun import freeze_time
+
+User = get_user_model()
+recipe_list_url = reverse("recipe:recipe-list")
+async_recipe_list_url = reverse("recipe:async-recipe-list")
+async_tags_url = reverse("recipe:async-tag-list")
+async_ingredients_url = reverse("recipe:async-ingredient-list")
+
+
+def get_recipe_detail_url(pk):
+    return reverse("recipe:recipe-detail", args=[pk])
+
+
+def get_async_recipe_detail_url(pk):
+    return reverse("recipe:async-recipe-detail", args=[pk])
+
+
+class AsyncRecipeViewTests(AuthenticatedAPITestCase):
+    '''test the async views answer as the viewsets do'''
+
+    def setUp(self):
+        super().setUp()
+        self.auth = f"Bearer {AccessToken.for_user(self.user)}"
+        self.tag = Tag.objects.create(user=self.user, name="vegan")
+        self.recipe = create_recipe(self.user, title="Soup")
+        self.recipe.tags.add(self.tag)
+        self.recipe.ingredients.add(
+            Ingredient.objects.create(user=self.user, name="salt")
+        )
+
+    async def aget(self, url, data=None, auth=None):
+        return await self.async_client.get(
+            url, data, headers={"Authorization": auth or self.auth}
+        )
+
+    async def sync_get(self, url):
+        '''the same request to the viewset'''
+        return await sync_to_async(self.client.get)(url)
+
+    async def test_list_recipes(self):
+        '''test the list is the same as the viewset's, with its filters'''
+        other = await Recipe.objects.acreate(
+            user=self.user, title="Stew", price=1, time_minutes=5
+        )
+        r = await self.aget(async_recipe_list_url)
+        self.assertEqual(r.status_code, status.HTTP_200_OK)
+        expected = (await self.sync_get(recipe_list_url)).json()
+        self.assertEqual(r.json(), expected)
+        self.assertEqual(len(expected["results"]), 2)
+
+        r = await self.aget(async_recipe_list_url, {"tags": str(self.tag.id)})
+        self.assertEqual([item["id"] for item in r.json()["results"]], [self.recipe.id])
+        r = await self.aget(async_recipe_list_url, {"search": "stew"})
+        self.assertEqual([item["id"] for item in r.json()["results"]], [other.id])
+
+    async def test_list_recipes_pages(self):
+        '''test the pages are read by a cursor both ways'''
+        ids = [self.recipe.id]
+        for i in range(4):
+            recipe = await Recipe.objects.acreate(
+                user=self.user, title=f"recipe{i}", price=1, time_minutes=5
+            )
+            ids.append(recipe.id)
+        r = await self.aget(async_recipe_list_url, {"page_size": 2})
+        found = []
+        while True:
+            data = r.json()
+            found += [item["id"] for item in data["results"]]
+            if not data["next"]:
+                break
+            r = await self.aget(data["next"])
+        self.assertEqual(found, ids)
+        r = await self.aget(data["previous"])
+        self.assertEqual([item["id"] for item in r.json()["results"]], ids[2:4])
+
+    def test_list_recipes_query_count(self):
+        '''test the change stamp, the page and each relation are read in one
+        query each, and the cached response in none'''
+        with self.assertNumQueries(4):
+            r = async_to_sync(self.aget)(async_recipe_list_url)
+        self.assertEqual(r.status_code, status.HTTP_200_OK)
+        with self.assertNumQueries(0):
+            r = async_to_sync(self.aget)(async_recipe_list_url)
+        self.assertEqual(len(r.json()["results"]), 1)
+
+    async def test_conditional_get(self):
+        '''test a current copy is answered with a 304 until the recipe
+        changes'''
+        url = get_async_recipe_detail_url(self.recipe.id)
+        r = await self.aget(url)
+        self.assertIn("Last-Modified", r.headers)
+        etag = r.headers["ETag"]
+        r = await self.async_client.get(
+            url, headers={"Authorization": self.auth, "If-None-Match": etag}
+        )
+        self.assertEqual(r.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.recipe.title = "Stew"
+        await self.recipe.asave()
+        r = await self.async_client.get(
+            url, headers={"Authorization": self.auth, "If-None-Match": etag}
+        )
+        self.assertEqual(r.status_code, status.HTTP_200_OK)
+        self.assertEqual(r.json()["title"], "Stew")
+
+    async def test_retrieve_recipe(self):
+        r = await self.aget(get_async_recipe_detail_url(self.recipe.id))
+        self.assertEqual(r.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            r.json(),
+            (await self.sync_get(get_recipe_detail_url(self.recipe.id))).json(),
+        )
+        self.assertEqual(r.json()["tags"], [{"name": "vegan", "id": self.tag.id}])
+
+    async def test_retrieve_others_recipe(self):
+        user2 = await User.objects.acreate(email="testuser2@email.com")
+        recipe = await Recipe.objects.acreate(
+            user=user2, title="Stew", price=1, time_minutes=5
+        )
+        r = await self.aget(get_async_recipe_detail_url(recipe.id))
+        self.assertEqual(r.status_code, status.HTTP_404_NOT_FOUND)
+
+    async def test_list_tags_and_ingredients(self):
+        await Tag.objects.acreate(user=self.user, name="breakfast")
+        r = await self.aget(async_tags_url)
+        self.assertEqual(
+            [item["name"] for item in r.json()["results"]], ["breakfast", "vegan"]
+        )
+        r = await self.aget(async_tags_url, {"assigned_only": 1})
+        self.assertEqual([item["name"] for item in r.json()["results"]], ["vegan"])
+        r = await self.aget(async_ingredients_url)
+        self.assertEqual([item["name"] for item in r.json()["results"]], ["salt"])
+
+    async def test_authentication_required(self):
+        r = await self.async_client.get(async_recipe_list_url)
+        self.assertEqual(r.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertIn("WWW-Authenticate", r.headers)
+        r = await self.aget(async_tags_url, auth="Bearer nonsense")
+        self.assertEqual(r.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    async def test_revoked_token(self):
+        '''test tokens issued before the user's tokens were revoked are
+        rejected'''
+        with freeze_time("2023-01-01 00:00:00"):
+            token = AccessToken.for_user(self.user)
+        with freeze_time("2023-01-01 00:00:01"):
+            auth = f"Bearer {token}"
+            r = await self.aget(async_tags_url, auth=auth)
+            self.assertEqual(r.status_code, status.HTTP_200_OK)
+            revoke_tokens(self.user.id)
+            r = await self.aget(async_tags_url, auth=auth)
+        self.assertEqual(r.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(r.json()["code"], "token_revoked")
@@ -0,0 +1,94 @@
+from recipe.tests.utils import AuthenticatedAPITestCase, create_recipe
+from recipe.models import Tag
+from recipe import autocomplete
+from recipe.cache import bump_version
+from django.contrib.auth import get_user_model
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework import status
+
+User = get_user_model()
+tags_url = reverse("recipe:tag-list")
+tag_autocomplete_url = reverse("recipe:tag-autocomplete")
+ingredient_autocomplete_url = reverse("recipe:ingredient-autocomplete")
+
+
+class AutocompleteTests(AuthenticatedAPITestCase):
+    '''test completing the prefixes of the names of tags and ingredients,
+    from the trie and from the database'''
+
+    def setUp(self):
+        super().setUp()
+        self.tags = {
+            name: Tag.objects.create(user=self.user, name=name)
+            for name in ("Tomato", "toast", "tofu", "vegan")
+        }
+        recipe = create_recipe(self.user)
+        recipe.tags.add(self.tags["tofu"], self.tags["vegan"])
+        create_recipe(self.user).tags.add(self.tags["tofu"])
+        Tag.objects.create(
+            user=User.objects.create_user(email="testuser2@email.com"), name="tonic"
+        )
+
+    def complete(self, prefix, url=tag_autocomplete_url, **params):
+        r = self.client.get(url, {"prefix": prefix, **params})
+        self.assertEqual(r.status_code, status.HTTP_200_OK)
+        return [item["name"] for item in r.data]
+
+    def check_completions(self):
+        self.assertEqual(self.complete("to"), ["tofu", "toast", "Tomato"])
+        self.assertEqual(self.complete("TOM"), ["Tomato"])
+        self.assertEqual(self.complete("x"), [])
+        self.assertEqual(self.complete("", limit=2), ["tofu", "vegan"])
+        r = self.client.get(tag_autocomplete_url, {"prefix": "tof"})
+        self.assertEqual(r.data, [{"name": "tofu", "id": self.tags["tofu"].id}])
+
+    def test_complete_from_trie(self):
+        '''test the completions are the user's, most used first then by name'''
+        self.check_completions()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.complete("toa"), ["toast"])
+
+    @override_settings(AUTOCOMPLETE_TRIE=False)
+    def test_complete_from_database(self):
+        self.check_completions()
+
+    def test_trie_invalidated(self):
+        '''test new names, renames, deletes and recipe counts are seen'''
+        self.complete("to")
+        Tag.objects.create(user=self.user, name="tortilla")
+        self.assertEqual(self.complete("tor"), ["tortilla"])
+        self.tags["toast"].name = "bread"
+        self.tags["toast"].save()
+        self.assertEqual(self.complete("toa"), [])
+        self.tags["tofu"].delete()
+        create_recipe(self.user).tags.add(self.tags["Tomato"])
+        self.assertEqual(self.complete("to"), ["Tomato", "tortilla"])
+
+    def test_trie_invalidated_by_other_process(self):
+        '''test a trie is built again when the user's data changed in
+        another process, which only bumps the shared version'''
+        self.complete("to")
+        Tag.objects.filter(id=self.tags["toast"].id).update(name="bread")
+        self.assertEqual(self.complete("toa"), ["toast"])
+        bump_version(self.user.id)
+        self.assertEqual(self.complete("toa"), [])
+
+    @override_settings(AUTOCOMPLETE_TRIE_USERS=1)
+    def test_tries_bounded(self):
+        self.complete("to")
+        self.complete("sa", url=ingredient_autocomplete_url)
+        self.assertEqual(len(autocomplete._tries), 1)
+
+    def test_invalid_limit(self):
+        for limit in (0, "x", 1000):
+            r = self.client.get(tag_autocomplete_url, {"prefix": "to", "limit": limit})
+            self.assertEqual(r.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn("limit", r.data)
+
+    def test_list_prefix(self):
+        '''test the list can be narrowed to a prefix too'''
+        r = self.client.get(tags_url, {"prefix": "TO"})
+        self.assertEqual(
+            [item["name"] for item in r.data["results"]], ["Tomato", "toast", "tofu"]
+        )
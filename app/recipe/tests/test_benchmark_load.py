@@ -0,0 +1,34 @@
+from django.core.management import call_command, CommandError
+from django.test import LiveServerTestCase
+from io import StringIO
+
+
+class BenchmarkLoadTests(LiveServerTestCase):
+    '''test the load benchmark against a live server'''
+
+    def test_benchmark_load(self):
+        out = StringIO()
+        call_command(
+            "benchmark_load",
+            url=self.live_server_url,
+            requests=12,
+            concurrency=2,
+            warmup=0,
+            stdout=out,
+        )
+        output = out.getvalue()
+        self.assertIn("all: 12 requests, 0 errors", output)
+        self.assertIn("/api/recipe/recipes/: 4 requests", output)
+        self.assertIn("req/s", output)
+
+    def test_benchmark_load_min_rps(self):
+        with self.assertRaises(CommandError):
+            call_command(
+                "benchmark_load",
+                url=self.live_server_url,
+                paths=["/api/recipe/tags/"],
+                requests=2,
+                warmup=0,
+                min_rps=10**9,
+                stdout=StringIO(),
+            )
@@ -0,0 +1,276 @@
+from recipe.tests.utils import AuthenticatedAPITestCase, create_recipe
+from recipe.models import Recipe, Ingredient, Tag
+from django.contrib.auth import get_user_model
+from django.db import connection, DatabaseError
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from unittest.mock import patch
+
+User = get_user_model()
+recipe_bulk_url = reverse("recipe:recipe-bulk")
+recipe_list_url = reverse("recipe:recipe-list")
+tag_bulk_url = reverse("recipe:tag-bulk")
+ingredient_bulk_url = reverse("recipe:ingredient-bulk")
+
+
+def recipe_payloads(count, tags=(), ingredients=()):
+    return [
+        {
+            "title": f"recipe{i}",
+            "price": "3.56",
+            "time_minutes": 5,
+            "tags": list(tags),
+            "ingredients": list(ingredients),
+        }
+        for i in range(count)
+    ]
+
+
+class BulkRecipeTests(AuthenticatedAPITestCase):
+    '''test creating, updating and deleting many recipes in one request'''
+
+    def setUp(self):
+        super().setUp()
+        self.tags = [
+            Tag.objects.create(user=self.user, name=f"tag{i}") for i in range(3)
+        ]
+        self.ingredients = [
+            Ingredient.objects.create(user=self.user, name=f"ingredient{i}")
+            for i in range(3)
+        ]
+
+    def test_bulk_create(self):
+        '''test recipes are created with their tags and ingredients and
+        returned in the order they were given'''
+        tag_ids = [tag.id for tag in self.tags]
+        ingredient_ids = [ingredient.id for ingredient in self.ingredients[:2]]
+        payload = recipe_payloads(3, tag_ids, ingredient_ids)
+        r = self.client.post(recipe_bulk_url, payload, format="json")
+        self.assertEqual(r.status_code, status.HTTP_201_CREATED)
+        titles = [item["title"] for item in r.data]
+        self.assertEqual(titles, ["recipe0", "recipe1", "recipe2"])
+        for item in r.data:
+            recipe = Recipe.objects.get(id=item["id"])
+            self.assertEqual(recipe.user, self.user)
+            self.assertEqual(item["tags"], tag_ids)
+            self.assertEqual(
+                sorted(recipe.ingredients.values_list("id", flat=True)), ingredient_ids
+            )
+
+    def test_bulk_create_query_count(self):
+        '''test the number of queries doesn't grow with the number of recipes'''
+        tag_ids = [tag.id for tag in self.tags]
+        with CaptureQueriesContext(connection) as few:
+            self.client.post(
+                recipe_bulk_url, recipe_payloads(2, tag_ids), format="json"
+            )
+        with CaptureQueriesContext(connection) as many:
+            r = self.client.post(
+                recipe_bulk_url, recipe_payloads(50, tag_ids), format="json"
+            )
+        self.assertEqual(r.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(many), len(few))
+
+    def test_bulk_create_with_names(self):
+        '''test recipes can refer to tags and ingredients by name, the new
+        ones being created once for all the recipes'''
+        payload = recipe_payloads(2, tags=[self.tags[0].id])
+        payload[0]["tag_names"] = ["Tag1", "dinner"]
+        payload[1]["tag_names"] = ["dinner"]
+        payload[1]["ingredient_names"] = ["salt", "Œuf"]
+        r = self.client.post(recipe_bulk_url, payload, format="json")
+        self.assertEqual(r.status_code, status.HTTP_201_CREATED)
+        dinner = self.user.tag_set.get(name="dinner")
+        salt = self.user.ingredient_set.get(name="salt")
+        self.assertEqual(
+            r.data[0]["tags"], sorted([self.tags[0].id, self.tags[1].id, dinner.id])
+        )
+        self.assertEqual(r.data[1]["tags"], sorted([self.tags[0].id, dinner.id]))
+        egg = self.user.ingredient_set.get(name="Œuf")
+        self.assertEqual(r.data[1]["ingredients"], sorted([salt.id, egg.id]))
+
+    def test_bulk_create_invalid(self):
+        '''test nothing is created when an item is invalid, and the errors are
+        reported per item'''
+        user2 = User.objects.create_user(
+            email="testuser2@email.com", password="testing321"
+        )
+        other_tag = Tag.objects.create(user=user2, name="other tag")
+        payload = recipe_payloads(3)
+        del payload[2]["title"]
+        r = self.client.post(recipe_bulk_url, payload, format="json")
+        self.assertEqual(r.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(list(r.data), [2])
+        self.assertIn("title", r.data[2])
+
+        payload = recipe_payloads(3)
+        payload[1]["tags"] = [other_tag.id]
+        r = self.client.post(recipe_bulk_url, payload, format="json")
+        self.assertEqual(r.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(list(r.data), [1])
+        self.assertIn("tags", r.data[1])
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_bulk_create_too_many(self):
+        '''test the number of items of a request is limited'''
+        with self.settings(BULK_MAX_ITEMS=2):
+            r = self.client.post(recipe_bulk_url, recipe_payloads(3), format="json")
+        self.assertEqual(r.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_bulk_update(self):
+        '''test recipes are partially updated and only the relations given are
+        replaced'''
+        recipe1 = create_recipe(self.user, title="recipe1")
+        recipe2 = create_recipe(self.user, title="recipe2")
+        recipe1.tags.set(self.tags[:2])
+        recipe2.tags.set(self.tags[:2])
+        payload = [
+            {"id": recipe2.id, "title": "recipe2 updated", "tags": [self.tags[2].id]},
+            {"id": recipe1.id, "price": "4.50"},
+        ]
+        r = self.client.patch(recipe_bulk_url, payload, format="json")
+        self.assertEqual(r.status_code, status.HTTP_200_OK)
+        self.assertEqual([item["id"] for item in r.data], [recipe2.id, recipe1.id])
+        recipe1.refresh_from_db()
+        recipe2.refresh_from_db()
+        self.assertEqual(recipe2.title, "recipe2 updated")
+        self.assertEqual(list(recipe2.tags.all()), [self.tags[2]])
+        self.assertEqual(str(recipe1.price), "4.50")
+        self.assertEqual(list(recipe1.tags.all()), self.tags[:2])
+
+    def test_bulk_update_failing_keeps_no_names(self):
+        '''test the tags created for the names of a failing update are rolled
+        back with it'''
+        recipe = create_recipe(self.user)
+        payload = [{"id": recipe.id, "tag_names": ["brand new"]}]
+        with patch.object(
+            Recipe.objects, "bulk_update", side_effect=DatabaseError("failed")
+        ):
+            with self.assertRaises(DatabaseError):
+                self.client.patch(recipe_bulk_url, payload, format="json")
+        self.assertFalse(Tag.objects.filter(name="brand new").exists())
+
+    def test_bulk_update_others_recipe(self):
+        '''test one can't update another user's recipes'''
+        user2 = User.objects.create_user(
+            email="testuser2@email.com", password="testing321"
+        )
+        recipe = create_recipe(user2)
+        payload = [{"id": recipe.id, "title": "hacked"}, {"title": "no id"}]
+        r = self.client.patch(recipe_bulk_url, payload, format="json")
+        self.assertEqual(r.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("id", r.data[0])
+        self.assertIn("id", r.data[1])
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.title, "recipe")
+
+    def test_bulk_delete(self):
+        '''test recipes are deleted by id, reporting the ids not found'''
+        recipe1 = create_recipe(self.user)
+        recipe2 = create_recipe(self.user)
+        user2 = User.objects.create_user(
+            email="testuser2@email.com", password="testing321"
+        )
+        other = create_recipe(user2)
+        r = self.client.delete(
+            recipe_bulk_url, {"ids": [recipe1.id, other.id]}, format="json"
+        )
+        self.assertEqual(r.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            r.data,
+            [{"id": recipe1.id, "deleted": True}, {"id": other.id, "deleted": False}],
+        )
+        self.assertEqual(
+            list(Recipe.objects.order_by("id")), [recipe2, other]
+        )
+
+    def test_bulk_delete_recipe_counts(self):
+        '''test the recipe counts of the tags and ingredients of the deleted
+        recipes are updated'''
+        recipes = [create_recipe(self.user) for _ in range(3)]
+        for recipe in recipes:
+            recipe.tags.add(*self.tags[:2])
+            recipe.ingredients.add(self.ingredients[0])
+        ids = [recipe.id for recipe in recipes[:2]]
+        r = self.client.delete(recipe_bulk_url, {"ids": ids}, format="json")
+        self.assertEqual(r.status_code, status.HTTP_200_OK)
+        self.tags[0].refresh_from_db()
+        self.ingredients[0].refresh_from_db()
+        self.assertEqual(self.tags[0].recipe_count, 1)
+        self.assertEqual(self.ingredients[0].recipe_count, 1)
+
+    def test_bulk_delete_query_count(self):
+        '''test the number of queries doesn't grow with the number of recipes'''
+
+        def delete(count):
+            recipes = [create_recipe(self.user) for _ in range(count)]
+            for recipe in recipes:
+                recipe.tags.add(*self.tags[:2])
+            ids = [recipe.id for recipe in recipes]
+            with CaptureQueriesContext(connection) as queries:
+                r = self.client.delete(recipe_bulk_url, {"ids": ids}, format="json")
+            self.assertEqual(r.status_code, status.HTTP_200_OK)
+            return len(queries)
+
+        self.assertEqual(delete(50), delete(2))
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_bulk_invalidates_cached_list(self):
+        '''test recipes created in bulk show up in a cached list'''
+        self.client.get(recipe_list_url)
+        self.client.post(recipe_bulk_url, recipe_payloads(2), format="json")
+        r = self.client.get(recipe_list_url)
+        self.assertEqual(len(r.data["results"]), 2)
+
+
+class BulkTagIngredientTests(AuthenticatedAPITestCase):
+    '''test creating and deleting many tags and ingredients in one request'''
+
+    def test_bulk_create_tags(self):
+        payload = [{"name": "tag1"}, {"name": "tag2"}]
+        r = self.client.post(tag_bulk_url, payload, format="json")
+        self.assertEqual(r.status_code, status.HTTP_201_CREATED)
+        self.assertEqual([item["name"] for item in r.data], ["tag1", "tag2"])
+        self.assertEqual(self.user.tag_set.count(), 2)
+
+    def test_bulk_create_taken_names(self):
+        '''test names already taken, or given twice, resolve to the same tag'''
+        tag1 = Tag.objects.create(user=self.user, name="tag1")
+        payload = [{"name": "TAG1"}, {"name": "tag2"}, {"name": "Tag2"}]
+        r = self.client.post(tag_bulk_url, payload, format="json")
+        self.assertEqual(r.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(r.data[0], {"id": tag1.id, "name": "tag1"})
+        self.assertEqual(r.data[1], r.data[2])
+        self.assertEqual(self.user.tag_set.count(), 2)
+
+    def test_bulk_create_and_delete_ingredients(self):
+        payload = [{"name": "ingredient1"}, {"name": "ingredient2"}]
+        r = self.client.post(ingredient_bulk_url, payload, format="json")
+        ids = [item["id"] for item in r.data]
+        r = self.client.delete(ingredient_bulk_url, {"ids": ids}, format="json")
+        self.assertEqual(r.status_code, status.HTTP_200_OK)
+        self.assertFalse(self.user.ingredient_set.exists())
+
+    def test_bulk_delete_tags_query_count(self):
+        '''test the number of queries doesn't grow with the number of tags,
+        and their recipes are marked as updated'''
+        recipe = create_recipe(self.user)
+
+        def delete(count):
+            tags = [
+                Tag.objects.create(user=self.user, name=f"tag{count}-{i}")
+                for i in range(count)
+            ]
+            recipe.tags.add(*tags)
+            updated_at = Recipe.objects.get(id=recipe.id).updated_at
+            ids = [tag.id for tag in tags]
+            with CaptureQueriesContext(connection) as queries:
+                r = self.client.delete(tag_bulk_url, {"ids": ids}, format="json")
+            self.assertEqual(r.status_code, status.HTTP_200_OK)
+            self.assertGreater(Recipe.objects.get(id=recipe.id).updated_at, updated_at)
+            return len(queries)
+
+        self.assertEqual(delete(50), delete(2))
+        self.assertFalse(recipe.tags.exists())
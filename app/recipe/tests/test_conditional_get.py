@@ -0,0 +1,126 @@
+from recipe.tests.utils import AuthenticatedAPITestCase, create_recipe
+from recipe.models import Ingredient, Tag
+from django.core.cache import cache
+from django.urls import reverse
+from rest_framework import status
+from freezegun import freeze_time
+
+recipe_list_url = reverse("recipe:recipe-list")
+tags_url = reverse("recipe:tag-list")
+
+
+def get_recipe_detail_url(pk):
+    return reverse("recipe:recipe-detail", args=[pk])
+
+
+class ConditionalGetTests(AuthenticatedAPITestCase):
+    '''test recipe, tag and ingredient reads answer 304 Not Modified when the
+    client's copy is still current'''
+
+    def setUp(self):
+        super().setUp()
+        self.recipe = create_recipe(self.user)
+
+    def test_list_etag(self):
+        '''test the list has a strong etag and no Last-Modified'''
+        r = self.client.get(recipe_list_url)
+        self.assertTrue(r["ETag"].startswith('"'))
+        self.assertNotIn("Last-Modified", r)
+
+    def test_list_not_modified(self):
+        '''test a list with the client's etag is answered with a 304, also when
+        the response has dropped out of the cache'''
+        etag = self.client.get(recipe_list_url)["ETag"]
+        r = self.client.get(recipe_list_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(r.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(r["ETag"], etag)
+        self.assertEqual(r.content, b"")
+
+        cache.clear()
+        with self.assertNumQueries(1):
+            r = self.client.get(recipe_list_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(r.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_list_etag_per_query(self):
+        '''test filtered lists and pages have etags of their own'''
+        etag = self.client.get(recipe_list_url)["ETag"]
+        r = self.client.get(recipe_list_url, {"tags": "1"}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(r.status_code, status.HTTP_200_OK)
+
+    def test_list_modified(self):
+        '''test the etag changes when a recipe is created, updated or deleted'''
+        etags = [self.client.get(recipe_list_url)["ETag"]]
+        recipe2 = create_recipe(self.user, title="recipe2")
+        etags.append(self.client.get(recipe_list_url)["ETag"])
+        recipe2.title = "recipe updated"
+        recipe2.save()
+        etags.append(self.client.get(recipe_list_url)["ETag"])
+        self.assertEqual(len(set(etags)), 3)
+        recipe2.delete()
+        r = self.client.get(recipe_list_url, HTTP_IF_NONE_MATCH=", ".join(etags[1:]))
+        self.assertEqual(r.status_code, status.HTTP_200_OK)
+        # the list is back to how it was at first
+        self.assertEqual(r["ETag"], etags[0])
+
+    @freeze_time("2023-01-01 00:00:00")
+    def test_list_modified_by_relations(self):
+        '''test adding a tag to a recipe changes the etag of the list'''
+        tag = Tag.objects.create(user=self.user, name="tag1")
+        etag = self.client.get(recipe_list_url)["ETag"]
+        with freeze_time("2023-01-01 00:00:01"):
+            self.recipe.tags.add(tag)
+            r = self.client.get(recipe_list_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(r.status_code, status.HTTP_200_OK)
+
+    @freeze_time("2023-01-01 00:00:00")
+    def test_list_modified_by_deleted_tag(self):
+        '''test deleting a tag of a recipe changes the etag of the list'''
+        tag = Tag.objects.create(user=self.user, name="tag1")
+        self.recipe.tags.add(tag)
+        etag = self.client.get(recipe_list_url)["ETag"]
+        with freeze_time("2023-01-01 00:00:01"):
+            tag.delete()
+            r = self.client.get(recipe_list_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(r.status_code, status.HTTP_200_OK)
+        self.assertEqual(r.data["results"][0]["tags"], [])
+
+    @freeze_time("2023-01-01 00:00:00")
+    def test_detail_last_modified(self):
+        '''test a detail has a Last-Modified and answers If-Modified-Since'''
+        recipe = create_recipe(self.user, title="recipe2")
+        url = get_recipe_detail_url(recipe.id)
+        r = self.client.get(url)
+        self.assertEqual(r["Last-Modified"], "Sun, 01 Jan 2023 00:00:00 GMT")
+        r = self.client.get(url, HTTP_IF_MODIFIED_SINCE=r["Last-Modified"])
+        self.assertEqual(r.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    @freeze_time("2023-01-01 00:00:00")
+    def test_detail_modified_by_ingredient_rename(self):
+        '''test renaming an ingredient of a recipe changes its detail'''
+        recipe = create_recipe(self.user, title="recipe2")
+        ingredient = Ingredient.objects.create(user=self.user, name="ingredient1")
+        recipe.ingredients.add(ingredient)
+        url = get_recipe_detail_url(recipe.id)
+        etag = self.client.get(url)["ETag"]
+        with freeze_time("2023-01-01 00:00:01"):
+            ingredient.name = "ingredient renamed"
+            ingredient.save()
+            r = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(r.status_code, status.HTTP_200_OK)
+        self.assertEqual(r["Last-Modified"], "Sun, 01 Jan 2023 00:00:01 GMT")
+
+    def test_detail_not_found(self):
+        '''test the etag of a missing recipe doesn't get in the way of a 404'''
+        r = self.client.get(get_recipe_detail_url(self.recipe.id + 1))
+        self.assertEqual(r.status_code, status.HTTP_404_NOT_FOUND)
+        r = self.client.get(get_recipe_detail_url("not-an-id"))
+        self.assertEqual(r.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_tags_not_modified(self):
+        '''test the tag list answers If-None-Match and changes with new tags'''
+        etag = self.client.get(tags_url)["ETag"]
+        r = self.client.get(tags_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(r.status_code, status.HTTP_304_NOT_MODIFIED)
+        Tag.objects.create(user=self.user, name="tag1")
+        r = self.client.get(tags_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(r.status_code, status.HTTP_200_OK)
@@ -0,0 +1,104 @@
+from recipe.tests.utils import AuthenticatedAPITestCase, create_recipe
+from recipe.models import Ingredient, Tag
+from django.contrib.auth import get_user_model
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework import status
+import gzip
+import json
+
+User = get_user_model()
+export_url = reverse("recipe:recipe-export")
+
+
+class RecipeExportTests(AuthenticatedAPITestCase):
+    '''test the export streams the user's recipes as NDJSON'''
+
+    def export(self, **params):
+        r = self.client.get(export_url, params)
+        self.assertEqual(r.status_code, status.HTTP_200_OK)
+        self.assertTrue(r.streaming)
+        return r
+
+    def read_lines(self, r):
+        content = b"".join(r.streaming_content)
+        return [json.loads(line) for line in content.decode().splitlines()]
+
+    def test_export_recipes(self):
+        '''test each of the user's recipes is a line, with the names of its
+        tags and ingredients'''
+        recipe = create_recipe(self.user, title="Soup", instruction="Boil")
+        recipe.tags.add(Tag.objects.create(user=self.user, name="vegan"))
+        recipe.ingredients.add(Ingredient.objects.create(user=self.user, name="salt"))
+        other = create_recipe(self.user, title="Stew")
+        user2 = User.objects.create_user(email="testuser2@email.com")
+        create_recipe(user2)
+
+        r = self.export()
+        self.assertEqual(r["Content-Type"], "application/x-ndjson")
+        self.assertIn("attachment", r["Content-Disposition"])
+        self.assertEqual(
+            self.read_lines(r),
+            [
+                {
+                    "id": recipe.id,
+                    "title": "Soup",
+                    "instruction": "Boil",
+                    "price": "3.56",
+                    "time_minutes": 5,
+                    "tags": ["vegan"],
+                    "ingredients": ["salt"],
+                },
+                {
+                    "id": other.id,
+                    "title": "Stew",
+                    "instruction": "",
+                    "price": "3.56",
+                    "time_minutes": 5,
+                    "tags": [],
+                    "ingredients": [],
+                },
+            ],
+        )
+
+    def test_export_filtered(self):
+        tag = Tag.objects.create(user=self.user, name="vegan")
+        recipe = create_recipe(self.user)
+        recipe.tags.add(tag)
+        create_recipe(self.user)
+        lines = self.read_lines(self.export(tags=str(tag.id)))
+        self.assertEqual([line["id"] for line in lines], [recipe.id])
+
+    @override_settings(RECIPE_EXPORT_CHUNK_SIZE=2)
+    def test_export_chunks(self):
+        '''test the recipes are read with one query and their relations are
+        prefetched a chunk at a time'''
+        ids = []
+        for i in range(5):
+            recipe = create_recipe(self.user, title=f"recipe{i}")
+            recipe.tags.add(Tag.objects.create(user=self.user, name=f"tag{i}"))
+            ids.append(recipe.id)
+        r = self.export()
+        with self.assertNumQueries(1 + 3 * 2):
+            chunks = list(r.streaming_content)
+        self.assertEqual(len(chunks), 3)
+        lines = [json.loads(line) for line in b"".join(chunks).decode().splitlines()]
+        self.assertEqual([line["id"] for line in lines], ids)
+        self.assertEqual(lines[4]["tags"], ["tag4"])
+
+    def test_export_gzip(self):
+        '''test the export is gzipped for clients accepting it'''
+        create_recipe(self.user, title="Soup")
+        r = self.client.get(export_url, HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(r["Content-Encoding"], "gzip")
+        self.assertIn("Accept-Encoding", r["Vary"])
+        content = gzip.decompress(b"".join(r.streaming_content))
+        self.assertEqual(json.loads(content)["title"], "Soup")
+
+    def test_export_empty(self):
+        self.assertEqual(self.read_lines(self.export()), [])
+
+    def test_export_requires_auth(self):
+        self.client.force_authenticate(None)
+        r = self.client.get(export_url)
+        self.assertEqual(r.status_code, status.HTTP_401_UNAUTHORIZED)
@@ -0,0 +1,76 @@
+from recipe.tests.utils import AuthenticatedAPITestCase, create_recipe
+from recipe.models import Ingredient, Tag
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from rest_framework import status
+
+User = get_user_model()
+facets_url = reverse("recipe:recipe-facets")
+
+
+class FacetTests(AuthenticatedAPITestCase):
+    '''test the tag and ingredient counts of the recipes matching the
+    filters'''
+
+    def setUp(self):
+        super().setUp()
+        self.vegan = Tag.objects.create(user=self.user, name="vegan")
+        self.winter = Tag.objects.create(user=self.user, name="winter")
+        self.salt = Ingredient.objects.create(user=self.user, name="salt")
+        self.leek = Ingredient.objects.create(user=self.user, name="leek")
+        create_recipe(
+            self.user,
+            [self.vegan, self.winter],
+            [self.salt, self.leek],
+            title="Leek soup",
+        )
+        create_recipe(self.user, [self.winter], [self.salt], title="Stew")
+        create_recipe(self.user, [], [self.salt], title="Bread")
+
+    def get_facets(self, **params):
+        r = self.client.get(facets_url, params)
+        self.assertEqual(r.status_code, status.HTTP_200_OK)
+        return r.data
+
+    def test_facets(self):
+        '''test all the counts, the most common first, in one query besides
+        the change stamp, and none once cached'''
+        user2 = User.objects.create_user(email="testuser2@email.com")
+        create_recipe(user2, [Tag.objects.create(user=user2, name="vegan")])
+        with self.assertNumQueries(2):
+            data = self.get_facets()
+        self.assertEqual(
+            data,
+            {
+                "tags": [
+                    {"id": self.winter.id, "count": 2},
+                    {"id": self.vegan.id, "count": 1},
+                ],
+                "ingredients": [
+                    {"id": self.salt.id, "count": 3},
+                    {"id": self.leek.id, "count": 1},
+                ],
+            },
+        )
+        with self.assertNumQueries(0):
+            self.assertEqual(self.get_facets(), data)
+
+    def test_facets_filtered(self):
+        data = self.get_facets(tags=str(self.winter.id))
+        self.assertEqual(data["tags"][0], {"id": self.winter.id, "count": 2})
+        self.assertEqual(data["ingredients"][0], {"id": self.salt.id, "count": 2})
+        data = self.get_facets(ingredients=str(self.leek.id))
+        self.assertEqual(len(data["tags"]), 2)
+        data = self.get_facets(search="soup")
+        self.assertEqual(data["ingredients"][1], {"id": self.leek.id, "count": 1})
+        data = self.get_facets(search="nothing")
+        self.assertEqual(data, {"tags": [], "ingredients": []})
+
+    def test_facets_follow_changes(self):
+        self.get_facets()
+        create_recipe(self.user, [self.vegan])
+        data = self.get_facets()
+        self.assertIn({"id": self.vegan.id, "count": 2}, data["tags"])
+        self.winter.delete()
+        data = self.get_facets()
+        self.assertEqual(data["tags"], [{"id": self.vegan.id, "count": 2}])
@@ -0,0 +1,151 @@
+from rest_framework.test import APITestCase, APIClient
+from recipe.tests.utils import create_recipe
+from recipe.models import Tag, TimelineEntry
+from django.contrib.auth import get_user_model
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework import status
+
+User = get_user_model()
+feed_url = reverse("recipe:feed")
+recipe_bulk_url = reverse("recipe:recipe-bulk")
+
+
+def create_user(name):
+    return User.objects.create_user(email=f"{name}@email.com", password="testing321")
+
+
+class FeedTests(APITestCase):
+    '''test the feed has the recipes of the users one follows, newest first'''
+
+    def setUp(self):
+        self.user = create_user("testuser")
+        self.author = create_user("author")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get_feed_ids(self, **params):
+        r = self.client.get(feed_url, params)
+        self.assertEqual(r.status_code, status.HTTP_200_OK)
+        return [item["id"] for item in r.data["results"]]
+
+    def test_feed_followed_recipes(self):
+        '''test only the recipes of followed users are in the feed'''
+        self.user.following.add(self.author)
+        recipe1 = create_recipe(self.author, title="recipe1")
+        recipe2 = create_recipe(self.author, title="recipe2")
+        create_recipe(create_user("stranger"))
+        create_recipe(self.user)
+        r = self.client.get(feed_url)
+        ids = [item["id"] for item in r.data["results"]]
+        self.assertEqual(ids, [recipe2.id, recipe1.id])
+        self.assertEqual(r.data["results"][0]["user"], self.author.id)
+        self.assertIsNone(r.data["next"])
+
+    def test_fan_out_on_write(self):
+        '''test a new recipe is added to the timeline of each follower'''
+        followers = [create_user(f"follower{i}") for i in range(3)]
+        self.author.followers.add(*followers)
+        recipe = create_recipe(self.author)
+        entries = TimelineEntry.objects.filter(recipe=recipe)
+        self.assertEqual(
+            set(entries.values_list("user_id", flat=True)),
+            {follower.id for follower in followers},
+        )
+
+    def test_follow_and_unfollow(self):
+        '''test following adds the latest recipes of the author and
+        unfollowing removes them'''
+        recipes = [create_recipe(self.author) for i in range(3)]
+        with self.settings(FEED_BACKFILL=2):
+            self.user.following.add(self.author)
+        self.assertEqual(self.get_feed_ids(), [recipes[2].id, recipes[1].id])
+        self.user.following.remove(self.author)
+        self.assertEqual(self.get_feed_ids(), [])
+        self.assertFalse(TimelineEntry.objects.exists())
+
+    def test_feed_pages(self):
+        '''test the next link gives the older recipes'''
+        self.user.following.add(self.author)
+        recipes = [create_recipe(self.author) for i in range(5)]
+        r = self.client.get(feed_url, {"page_size": 2})
+        found = []
+        while True:
+            found += [item["id"] for item in r.data["results"]]
+            if not r.data["next"]:
+                break
+            r = self.client.get(r.data["next"])
+        self.assertEqual(found, [recipe.id for recipe in reversed(recipes)])
+
+    def test_feed_invalid_params(self):
+        for params in (
+            {"before": "last"},
+            {"page_size": "some"},
+            {"page_size": 0},
+            {"page_size": -3},
+        ):
+            r = self.client.get(feed_url, params)
+            self.assertEqual(r.status_code, status.HTTP_400_BAD_REQUEST, params)
+
+    def test_feed_query_count(self):
+        '''test the feed takes the same queries however many authors are
+        followed, one for the timeline, one for the authors fanned out on read
+        and one for each relation'''
+        self.user.following.add(self.author)
+        recipe = create_recipe(self.author)
+        recipe.tags.add(Tag.objects.create(user=self.author, name="tag1"))
+        with self.assertNumQueries(4):
+            self.client.get(feed_url)
+        for i in range(5):
+            author = create_user(f"author{i}")
+            self.user.following.add(author)
+            create_recipe(author).tags.add(
+                Tag.objects.create(user=author, name="tag1")
+            )
+        with self.assertNumQueries(4):
+            r = self.client.get(feed_url)
+        self.assertEqual(len(r.data["results"]), 6)
+
+    def test_bulk_created_fanned_out(self):
+        '''test recipes created in bulk are added to the followers' timelines'''
+        self.user.following.add(self.author)
+        self.client.force_authenticate(self.author)
+        payload = [{"title": "recipe", "price": "3.56", "time_minutes": 5}] * 2
+        ids = [
+            item["id"]
+            for item in self.client.post(recipe_bulk_url, payload, format="json").data
+        ]
+        self.client.force_authenticate(self.user)
+        self.assertEqual(self.get_feed_ids(), ids[::-1])
+
+
+@override_settings(FEED_FANOUT_LIMIT=2)
+class FanOutOnReadTests(APITestCase):
+    '''test authors with many followers are merged into the feeds on read'''
+
+    def setUp(self):
+        self.author = create_user("author")
+        self.followers = [create_user(f"follower{i}") for i in range(3)]
+        self.client = APIClient()
+        self.client.force_authenticate(self.followers[0])
+
+    def test_popular_author_fanned_out_on_read(self):
+        self.author.followers.add(*self.followers[:2])
+        old = create_recipe(self.author, title="old")
+        self.author.followers.add(self.followers[2])
+        self.author.refresh_from_db()
+        self.assertTrue(self.author.fanout_on_read)
+
+        new = create_recipe(self.author, title="new")
+        self.assertFalse(TimelineEntry.objects.filter(recipe=new).exists())
+        other = create_user("other")
+        self.followers[0].following.add(other)
+        pushed = create_recipe(other, title="pushed")
+        r = self.client.get(feed_url)
+        # the old recipe was fanned out before, it is listed once
+        self.assertEqual(
+            [item["id"] for item in r.data["results"]], [pushed.id, new.id, old.id]
+        )
+        self.client.force_authenticate(self.followers[2])
+        r = self.client.get(feed_url, {"before": new.id})
+        self.assertEqual([item["id"] for item in r.data["results"]], [old.id])
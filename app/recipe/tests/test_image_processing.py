@@ -0,0 +1,139 @@
+from recipe.tests.utils import AuthenticatedAPITestCase, create_recipe
+from recipe.models import Recipe
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from recipe.images import rendition_names
+from recipe.serializers import RecipeSerializer
+from django.urls import reverse
+from rest_framework import status
+from tempfile import NamedTemporaryFile
+from io import StringIO
+from PIL import Image
+
+
+def get_recipe_detail_url(pk):
+    return reverse("recipe:recipe-detail", args=[pk])
+
+
+def get_upload_image_url(pk):
+    return reverse("recipe:recipe-upload-image", args=[pk])
+
+
+class ImageProcessingTests(AuthenticatedAPITestCase):
+    '''test uploaded images are thumbnailed by the process_images command
+    rather than in the request'''
+
+    def setUp(self):
+        super().setUp()
+        self.recipe = create_recipe(user=self.user)
+        self.url = get_upload_image_url(self.recipe.id)
+
+    def tearDown(self):
+        self.recipe.refresh_from_db()
+        self.recipe.image.delete()
+
+    def upload_image(self, size):
+        with NamedTemporaryFile(suffix=".jpg") as ntf:
+            Image.new(mode="RGB", size=size).save(ntf, format="JPEG")
+            ntf.seek(0)
+            return self.client.post(self.url, data={"image": ntf}, format="multipart")
+
+    def process_images(self):
+        call_command("process_images", "--once", stdout=StringIO())
+        self.recipe.refresh_from_db()
+
+    def test_recipe_without_image(self):
+        '''test a recipe can be saved without an image'''
+        self.assertIsNone(self.recipe.image_status)
+        r = self.client.patch(
+            get_recipe_detail_url(self.recipe.id), {"title": "recipe updated"}
+        )
+        self.assertEqual(r.status_code, status.HTTP_200_OK)
+        self.assertIsNone(r.data["image_status"])
+
+    def test_upload_returns_processing(self):
+        '''test the upload responds before the image is thumbnailed'''
+        r = self.upload_image((600, 400))
+        self.assertEqual(r.status_code, status.HTTP_200_OK)
+        self.assertEqual(r.data["image_status"], Recipe.ImageStatus.PROCESSING)
+        self.recipe.refresh_from_db()
+        with Image.open(self.recipe.image.path) as img:
+            self.assertEqual(img.size, (600, 400))
+
+    def test_process_images(self):
+        '''test the command creates the renditions of the image, keeps the
+        original as it was uploaded and marks it as ready'''
+        self.upload_image((2400, 1600))
+        self.process_images()
+        self.assertEqual(self.recipe.image_status, Recipe.ImageStatus.READY)
+        with Image.open(self.recipe.image.path) as img:
+            self.assertEqual(img.size, (2400, 1600))
+        sizes = {"thumb": (150, 100), "card": (300, 200), "full": (1200, 800)}
+        for size, formats in rendition_names(self.recipe.image.name).items():
+            self.assertEqual(set(formats), {"jpg", "webp"})
+            for format, name in formats.items():
+                with default_storage.open(name) as f, Image.open(f) as img:
+                    self.assertEqual(img.size, sizes[size])
+                    self.assertEqual(img.format, "WEBP" if format == "webp" else "JPEG")
+
+    def test_renditions_in_response(self):
+        '''test the recipe reports the urls of the renditions once ready'''
+        self.upload_image((600, 400))
+        r = self.client.get(get_recipe_detail_url(self.recipe.id))
+        self.assertIsNone(r.data["image_renditions"])
+        self.process_images()
+        r = self.client.get(get_recipe_detail_url(self.recipe.id))
+        self.assertEqual(r.data["image_status"], Recipe.ImageStatus.READY)
+        self.assertEqual(set(r.data["image_renditions"]), {"thumb", "card", "full"})
+        self.assertTrue(
+            r.data["image_renditions"]["thumb"]["webp"].startswith("http://testserver/")
+        )
+
+    def test_identical_images_deduplicated(self):
+        '''test identical uploads to different recipes share the same files'''
+        other = create_recipe(user=self.user, title="recipe2")
+        for recipe in (self.recipe, other):
+            with NamedTemporaryFile(suffix=".jpg") as ntf:
+                Image.new(mode="RGB", size=(600, 400)).save(ntf, format="JPEG")
+                ntf.seek(0)
+                self.client.post(
+                    get_upload_image_url(recipe.id), {"image": ntf}, format="multipart"
+                )
+        uploaded = Recipe.objects.get(id=other.id).image.name
+        self.process_images()
+        other.refresh_from_db()
+        self.assertEqual(other.image.name, self.recipe.image.name)
+        self.assertFalse(default_storage.exists(uploaded))
+
+    def test_title_edit_does_not_reprocess(self):
+        '''test editing other fields leaves the image alone'''
+        self.upload_image((600, 400))
+        self.process_images()
+        r = self.client.patch(
+            get_recipe_detail_url(self.recipe.id), {"title": "recipe updated"}
+        )
+        self.assertEqual(r.data["image_status"], Recipe.ImageStatus.READY)
+
+    def test_edit_during_processing_keeps_image(self):
+        '''test editing a recipe read before its image was processed doesn't
+        write back the uploaded image'''
+        self.upload_image((600, 400))
+        recipe = Recipe.objects.get(id=self.recipe.id)
+        self.process_images()
+        serializer = RecipeSerializer(recipe, {"title": "recipe updated"}, partial=True)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.title, "recipe updated")
+        self.assertEqual(self.recipe.image_status, Recipe.ImageStatus.READY)
+        self.process_images()
+        self.assertEqual(self.recipe.image_status, Recipe.ImageStatus.READY)
+
+    def test_broken_image_failed(self):
+        '''test an image that can't be opened is marked as failed'''
+        self.upload_image((20, 20))
+        self.recipe.refresh_from_db()
+        with open(self.recipe.image.path, "wb") as f:
+            f.write(b"not an image")
+        self.process_images()
+        self.assertEqual(self.recipe.image_status, Recipe.ImageStatus.FAILED)
@@ -0,0 +1,217 @@
+from recipe.tests.utils import AuthenticatedAPITestCase
+from recipe.importer import content_key
+from recipe.models import Recipe, Tag, RecipeImport, TimelineEntry
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command, CommandError
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework import status
+from io import BytesIO, StringIO
+import gzip
+import json
+import os
+import tempfile
+
+User = get_user_model()
+import_url = reverse("recipe:recipe-import-recipes")
+export_url = reverse("recipe:recipe-export")
+recipe_list_url = reverse("recipe:recipe-list")
+
+
+def ndjson(*rows):
+    return "".join(json.dumps(row) + "\n" for row in rows).encode()
+
+
+def recipe_row(title, **updates):
+    row = {"title": title, "price": "3.56", "time_minutes": 5}
+    row.update(updates)
+    return row
+
+
+class RecipeImportTests(AuthenticatedAPITestCase):
+    '''test importing recipes from uploaded files'''
+
+    def upload(self, content, name="recipes.ndjson", **data):
+        return self.client.post(
+            import_url,
+            {"file": SimpleUploadedFile(name, content), **data},
+            format="multipart",
+        )
+
+    def titles(self):
+        return list(
+            Recipe.objects.filter(user=self.user)
+            .order_by("id")
+            .values_list("title", flat=True)
+        )
+
+    def test_import_ndjson(self):
+        '''test the rows are created with their tags and ingredients by name,
+        the names the user has are reused whatever their case'''
+        vegan = Tag.objects.create(user=self.user, name="Vegan")
+        content = ndjson(
+            recipe_row("Soup", tags=["vegan", "winter"], ingredients=["salt"]),
+            recipe_row("Stew", instruction="Simmer", tags=["Winter"]),
+        )
+        r = self.upload(content)
+        self.assertEqual(r.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(r.data["imported"], 2)
+        self.assertEqual(r.data["key"], content_key(BytesIO(content)))
+        soup, stew = Recipe.objects.filter(user=self.user).order_by("id")
+        self.assertEqual(
+            sorted(soup.tags.values_list("name", flat=True)), ["Vegan", "winter"]
+        )
+        self.assertEqual(soup.ingredients.get().name, "salt")
+        self.assertEqual(list(stew.tags.all()), list(soup.tags.exclude(id=vegan.id)))
+        self.assertEqual(stew.instruction, "Simmer")
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 2)
+
+    def test_import_non_ascii_names(self):
+        '''test names the database lowercases otherwise than Python does are
+        resolved to the same tag'''
+        Tag.objects.create(user=self.user, name="Épicé")
+        content = ndjson(
+            recipe_row("Curry", tags=["Épicé", "İftar"]),
+            recipe_row("Chili", tags=["Épicé", "İftar"]),
+        )
+        r = self.upload(content)
+        self.assertEqual(r.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 2)
+        curry, chili = Recipe.objects.filter(user=self.user).order_by("id")
+        self.assertEqual(
+            list(curry.tags.order_by("id")), list(chili.tags.order_by("id"))
+        )
+
+    def test_import_export_round_trip(self):
+        '''test an export imports as the same recipes'''
+        self.upload(ndjson(recipe_row("Soup", tags=["vegan"], ingredients=["salt"])))
+        exported = b"".join(self.client.get(export_url).streaming_content)
+        user2 = User.objects.create_user(email="testuser2@email.com")
+        self.client.force_authenticate(user2)
+        self.upload(exported)
+        reexported = b"".join(self.client.get(export_url).streaming_content)
+        strip_id = [
+            {k: v for k, v in json.loads(line).items() if k != "id"}
+            for line in (exported, reexported)
+        ]
+        self.assertEqual(strip_id[0], strip_id[1])
+
+    def test_import_csv_and_gzip(self):
+        content = (
+            "title,price,time_minutes,tags,ingredients\r\n"
+            'Soup,3.56,5,vegan|winter,"salt, coarse"\r\n'
+            "Stew,2.00,30,,\r\n"
+        ).encode()
+        r = self.upload(content, name="recipes.csv")
+        self.assertEqual(r.data["imported"], 2)
+        soup = Recipe.objects.get(title="Soup")
+        self.assertEqual(soup.tags.count(), 2)
+        self.assertEqual(soup.ingredients.get().name, "salt, coarse")
+
+        r = self.upload(gzip.compress(ndjson(recipe_row("Pie"))), name="more.ndjson.gz")
+        self.assertEqual(r.data["imported"], 1)
+        self.assertEqual(self.titles(), ["Soup", "Stew", "Pie"])
+
+    def test_import_indexes_and_fans_out(self):
+        '''test imported recipes are searchable and in the followers' feeds'''
+        follower = User.objects.create_user(email="follower@email.com")
+        follower.following.add(self.user)
+        self.upload(ndjson(recipe_row("Tomato soup")))
+        r = self.client.get(recipe_list_url, {"search": "tomato"})
+        self.assertEqual(len(r.data["results"]), 1)
+        self.assertTrue(TimelineEntry.objects.filter(user=follower).exists())
+
+    @override_settings(RECIPE_IMPORT_BATCH_SIZE=2)
+    def test_import_resumed(self):
+        '''test an import failing on a row keeps the batches before it, and
+        the fixed file is imported from there'''
+        rows = [recipe_row(f"recipe{i}") for i in range(5)]
+        rows[3]["price"] = "free"
+        r = self.upload(ndjson(*rows), key="recipes")
+        self.assertEqual(r.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("price", r.json()["4"])
+        self.assertEqual(self.titles(), ["recipe0", "recipe1"])
+
+        rows[3]["price"] = "1.00"
+        r = self.upload(ndjson(*rows), key="recipes")
+        self.assertEqual(r.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(r.data["resumed_from"], 2)
+        self.assertEqual(r.data["imported"], 3)
+        self.assertEqual(self.titles(), [f"recipe{i}" for i in range(5)])
+        self.assertTrue(RecipeImport.objects.get(user=self.user).finished)
+
+        r = self.upload(ndjson(*rows), key="recipes")
+        self.assertEqual(r.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(r.data["imported"], 0)
+        self.assertTrue(r.data["already_imported"])
+        r = self.upload(ndjson(*rows), key="recipes", restart=True)
+        self.assertEqual(r.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(r.data["imported"], 5)
+        self.assertEqual(Recipe.objects.count(), 10)
+
+    def test_import_same_name(self):
+        '''test a file with the name of one already imported is imported, and
+        the same file again is reported as already imported'''
+        r = self.upload(ndjson(recipe_row("Soup")))
+        self.assertEqual(r.status_code, status.HTTP_201_CREATED)
+        r = self.upload(ndjson(recipe_row("Stew")))
+        self.assertEqual(r.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(r.data["imported"], 1)
+        r = self.upload(ndjson(recipe_row("Soup")))
+        self.assertEqual(r.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(self.titles(), ["Soup", "Stew"])
+
+    def test_import_invalid_json(self):
+        r = self.upload(b'{"title": "Soup"\n')
+        self.assertEqual(r.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("Invalid JSON", r.json()["1"]["non_field_errors"][0])
+
+    def test_import_unreadable(self):
+        '''test bytes that aren't UTF-8 and a corrupt gzip are rejected with
+        the number of the line they were read on'''
+        content = ndjson(recipe_row("Soup")) + b'{"title": "Cr\xe8me"}\n'
+        r = self.upload(content)
+        self.assertEqual(r.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("Unreadable line", r.json()["2"]["non_field_errors"][0])
+        r = self.upload(b"not gzipped", name="recipes.ndjson.gz")
+        self.assertEqual(r.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("1", r.json())
+        truncated = gzip.compress(ndjson(*[recipe_row("Soup")] * 50))[:-30]
+        r = self.upload(truncated, name="recipes.ndjson.gz")
+        self.assertEqual(r.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_import_command_unreadable(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "recipes.ndjson")
+            with open(path, "wb") as file:
+                file.write(b'{"title": "Cr\xe8me"}\n')
+            with self.assertRaisesMessage(CommandError, "line 1"):
+                call_command(
+                    "import_recipes", path, stdout=StringIO(), email=self.user.email
+                )
+
+    def test_import_command(self):
+        '''test the command imports a file, reporting its speed, and carries
+        on after a failure'''
+        rows = [recipe_row(f"recipe{i}") for i in range(3)]
+        rows[2]["time_minutes"] = "soon"
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "recipes.ndjson")
+            with open(path, "wb") as file:
+                file.write(ndjson(*rows))
+            options = {"email": self.user.email, "batch_size": 2}
+            with open(path, "rb") as file:
+                key = content_key(file)
+            with self.assertRaisesMessage(CommandError, f"--key {key}"):
+                call_command("import_recipes", path, stdout=StringIO(), **options)
+            rows[2]["time_minutes"] = 5
+            with open(path, "wb") as file:
+                file.write(ndjson(*rows))
+            out = StringIO()
+            call_command("import_recipes", path, stdout=out, key=key, **options)
+        output = out.getvalue()
+        self.assertIn("Resumed after 2 rows", output)
+        self.assertIn("Imported 1 recipes", output)
+        self.assertIn("rows/s", output)
+        self.assertEqual(self.titles(), ["recipe0", "recipe1", "recipe2"])
@@ -0,0 +1,132 @@
+from recipe.tests.utils import AuthenticatedAPITestCase, create_recipe
+from recipe.models import Ingredient
+from recipe.matching import IngredientIndex
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase
+from django.urls import reverse
+from rest_framework import status
+
+User = get_user_model()
+cook_url = reverse("recipe:recipe-cook")
+
+
+class IngredientIndexTests(SimpleTestCase):
+    '''test the matching of the index alone'''
+
+    def setUp(self):
+        # recipes 10 to 13 of ingredients 1 to 4
+        self.index = IngredientIndex(
+            [(10, 1), (10, 2), (11, 1), (12, 1), (12, 2), (12, 3), (13, 4)]
+        )
+
+    def ranked(self, *args, **kwargs):
+        count, matches = self.index.find(*args, **kwargs)
+        return count, [(m.recipe_id, m.matched, m.missing_ids) for m in matches]
+
+    def test_match_all(self):
+        self.assertEqual(
+            self.ranked([1, 2], "all"), (2, [(10, 2, []), (12, 2, [3])])
+        )
+        self.assertEqual(self.ranked([1, 5], "all"), (0, []))
+
+    def test_match_any(self):
+        self.assertEqual(
+            self.ranked([2, 4], "any"),
+            (3, [(13, 1, []), (10, 1, [1]), (12, 1, [1, 3])]),
+        )
+
+    def test_match_missing(self):
+        self.assertEqual(self.ranked([1]), (1, [(11, 1, [])]))
+        self.assertEqual(
+            self.ranked([1], max_missing=1), (2, [(11, 1, []), (10, 1, [2])])
+        )
+        self.assertEqual(self.ranked([1, 2, 3, 4, 5], limit=2)[0], 4)
+        self.assertEqual(self.ranked([5]), (0, []))
+        self.assertEqual(self.ranked([]), (0, []))
+
+
+class RecipeMatchTests(AuthenticatedAPITestCase):
+    '''test the recipes matching the ingredients one has'''
+
+    def setUp(self):
+        super().setUp()
+        self.salt = Ingredient.objects.create(user=self.user, name="salt")
+        self.leek = Ingredient.objects.create(user=self.user, name="leek")
+        self.flour = Ingredient.objects.create(user=self.user, name="flour")
+        self.soup = create_recipe(
+            self.user, ingredients=[self.salt, self.leek], title="Leek soup"
+        )
+        self.bread = create_recipe(
+            self.user, ingredients=[self.salt, self.flour], title="Bread"
+        )
+
+    def cook(self, ingredients, **params):
+        params["ingredients"] = ",".join(str(i.id) for i in ingredients)
+        r = self.client.get(cook_url, params)
+        self.assertEqual(r.status_code, status.HTTP_200_OK)
+        return r.data
+
+    def test_cook(self):
+        '''test the recipes one has all the ingredients of, rendered like the
+        list, from the index kept once built'''
+        data = self.cook([self.salt, self.leek])
+        self.assertEqual(data["count"], 1)
+        result = data["results"][0]
+        self.assertEqual(result["title"], "Leek soup")
+        self.assertEqual(sorted(result["ingredients"]), [self.salt.id, self.leek.id])
+        self.assertEqual(
+            (result["matched"], result["missing"], result["coverage"]), (2, [], 1)
+        )
+        # the recipes and their tags and ingredients
+        with self.assertNumQueries(3):
+            self.cook([self.salt, self.leek])
+
+    def test_cook_missing(self):
+        '''test the recipes missing few ingredients, the best covered first'''
+        data = self.cook([self.salt, self.leek], max_missing=1)
+        self.assertEqual(
+            [(r["title"], r["missing"], r["coverage"]) for r in data["results"]],
+            [("Leek soup", [], 1), ("Bread", [self.flour.id], 0.5)],
+        )
+        data = self.cook([self.salt], max_missing=1, limit=1)
+        self.assertEqual(data["count"], 2)
+        self.assertEqual(len(data["results"]), 1)
+
+    def test_cook_all_and_any(self):
+        data = self.cook([self.salt, self.flour], match="all")
+        self.assertEqual([r["title"] for r in data["results"]], ["Bread"])
+        data = self.cook([self.leek, self.flour], match="any")
+        self.assertEqual(data["count"], 2)
+        self.assertEqual(self.cook([self.leek], match="all")["count"], 1)
+
+    def test_cook_follows_changes(self):
+        '''test the index is built again as the ingredients of recipes
+        change'''
+        self.assertEqual(self.cook([self.salt])["count"], 0)
+        self.bread.ingredients.remove(self.flour)
+        self.assertEqual(self.cook([self.salt])["count"], 1)
+        pepper = Ingredient.objects.create(user=self.user, name="pepper")
+        create_recipe(self.user, ingredients=[pepper], title="Pepper")
+        self.assertEqual(self.cook([pepper])["count"], 1)
+        self.bread.delete()
+        self.assertEqual(self.cook([self.salt], match="any")["count"], 1)
+        self.leek.delete()
+        self.assertEqual(self.cook([self.salt])["count"], 1)
+
+    def test_cook_own_recipes(self):
+        user2 = User.objects.create_user(email="testuser2@email.com")
+        salt = Ingredient.objects.create(user=user2, name="salt")
+        create_recipe(user2, ingredients=[salt])
+        create_recipe(user2, ingredients=[self.salt])
+        self.assertEqual(self.cook([self.salt], match="any")["count"], 2)
+
+    def test_cook_invalid(self):
+        for params in (
+            {},
+            {"ingredients": "salt"},
+            {"ingredients": "1", "match": "some"},
+            {"ingredients": "1", "max_missing": -1},
+            {"ingredients": "1", "limit": 0},
+        ):
+            r = self.client.get(cook_url, params)
+            self.assertEqual(r.status_code, status.HTTP_400_BAD_REQUEST, params)
@@ -0,0 +1,85 @@
+from recipe.tests.utils import AuthenticatedAPITestCase, create_recipe
+from recipe.models import Tag
+from recipe.pagination import RecipeCursorPagination
+from unittest.mock import patch
+from django.urls import reverse
+from rest_framework import status
+
+recipe_list_url = reverse("recipe:recipe-list")
+tags_url = reverse("recipe:tag-list")
+
+
+class CursorPaginationTests(AuthenticatedAPITestCase):
+    '''test recipes, tags and ingredients are listed page by page'''
+
+    def collect_pages(self, url, params):
+        '''follow the next links from the first page to the last one'''
+        pages = []
+        r = self.client.get(url, params)
+        while True:
+            self.assertEqual(r.status_code, status.HTTP_200_OK)
+            pages.append([item["id"] for item in r.data["results"]])
+            if not r.data["next"]:
+                return pages
+            r = self.client.get(r.data["next"])
+
+    def test_recipes_paginated_by_id(self):
+        '''test recipes are listed in id order, page_size recipes per page'''
+        ids = [create_recipe(self.user, title=f"recipe{i}").id for i in range(5)]
+        pages = self.collect_pages(recipe_list_url, {"page_size": 2})
+        self.assertEqual(pages, [ids[0:2], ids[2:4], ids[4:5]])
+
+    def test_recipes_previous_page(self):
+        '''test the previous link of a page goes back to the page before it'''
+        ids = [create_recipe(self.user, title=f"recipe{i}").id for i in range(4)]
+        r = self.client.get(recipe_list_url, {"page_size": 2})
+        self.assertIsNone(r.data["previous"])
+        r = self.client.get(r.data["next"])
+        r = self.client.get(r.data["previous"])
+        self.assertEqual([item["id"] for item in r.data["results"]], ids[0:2])
+
+    def test_tags_paginated_by_name(self):
+        '''test tags are listed in name order across pages'''
+        for name in ["d", "b", "e", "a", "c"]:
+            Tag.objects.create(user=self.user, name=name)
+        r = self.client.get(tags_url, {"page_size": 2})
+        names = [item["name"] for item in r.data["results"]]
+        while r.data["next"]:
+            r = self.client.get(r.data["next"])
+            names += [item["name"] for item in r.data["results"]]
+        self.assertEqual(names, ["a", "b", "c", "d", "e"])
+
+    @patch.object(RecipeCursorPagination, "offset_cutoff", 1)
+    def test_tags_paginated_by_tied_count(self):
+        '''test tags with the same number of recipes are paged through by
+        name and id, without an offset over the tied ones'''
+        names = [f"tag{i}" for i in range(7)]
+        for name in reversed(names):
+            Tag.objects.create(user=self.user, name=name)
+        params = {"ordering": "-recipe_count", "page_size": 2}
+        pages = self.collect_pages(tags_url, params)
+        ids = [pk for page in pages for pk in page]
+        self.assertEqual(len(pages), 4)
+        self.assertEqual([Tag.objects.get(id=pk).name for pk in ids], names)
+        # and back from the last page
+        r = self.client.get(tags_url, params)
+        while r.data["next"]:
+            r = self.client.get(r.data["next"])
+        previous = []
+        while r.data["previous"]:
+            r = self.client.get(r.data["previous"])
+            previous = [item["id"] for item in r.data["results"]] + previous
+        self.assertEqual(previous, ids[:6])
+
+    @patch.object(RecipeCursorPagination, "max_page_size", 2)
+    def test_max_page_size(self):
+        '''test page_size larger than the max page size is capped'''
+        for i in range(3):
+            create_recipe(self.user, title=f"recipe{i}")
+        r = self.client.get(recipe_list_url, {"page_size": 100})
+        self.assertEqual(len(r.data["results"]), 2)
+
+    def test_bad_cursor(self):
+        '''test a cursor that was not issued by the API is rejected'''
+        r = self.client.get(recipe_list_url, {"cursor": "gobbledygook"})
+        self.assertEqual(r.status_code, status.HTTP_404_NOT_FOUND)
@@ -67,7 +67,7 @@ class PrivateRecipeAPITests(APITestCase):
         create_recipe(self.user)
         r = self.client.get(recipe_list_url)
         self.assertEqual(r.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(r.data), 1)
+        self.assertEqual(len(r.data["results"]), 1)
 
     def test_list_recipes_own(self):
         """test one can only access her own recipes"""
@@ -80,8 +80,8 @@ class PrivateRecipeAPITests(APITestCase):
         user_recipes = Recipe.objects.filter(user=self.user)
         serializer = RecipeSerializer(user_recipes, many=True)
         self.assertEqual(len(Recipe.objects.all()), 2)
-        self.assertEqual(len(r.data), 1)
-        self.assertEqual(r.data, serializer.data)
+        self.assertEqual(len(r.data["results"]), 1)
+        self.assertEqual(r.data["results"], serializer.data)
 
     def test_filter_recipes_by_tags(self):
         """test getting recipes with one of the specified tags"""
@@ -99,9 +99,9 @@ class PrivateRecipeAPITests(APITestCase):
         serializer1 = RecipeSerializer(rec1)
         serializer2 = RecipeSerializer(rec2)
         serializer3 = RecipeSerializer(rec3)
-        self.assertIn(serializer1.data, r.data)
-        self.assertIn(serializer2.data, r.data)
-        self.assertNotIn(serializer3.data, r.data)
+        self.assertIn(serializer1.data, r.data["results"])
+        self.assertIn(serializer2.data, r.data["results"])
+        self.assertNotIn(serializer3.data, r.data["results"])
 
     def test_filter_recipes_by_ingredients(self):
         """test getting recipes with one of the specified ingredients"""
@@ -120,9 +120,9 @@ class PrivateRecipeAPITests(APITestCase):
         serializer1 = RecipeSerializer(rec1)
         serializer2 = RecipeSerializer(rec2)
         serializer3 = RecipeSerializer(rec3)
-        self.assertIn(serializer1.data, r.data)
-        self.assertIn(serializer2.data, r.data)
-        self.assertNotIn(serializer3.data, r.data)
+        self.assertIn(serializer1.data, r.data["results"])
+        self.assertIn(serializer2.data, r.data["results"])
+        self.assertNotIn(serializer3.data, r.data["results"])
 
     def test_create_recipe(self):
         """test creating a basic recipe successfully"""
@@ -136,6 +136,8 @@ class PrivateRecipeAPITests(APITestCase):
             "price": "3.56",
             "time_minutes": 5,
             "image": None,
+            "image_status": None,
+            "image_renditions": None,
             "ingredients": [],
             "tags": [],
         }
@@ -180,6 +182,31 @@ class PrivateRecipeAPITests(APITestCase):
         self.assertEqual(list(recipe.tags.all()), list(Tag.objects.all()))
         self.assertEqual(list(recipe.ingredients.all()), list(Ingredient.objects.all()))
 
+    def test_create_recipe_tag_ingredient_names(self):
+        """test a recipe can refer to tags and ingredients by name, reusing
+        the user's ones and creating the others"""
+        tag = create_tag(user=self.user, name="dinner")
+        user2 = User.objects.create_user(
+            email="testuser2@email.com", password="testing321"
+        )
+        create_ingredient(user=user2, name="salt")
+        payload = {
+            "title": "recipe",
+            "price": 3.56,
+            "time_minutes": 5,
+            "tag_names": ["Dinner"],
+            "ingredient_names": ["salt", "pepper"],
+        }
+        r = self.client.post(recipe_list_url, data=payload, format="json")
+        self.assertEqual(r.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(r.data["tags"], [tag.id])
+        recipe = Recipe.objects.get(id=r.data["id"])
+        self.assertEqual(
+            [(i.name, i.user) for i in recipe.ingredients.order_by("id")],
+            [("salt", self.user), ("pepper", self.user)],
+        )
+        self.assertNotIn("tag_names", r.data)
+
     def test_retrieve_recipe(self):
         """test to retrieve detail of a recipe successfully"""
         recipe = create_recipe(self.user)
@@ -205,6 +232,8 @@ class PrivateRecipeAPITests(APITestCase):
             "price": "3.56",
             "time_minutes": 5,
             "image": None,
+            "image_status": None,
+            "image_renditions": None,
             "ingredients": [
                 OrderedDict([("name", "ingredient1"), ("id", 1)]),
                 OrderedDict([("name", "ingredient2"), ("id", 2)]),
@@ -232,6 +261,8 @@ class PrivateRecipeAPITests(APITestCase):
             "price": "{:.2f}".format(updates["price"]),
             "time_minutes": 5,
             "image": None,
+            "image_status": None,
+            "image_renditions": None,
             "ingredients": [],
             "tags": [1],
         }
@@ -255,6 +286,8 @@ class PrivateRecipeAPITests(APITestCase):
             "price": "{:.2f}".format(updates["price"]),
             "time_minutes": updates["time_minutes"],
             "image": None,
+            "image_status": None,
+            "image_renditions": None,
             "ingredients": [],
             "tags": [],
         }
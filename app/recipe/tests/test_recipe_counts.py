@@ -0,0 +1,130 @@
+from recipe.tests.utils import AuthenticatedAPITestCase, create_recipe
+from recipe.models import Ingredient, Tag
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+
+recipe_bulk_url = reverse("recipe:recipe-bulk")
+tags_url = reverse("recipe:tag-list")
+ingredients_url = reverse("recipe:ingredient-list")
+
+
+def get_recipe_detail_url(pk):
+    return reverse("recipe:recipe-detail", args=[pk])
+
+
+class RecipeCountTests(AuthenticatedAPITestCase):
+    '''test the recipe counts of the tags and ingredients follow their
+    relations, and are listed and sorted by'''
+
+    def setUp(self):
+        super().setUp()
+        self.vegan = Tag.objects.create(user=self.user, name="vegan")
+        self.winter = Tag.objects.create(user=self.user, name="winter")
+        self.salt = Ingredient.objects.create(user=self.user, name="salt")
+
+    def assertCounts(self, *expected):
+        for obj, count in expected:
+            obj.refresh_from_db()
+            self.assertEqual(obj.recipe_count, count, obj)
+
+    def test_counts_follow_relations(self):
+        '''test adding, removing and clearing from either side'''
+        soup, stew = create_recipe(self.user), create_recipe(self.user)
+        soup.tags.add(self.vegan, self.winter)
+        stew.tags.add(self.winter)
+        soup.ingredients.add(self.salt)
+        self.assertCounts((self.vegan, 1), (self.winter, 2), (self.salt, 1))
+        soup.tags.add(self.vegan)
+        soup.tags.remove(self.winter)
+        self.assertCounts((self.vegan, 1), (self.winter, 1))
+        self.winter.recipe_set.add(soup)
+        self.assertCounts((self.winter, 2))
+        self.winter.recipe_set.remove(stew)
+        self.assertCounts((self.winter, 1))
+        soup.tags.clear()
+        self.assertCounts((self.vegan, 0), (self.winter, 0), (self.salt, 1))
+        self.salt.recipe_set.clear()
+        self.assertCounts((self.salt, 0))
+
+    def test_counts_recipe_deleted(self):
+        soup, stew = create_recipe(self.user), create_recipe(self.user)
+        soup.tags.add(self.vegan)
+        stew.tags.add(self.vegan)
+        stew.ingredients.add(self.salt)
+        stew.delete()
+        self.assertCounts((self.vegan, 1), (self.salt, 0))
+        r = self.client.delete(
+            reverse("recipe:recipe-bulk"), {"ids": [soup.id]}, format="json"
+        )
+        self.assertEqual(r.status_code, status.HTTP_200_OK)
+        self.assertCounts((self.vegan, 0))
+
+    def test_counts_bulk_writes(self):
+        '''test the bulk endpoint, which writes the relations without
+        signals, keeps the counts'''
+        payload = [
+            {
+                "title": f"recipe{i}",
+                "price": "3.56",
+                "time_minutes": 5,
+                "tags": [self.vegan.id],
+                "ingredient_names": ["salt", "pepper"],
+            }
+            for i in range(3)
+        ]
+        r = self.client.post(recipe_bulk_url, payload, format="json")
+        self.assertEqual(r.status_code, status.HTTP_201_CREATED)
+        pepper = Ingredient.objects.get(name="pepper")
+        self.assertCounts((self.vegan, 3), (self.salt, 3), (pepper, 3))
+        payload = [{"id": r.data[0]["id"], "tags": [self.winter.id]}]
+        r = self.client.patch(recipe_bulk_url, payload, format="json")
+        self.assertEqual(r.status_code, status.HTTP_200_OK)
+        self.assertCounts((self.vegan, 2), (self.winter, 1))
+
+    def test_assigned_only(self):
+        '''test assigned_only filters by the count rather than joining the
+        recipes'''
+        create_recipe(self.user).tags.add(self.winter)
+        with CaptureQueriesContext(connection) as queries:
+            r = self.client.get(tags_url, {"assigned_only": 1})
+        self.assertEqual([item["name"] for item in r.data["results"]], ["winter"])
+        sql = queries.captured_queries[-1]["sql"]
+        self.assertIn('"recipe_count" > 0', sql)
+        self.assertNotIn("JOIN", sql)
+        self.assertNotIn("DISTINCT", sql)
+
+    def test_list_with_counts_by_usage(self):
+        '''test the listing renders the counts and pages the most used
+        first'''
+        pepper = Ingredient.objects.create(user=self.user, name="pepper")
+        oil = Ingredient.objects.create(user=self.user, name="oil")
+        for i in range(3):
+            recipe = create_recipe(self.user)
+            recipe.ingredients.add(*[self.salt, pepper, oil][i:])
+        params = {"with_counts": 1, "ordering": "-recipe_count", "page_size": 2}
+        r = self.client.get(ingredients_url, params)
+        self.assertEqual(
+            r.data["results"],
+            [
+                {"name": "oil", "id": oil.id, "recipe_count": 3},
+                {"name": "pepper", "id": pepper.id, "recipe_count": 2},
+            ],
+        )
+        r = self.client.get(r.data["next"])
+        self.assertEqual(
+            r.data["results"], [{"name": "salt", "id": self.salt.id, "recipe_count": 1}]
+        )
+        r = self.client.get(ingredients_url)
+        self.assertEqual(r.data["results"][0], {"name": "oil", "id": oil.id})
+
+    def test_counts_invalidate_cached_listing(self):
+        self.client.get(tags_url, {"with_counts": 1})
+        recipe = create_recipe(self.user)
+        recipe.tags.add(self.vegan)
+        r = self.client.get(tags_url, {"with_counts": 1})
+        self.assertEqual(r.data["results"][0]["recipe_count"], 1)
+        r = self.client.delete(get_recipe_detail_url(recipe.id))
+        r = self.client.get(tags_url, {"with_counts": 1})
+        self.assertEqual(r.data["results"][0]["recipe_count"], 0)
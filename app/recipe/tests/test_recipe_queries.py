@@ -0,0 +1,125 @@
+from recipe.tests.utils import AuthenticatedAPITestCase
+from recipe.models import Recipe, Ingredient, Tag
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from io import StringIO
+
+recipe_list_url = reverse("recipe:recipe-list")
+tags_url = reverse("recipe:tag-list")
+
+
+def get_recipe_detail_url(pk):
+    return reverse("recipe:recipe-detail", args=[pk])
+
+
+def create_recipes(user, count, tags_per_recipe=3, ingredients_per_recipe=3):
+    '''create recipes each bound to its own tags and ingredients'''
+    recipes = []
+    start = Recipe.objects.filter(user=user).count()
+    for i in range(start, start + count):
+        recipe = Recipe.objects.create(
+            user=user, title=f"recipe{i}", price=3.56, time_minutes=5
+        )
+        recipe.tags.set(
+            [
+                Tag.objects.create(user=user, name=f"tag{i}-{j}")
+                for j in range(tags_per_recipe)
+            ]
+        )
+        recipe.ingredients.set(
+            [
+                Ingredient.objects.create(user=user, name=f"ingredient{i}-{j}")
+                for j in range(ingredients_per_recipe)
+            ]
+        )
+        recipes.append(recipe)
+    return recipes
+
+
+class RecipeQueryCountTests(AuthenticatedAPITestCase):
+    '''test the number of queries of the recipe endpoints does not grow with
+    the number of recipes, tags and ingredients'''
+
+    def test_list_recipes_query_count(self):
+        '''recipes, their tags and their ingredients take one query each,
+        plus one for the etag'''
+        create_recipes(self.user, 2)
+        with self.assertNumQueries(4):
+            r = self.client.get(recipe_list_url)
+        self.assertEqual(r.status_code, status.HTTP_200_OK)
+
+        create_recipes(self.user, 10)
+        with self.assertNumQueries(4):
+            r = self.client.get(recipe_list_url)
+        self.assertEqual(r.status_code, status.HTTP_200_OK)
+
+    def test_list_recipes_filtered_query_count(self):
+        '''filtering by tags and ingredients does not add per recipe queries'''
+        recipes = create_recipes(self.user, 10)
+        tag_ids = ",".join(str(r.tags.first().id) for r in recipes)
+        ingredient_ids = ",".join(str(r.ingredients.first().id) for r in recipes)
+        with self.assertNumQueries(4):
+            r = self.client.get(
+                recipe_list_url, {"tags": tag_ids, "ingredients": ingredient_ids}
+            )
+        self.assertEqual(r.status_code, status.HTTP_200_OK)
+
+    def test_list_recipes_filtered_exists(self):
+        '''tag and ingredient filters are EXISTS subqueries, a recipe matching
+        several of the ids is listed once without a DISTINCT'''
+        recipe = create_recipes(self.user, 1)[0]
+        create_recipes(self.user, 1)
+        tag_ids = ",".join(str(tag.id) for tag in recipe.tags.all())
+        ingredient_ids = ",".join(str(i.id) for i in recipe.ingredients.all())
+        with CaptureQueriesContext(connection) as queries:
+            r = self.client.get(
+                recipe_list_url, {"tags": tag_ids, "ingredients": ingredient_ids}
+            )
+        self.assertEqual([item["id"] for item in r.data["results"]], [recipe.id])
+        sql = queries[0]["sql"]
+        self.assertEqual(sql.count("EXISTS"), 2)
+        self.assertNotIn("DISTINCT", sql)
+
+    def test_benchmark_recipe_filters(self):
+        '''the benchmark seeds its data once and reports each filter'''
+        out = StringIO()
+        options = {"recipes": 30, "tags": 5, "ingredients": 5, "runs": 2}
+        call_command("benchmark_recipe_filters", stdout=out, **options)
+        call_command("benchmark_recipe_filters", stdout=out, **options)
+        output = out.getvalue()
+        self.assertEqual(output.count("Seeding"), 1)
+        self.assertIn("Reusing", output)
+        for name in ("tags", "ingredients", "tags+ingredients"):
+            self.assertIn(f"{name}: median", output)
+        self.assertEqual(Recipe.objects.exclude(user=self.user).count(), 30)
+
+    def test_list_recipes_data(self):
+        '''prefetched tags and ingredients are still rendered as ids'''
+        recipe = create_recipes(self.user, 1)[0]
+        r = self.client.get(recipe_list_url)
+        data = r.data["results"][0]
+        self.assertEqual(data["tags"], [tag.id for tag in recipe.tags.order_by("id")])
+        self.assertEqual(
+            data["ingredients"],
+            [ingredient.id for ingredient in recipe.ingredients.order_by("id")],
+        )
+
+    def test_retrieve_recipe_query_count(self):
+        '''retrieving a recipe with nested tags and ingredients takes 3 queries,
+        plus one for the etag'''
+        recipe = create_recipes(self.user, 1, 10, 10)[0]
+        with self.assertNumQueries(4):
+            r = self.client.get(get_recipe_detail_url(recipe.id))
+        self.assertEqual(r.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(r.data["tags"]), 10)
+        self.assertEqual(len(r.data["ingredients"]), 10)
+
+    def test_list_tags_query_count(self):
+        '''listing tags takes a single query, plus one for the etag'''
+        create_recipes(self.user, 5)
+        with self.assertNumQueries(2):
+            r = self.client.get(tags_url)
+        self.assertEqual(r.status_code, status.HTTP_200_OK)
@@ -0,0 +1,132 @@
+from recipe.tests.utils import AuthenticatedAPITestCase, create_recipe
+from recipe.cache import VersionedLRU, bump_version
+from recipe.models import Ingredient, Tag
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+
+User = get_user_model()
+recipe_list_url = reverse("recipe:recipe-list")
+tags_url = reverse("recipe:tag-list")
+
+
+def get_recipe_detail_url(pk):
+    return reverse("recipe:recipe-detail", args=[pk])
+
+
+class ResponseCacheTests(AuthenticatedAPITestCase):
+    '''test list and detail responses are cached until the user's recipes,
+    tags or ingredients change'''
+
+    def setUp(self):
+        super().setUp()
+        self.recipe = create_recipe(self.user)
+
+    def test_cached_list(self):
+        '''test a repeated list is answered without queries'''
+        r1 = self.client.get(recipe_list_url)
+        with self.assertNumQueries(0):
+            r2 = self.client.get(recipe_list_url)
+        self.assertEqual(r2.status_code, status.HTTP_200_OK)
+        self.assertEqual(r1.data, r2.data)
+
+    def test_cached_per_query(self):
+        '''test responses with different query params are cached apart'''
+        tag = Tag.objects.create(user=self.user, name="tag1")
+        self.recipe.tags.add(tag)
+        create_recipe(self.user, title="recipe2")
+        self.assertEqual(len(self.client.get(recipe_list_url).data["results"]), 2)
+        r = self.client.get(recipe_list_url, {"tags": str(tag.id)})
+        self.assertEqual(len(r.data["results"]), 1)
+
+    def test_cached_per_user(self):
+        '''test one's cached responses are not served to another user'''
+        self.client.get(recipe_list_url)
+        user2 = User.objects.create_user(
+            email="testuser2@email.com", password="testing321"
+        )
+        self.client.force_authenticate(user2)
+        r = self.client.get(recipe_list_url)
+        self.assertEqual(r.data["results"], [])
+
+    def test_invalidated_by_recipe_save(self):
+        '''test creating, updating and deleting recipes invalidates the list'''
+        self.client.get(recipe_list_url)
+        recipe2 = create_recipe(self.user, title="recipe2")
+        r = self.client.get(recipe_list_url)
+        self.assertEqual(len(r.data["results"]), 2)
+
+        recipe2.title = "recipe updated"
+        recipe2.save()
+        r = self.client.get(recipe_list_url)
+        self.assertEqual(r.data["results"][1]["title"], "recipe updated")
+
+        self.client.delete(get_recipe_detail_url(recipe2.id))
+        r = self.client.get(recipe_list_url)
+        self.assertEqual(len(r.data["results"]), 1)
+
+    def test_invalidated_by_tag_rename(self):
+        '''test renaming a tag invalidates the details of its recipes'''
+        tag = Tag.objects.create(user=self.user, name="tag1")
+        self.recipe.tags.add(tag)
+        self.client.get(get_recipe_detail_url(self.recipe.id))
+        tag.name = "tag renamed"
+        tag.save()
+        r = self.client.get(get_recipe_detail_url(self.recipe.id))
+        self.assertEqual(r.data["tags"][0]["name"], "tag renamed")
+
+    def test_invalidated_by_relations(self):
+        '''test adding and removing tags and ingredients on either side of the
+        relation invalidates the responses'''
+        ingredient = Ingredient.objects.create(user=self.user, name="ingredient1")
+        self.client.get(recipe_list_url)
+        self.recipe.ingredients.add(ingredient)
+        r = self.client.get(recipe_list_url)
+        self.assertEqual(r.data["results"][0]["ingredients"], [ingredient.id])
+
+        ingredient.recipe_set.remove(self.recipe)
+        r = self.client.get(recipe_list_url)
+        self.assertEqual(r.data["results"][0]["ingredients"], [])
+
+    def test_tags_list_cached(self):
+        '''test the tag list is cached and invalidated by new tags'''
+        self.client.get(tags_url)
+        with self.assertNumQueries(0):
+            self.client.get(tags_url)
+        self.client.post(tags_url, {"name": "tag1"})
+        r = self.client.get(tags_url)
+        self.assertEqual(len(r.data["results"]), 1)
+
+
+class VersionedLRUTests(SimpleTestCase):
+    '''test values are kept until the version of their user's data changes'''
+
+    def setUp(self):
+        cache.clear()
+        self.built = []
+
+        def build(previous, user_id, name):
+            self.built.append((previous, user_id, name))
+            return f"{name}{len(self.built)}"
+
+        self.values = VersionedLRU(build, "AUTOCOMPLETE_TRIE_USERS")
+
+    def test_built_once_per_version(self):
+        self.assertEqual(self.values.get(1, "a"), "a1")
+        self.assertEqual(self.values.get(1, "a"), "a1")
+        bump_version(1)
+        self.assertEqual(self.values.get(1, "a"), "a2")
+        self.assertEqual(self.built[1], ("a1", 1, "a"))
+        self.values.invalidate(1, "a")
+        self.assertEqual(self.values.get(1, "a"), "a3")
+        self.assertIsNone(self.built[2][0])
+
+    @override_settings(AUTOCOMPLETE_TRIE_USERS=2)
+    def test_least_recently_used_dropped(self):
+        for user_id in (1, 2, 1, 3):
+            self.values.get(user_id, "a")
+        self.assertEqual(len(self.values), 2)
+        self.values.get(1, "a")
+        self.assertEqual(len(self.built), 3)
@@ -0,0 +1,113 @@
+from recipe.tests.utils import AuthenticatedAPITestCase, create_recipe
+from recipe.models import Ingredient, Tag
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from rest_framework import status
+
+User = get_user_model()
+recipe_list_url = reverse("recipe:recipe-list")
+recipe_bulk_url = reverse("recipe:recipe-bulk")
+
+
+def get_recipe_detail_url(pk):
+    return reverse("recipe:recipe-detail", args=[pk])
+
+
+class RecipeSearchTests(AuthenticatedAPITestCase):
+    '''test the search param finds recipes by the words of their title,
+    instruction, tags and ingredients, best matches first'''
+
+    def search(self, text, **params):
+        r = self.client.get(recipe_list_url, {"search": text, **params})
+        self.assertEqual(r.status_code, status.HTTP_200_OK)
+        return [item["id"] for item in r.data["results"]]
+
+    def test_search_fields(self):
+        '''test the title, instruction, tag and ingredient names are searched,
+        with stemming'''
+        soup = create_recipe(self.user, title="Tomato soup")
+        salad = create_recipe(self.user, title="Salad", instruction="Chop onions")
+        curry = create_recipe(self.user, title="Curry")
+        curry.tags.add(Tag.objects.create(user=self.user, name="spicy"))
+        pasta = create_recipe(self.user, title="Pasta")
+        pasta.ingredients.add(Ingredient.objects.create(user=self.user, name="basil"))
+        self.assertEqual(self.search("tomatoes"), [soup.id])
+        self.assertEqual(self.search("onion"), [salad.id])
+        self.assertEqual(self.search("spicy"), [curry.id])
+        self.assertEqual(self.search("basil"), [pasta.id])
+
+    def test_search_all_words(self):
+        '''test recipes need all the words of the search'''
+        soup = create_recipe(self.user, title="Tomato soup")
+        create_recipe(self.user, title="Onion soup")
+        self.assertEqual(self.search("tomato soup"), [soup.id])
+
+    def test_search_ranked(self):
+        '''test matches in the title come before matches in the instruction'''
+        in_instruction = create_recipe(
+            self.user, title="Stew", instruction="Add a garlic clove"
+        )
+        in_title = create_recipe(self.user, title="Garlic bread")
+        self.assertEqual(self.search("garlic"), [in_title.id, in_instruction.id])
+
+    def test_search_own_recipes(self):
+        '''test one only finds her own recipes'''
+        user2 = User.objects.create_user(
+            email="testuser2@email.com", password="testing321"
+        )
+        create_recipe(user2, title="Tomato soup")
+        self.assertEqual(self.search("tomato"), [])
+
+    def test_search_syntax(self):
+        '''test the search is taken as plain words'''
+        soup = create_recipe(self.user, title="Tomato soup")
+        self.assertEqual(self.search('"tomato* (soup:'), [soup.id])
+        self.assertEqual(self.search("***"), [])
+
+    def test_search_pages(self):
+        '''test ranked results are paginated with a cursor'''
+        ids = [create_recipe(self.user, title=f"Soup {i}").id for i in range(5)]
+        r = self.client.get(recipe_list_url, {"search": "soup", "page_size": 2})
+        found = []
+        while True:
+            found += [item["id"] for item in r.data["results"]]
+            if not r.data["next"]:
+                break
+            r = self.client.get(r.data["next"])
+        self.assertEqual(sorted(found), ids)
+
+    def test_search_index_follows_changes(self):
+        '''test the index follows edits of recipes, tags and ingredients'''
+        recipe = create_recipe(self.user, title="Soup")
+        tag = Tag.objects.create(user=self.user, name="vegan")
+        recipe.tags.add(tag)
+        self.client.patch(get_recipe_detail_url(recipe.id), {"title": "Stew"})
+        self.assertEqual(self.search("soup"), [])
+        self.assertEqual(self.search("stew vegan"), [recipe.id])
+
+        tag.name = "vegetarian"
+        tag.save()
+        self.assertEqual(self.search("vegan"), [])
+        self.assertEqual(self.search("vegetarian"), [recipe.id])
+
+        tag.recipe_set.clear()
+        self.assertEqual(self.search("vegetarian"), [])
+        recipe.tags.add(tag)
+        tag.delete()
+        self.assertEqual(self.search("vegetarian"), [])
+
+    def test_search_bulk_created(self):
+        '''test recipes created in bulk are indexed with their tag names'''
+        payload = [
+            {"title": "Soup", "price": "3.56", "time_minutes": 5},
+            {
+                "title": "Stew",
+                "price": "3.56",
+                "time_minutes": 5,
+                "tag_names": ["winter"],
+            },
+        ]
+        ids = [item["id"] for item in self.client.post(
+            recipe_bulk_url, payload, format="json"
+        ).data]
+        self.assertEqual(self.search("winter"), [ids[1]])
@@ -0,0 +1,134 @@
+from recipe.tests.utils import AuthenticatedAPITestCase, create_recipe
+from recipe.models import Ingredient, Tag
+from recipe.similarity import SimilarityIndex
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase
+from django.urls import reverse
+from rest_framework import status
+import random
+
+User = get_user_model()
+
+
+def similar_url(pk):
+    return reverse("recipe:recipe-similar", args=[pk])
+
+
+class SimilarityIndexTests(SimpleTestCase):
+    '''test the neighbours of the index alone'''
+
+    def test_similar(self):
+        recipes = [(1, 0, 5, 30), (2, 0, 5, 30), (3, 0, 5, 30), (4, 0, 5, 30)]
+        relations = [
+            (1, "tags", 1),
+            (1, "ingredients", 1),
+            (2, "tags", 1),
+            (2, "ingredients", 1),
+            (3, "tags", 1),
+            (3, "ingredients", 2),
+            (4, "ingredients", 1),
+        ]
+        index = SimilarityIndex(2).updated(recipes, relations)
+        self.assertEqual([pk for pk, score in index.similar(1, 2)], [2, 4])
+        self.assertAlmostEqual(index.similar(1, 2)[0][1], 1)
+        self.assertEqual([pk for pk, score in index.similar(1, 1)], [2])
+        self.assertIsNone(index.similar(5, 2))
+
+    def test_updated_incrementally(self):
+        '''test updating an index with changed, new and deleted recipes finds
+        the neighbours an index built from scratch does'''
+        rnd = random.Random(1)
+
+        def random_relations(pk):
+            return [
+                (pk, rnd.choice(["tags", "ingredients"]), rnd.randrange(8))
+                for _ in range(rnd.randint(0, 3))
+            ]
+
+        recipes = [
+            (pk, 0, rnd.choice([1, 5, 20]), rnd.choice([5, 30, 90]))
+            for pk in range(1, 61)
+        ]
+        relations = [r for pk, *_ in recipes for r in random_relations(pk)]
+        index = SimilarityIndex(5).updated(recipes, relations)
+        for step in range(10):
+            recipes = [row for row in recipes if rnd.random() > 0.05]
+            changed = {row[0] for row in rnd.sample(recipes, 3)}
+            recipes = [
+                (pk, stamp + 1, price, minutes) if pk in changed else row
+                for row in recipes
+                for pk, stamp, price, minutes in [row]
+            ]
+            recipes += [(100 + step * 2 + i, 0, 5, 30) for i in range(2)]
+            changed.update(row[0] for row in recipes[-2:])
+            kept = {row[0] for row in recipes} - changed
+            relations = [r for r in relations if r[0] in kept]
+            new_relations = [r for pk in changed for r in random_relations(pk)]
+            relations += new_relations
+            index = index.updated(recipes, new_relations)
+            built = SimilarityIndex(5).updated(recipes, relations)
+            for pk, *_ in recipes:
+                self.assertEqual(index.similar(pk, 5), built.similar(pk, 5))
+
+
+class SimilarRecipesTests(AuthenticatedAPITestCase):
+    '''test the recipes similar to a recipe'''
+
+    def setUp(self):
+        super().setUp()
+        self.vegan = Tag.objects.create(user=self.user, name="vegan")
+        self.salt = Ingredient.objects.create(user=self.user, name="salt")
+        self.leek = Ingredient.objects.create(user=self.user, name="leek")
+        self.soup = create_recipe(
+            self.user, [self.vegan], [self.salt, self.leek], title="Leek soup"
+        )
+        self.stew = create_recipe(
+            self.user, [self.vegan], [self.salt, self.leek], title="Stew"
+        )
+        self.bread = create_recipe(
+            self.user, [], [self.salt], title="Bread", price=1, time_minutes=90
+        )
+
+    def get_similar(self, recipe, **params):
+        r = self.client.get(similar_url(recipe.id), params)
+        self.assertEqual(r.status_code, status.HTTP_200_OK)
+        return r.data
+
+    def test_similar(self):
+        '''test the most similar recipes first, rendered like the list, from
+        the neighbours kept once computed'''
+        data = self.get_similar(self.soup)
+        self.assertEqual([r["title"] for r in data], ["Stew", "Bread"])
+        self.assertEqual(data[0]["similarity"], 1)
+        self.assertLess(data[1]["similarity"], 1)
+        self.assertEqual(sorted(data[0]["tags"]), [self.vegan.id])
+        self.assertEqual(len(self.get_similar(self.soup, limit=1)), 1)
+        # the recipe, then the neighbours with their tags and ingredients
+        with self.assertNumQueries(4):
+            self.get_similar(self.soup)
+
+    def test_similar_follows_changes(self):
+        '''test the neighbours are updated as recipes and their relations
+        change'''
+        self.assertEqual(self.get_similar(self.bread)[0]["title"], "Leek soup")
+        toast = create_recipe(
+            self.user, [], [self.salt], title="Toast", price=1, time_minutes=90
+        )
+        self.assertEqual(self.get_similar(self.bread)[0]["title"], "Toast")
+        toast.ingredients.clear()
+        self.assertNotEqual(self.get_similar(self.bread)[0]["title"], "Toast")
+        self.stew.delete()
+        titles = [r["title"] for r in self.get_similar(self.soup)]
+        self.assertNotIn("Stew", titles)
+
+    def test_similar_own_recipes(self):
+        user2 = User.objects.create_user(email="testuser2@email.com")
+        other = create_recipe(user2, [], [], title="Leek soup")
+        r = self.client.get(similar_url(other.id))
+        self.assertEqual(r.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertNotIn(other.id, [r["id"] for r in self.get_similar(self.soup)])
+
+    def test_similar_invalid_limit(self):
+        for limit in (0, 1000, "some"):
+            r = self.client.get(similar_url(self.soup.id), {"limit": limit})
+            self.assertEqual(r.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,127 @@
+from recipe.tests.utils import AuthenticatedAPITestCase
+from recipe.models import Recipe, Ingredient, Tag
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework_simplejwt.tokens import AccessToken
+from asgiref.sync import async_to_sync
+
+recipe_list_url = reverse("recipe:recipe-list")
+async_recipe_list_url = reverse("recipe:async-recipe-list")
+
+
+def get_recipe_detail_url(pk):
+    return reverse("recipe:recipe-detail", args=[pk])
+
+
+class SparseFieldsTests(AuthenticatedAPITestCase):
+    '''test the fields and expand params narrow the recipes rendered and the
+    queries reading them'''
+
+    def setUp(self):
+        super().setUp()
+        self.tag = Tag.objects.create(user=self.user, name="vegan")
+        self.ingredient = Ingredient.objects.create(user=self.user, name="salt")
+        self.recipe = Recipe.objects.create(
+            user=self.user,
+            title="Soup",
+            instruction="Boil",
+            price=3.56,
+            time_minutes=5,
+        )
+        self.recipe.tags.add(self.tag)
+        self.recipe.ingredients.add(self.ingredient)
+
+    def get_queries(self, url, params):
+        with CaptureQueriesContext(connection) as queries:
+            r = self.client.get(url, params)
+        self.assertEqual(r.status_code, status.HTTP_200_OK)
+        return r, [query["sql"] for query in queries.captured_queries]
+
+    def test_fields(self):
+        '''test only the fields asked for are rendered and read'''
+        r, queries = self.get_queries(recipe_list_url, {"fields": "id,title"})
+        self.assertEqual(r.data["results"], [{"id": self.recipe.id, "title": "Soup"}])
+        # the change stamp and the page, no relations
+        self.assertEqual(len(queries), 2)
+        self.assertIn('"title"', queries[1])
+        self.assertNotIn('"instruction"', queries[1])
+
+    def test_fields_relations(self):
+        r, queries = self.get_queries(recipe_list_url, {"fields": "title,tags"})
+        self.assertEqual(r.data["results"], [{"title": "Soup", "tags": [self.tag.id]}])
+        self.assertEqual(len(queries), 3)
+        self.assertNotIn('"name"', queries[2])
+
+    def test_expand(self):
+        '''test the list nests the tags and ingredients expanded, reading
+        their names'''
+        r, queries = self.get_queries(recipe_list_url, {"expand": "tags"})
+        item = r.data["results"][0]
+        self.assertEqual(item["tags"], [{"name": "vegan", "id": self.tag.id}])
+        self.assertEqual(item["ingredients"], [self.ingredient.id])
+        self.assertEqual(item["instruction"], "Boil")
+        self.assertEqual(len(queries), 4)
+
+        r = self.client.get(
+            recipe_list_url, {"expand": "tags,ingredients", "fields": "ingredients"}
+        )
+        self.assertEqual(
+            r.data["results"],
+            [{"ingredients": [{"name": "salt", "id": self.ingredient.id}]}],
+        )
+
+    def test_expand_etag(self):
+        '''test the etag of a list expanding tags changes with their names'''
+        params = {"expand": "tags"}
+        etag = self.client.get(recipe_list_url, params)["ETag"]
+        self.tag.name = "vegetarian"
+        self.tag.save()
+        r = self.client.get(recipe_list_url, params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(r.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(r["ETag"], etag)
+        self.assertEqual(r.data["results"][0]["tags"][0]["name"], "vegetarian")
+
+    def test_retrieve_fields(self):
+        r = self.client.get(
+            get_recipe_detail_url(self.recipe.id), {"fields": "title,tags"}
+        )
+        self.assertEqual(
+            r.data, {"title": "Soup", "tags": [{"name": "vegan", "id": self.tag.id}]}
+        )
+
+    def test_image_renditions(self):
+        r = self.client.get(recipe_list_url, {"fields": "image_renditions"})
+        self.assertEqual(r.data["results"], [{"image_renditions": None}])
+
+    def test_unknown_fields(self):
+        for params in (
+            {"fields": "title,nope"},
+            {"fields": "tag_names"},
+            {"expand": "instruction"},
+        ):
+            r = self.client.get(recipe_list_url, params)
+            self.assertEqual(r.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("instruction", r.data["expand"][0])
+
+    def test_writes_render_all_fields(self):
+        r = self.client.patch(
+            get_recipe_detail_url(self.recipe.id) + "?fields=id", {"title": "Stew"}
+        )
+        self.assertEqual(r.status_code, status.HTTP_200_OK)
+        self.assertEqual(r.data["title"], "Stew")
+        self.assertEqual(r.data["tags"], [self.tag.id])
+
+    def test_async_list(self):
+        '''test the async list narrows the same way'''
+        auth = f"Bearer {AccessToken.for_user(self.user)}"
+        r = async_to_sync(self.async_client.get)(
+            async_recipe_list_url,
+            {"fields": "title,tags", "expand": "tags"},
+            headers={"Authorization": auth},
+        )
+        self.assertEqual(
+            r.json()["results"],
+            [{"title": "Soup", "tags": [{"name": "vegan", "id": self.tag.id}]}],
+        )
@@ -62,8 +62,8 @@ class PrivateAPITests(APITestCase):
         serializer2 = TagSerializer([tag2], many=True)
         r = self.client.get(tags_url)
         self.assertEqual(r.status_code, status.HTTP_200_OK)
-        self.assertEqual(r.data, serializer1.data)
-        self.assertNotEqual(r.data, serializer2.data)
+        self.assertEqual(r.data["results"], serializer1.data)
+        self.assertNotEqual(r.data["results"], serializer2.data)
 
     def test_list_tags_assigned_only(self):
         '''test one can list only tags that have been assigned to a recipe
@@ -76,8 +76,8 @@ class PrivateAPITests(APITestCase):
         serializer1 = TagSerializer([tag1], many=True)
         serializer2 = TagSerializer([tag2], many=True)
         self.assertEqual(r.status_code, status.HTTP_200_OK)
-        self.assertEqual(r.data, serializer1.data)
-        self.assertNotEqual(r.data, serializer2.data)
+        self.assertEqual(r.data["results"], serializer1.data)
+        self.assertNotEqual(r.data["results"], serializer2.data)
 
     def test_list_tags_assigned_distinct(self):
         '''when a tag has over 2 recipes associated, and when you request
@@ -89,14 +89,56 @@ class PrivateAPITests(APITestCase):
         recipe2 = create_recipe(user=self.user, **{'title': 'recipe2'})
         tag1.recipe_set.set([recipe1, recipe2])
         r = self.client.get(tags_url, {'assigned_only': 1})
-        self.assertEqual(r.data, TagSerializer([tag1], many=True).data)
-        self.assertEqual(len(r.data), 1)
+        self.assertEqual(r.data["results"], TagSerializer([tag1], many=True).data)
+        self.assertEqual(len(r.data["results"]), 1)
 
     def test_create_tag(self):
         r = self.client.post(tags_url, {"name": "test_tag"})
         self.assertEqual(r.status_code, status.HTTP_201_CREATED)
         self.assertEqual(Tag.objects.get(id=r.data['id']).user, self.user)
 
+    def test_create_tag_idempotent(self):
+        """test creating a tag the user already has, whatever its case,
+        returns the existing one"""
+        tag = create_tag(user=self.user, name="Dinner")
+        r = self.client.post(tags_url, {"name": "dinner"})
+        self.assertEqual(r.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(r.data, {"name": "Dinner", "id": tag.id})
+        self.assertEqual(Tag.objects.count(), 1)
+
+    def test_create_tag_non_ascii(self):
+        """test names the database lowercases otherwise than Python does are
+        created and found again"""
+        r = self.client.post(tags_url, {"name": "Éclair"})
+        self.assertEqual(r.status_code, status.HTTP_201_CREATED)
+        payload = [{"name": "Éclair"}, {"name": "İmam"}]
+        r2 = self.client.post(tags_url, payload, format="json")
+        self.assertEqual(r2.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(r2.data[0]["id"], r.data["id"])
+        self.assertEqual(r2.data[1]["name"], "İmam")
+        self.assertEqual(Tag.objects.count(), 2)
+
+    def test_create_tag_name_per_user(self):
+        """test different users can have tags of the same name"""
+        user2 = User.objects.create_user(
+            email="testuser2@email.com", password="testing321"
+        )
+        tag = create_tag(user=user2, name="dinner")
+        r = self.client.post(tags_url, {"name": "dinner"})
+        self.assertNotEqual(r.data["id"], tag.id)
+        self.assertEqual(Tag.objects.get(id=r.data["id"]).user, self.user)
+
+    def test_create_tags_many_names(self):
+        """test a list of names is resolved with a fixed number of queries"""
+        create_tag(user=self.user, name="tag0")
+        payload = [{"name": f"tag{i}"} for i in range(20)]
+        # lowercasing the names, inserting and selecting them
+        with self.assertNumQueries(3):
+            r = self.client.post(tags_url, payload, format="json")
+        names = [item["name"] for item in r.data]
+        self.assertEqual(names, [f"tag{i}" for i in range(20)])
+        self.assertEqual(self.user.tag_set.count(), 20)
+
     def test_list_ingredients(self):
         '''test listing ingredients successfully and one can only access
          her own ingredients'''
@@ -109,8 +151,8 @@ class PrivateAPITests(APITestCase):
         serializer2 = IngredientSerializer([ingredient2], many=True)
         r = self.client.get(ingredients_url)
         self.assertEqual(r.status_code, status.HTTP_200_OK)
-        self.assertEqual(r.data, serializer1.data)
-        self.assertNotEqual(r.data, serializer2.data)
+        self.assertEqual(r.data["results"], serializer1.data)
+        self.assertNotEqual(r.data["results"], serializer2.data)
 
     def test_list_ingredients_assigned_only(self):
         '''test one can list only ingredients that have been assigned to a
@@ -123,8 +165,8 @@ class PrivateAPITests(APITestCase):
         serializer1 = IngredientSerializer([ingredient1], many=True)
         serializer2 = IngredientSerializer([ingredient2], many=True)
         self.assertEqual(r.status_code, status.HTTP_200_OK)
-        self.assertEqual(r.data, serializer1.data)
-        self.assertNotEqual(r.data, serializer2.data)
+        self.assertEqual(r.data["results"], serializer1.data)
+        self.assertNotEqual(r.data["results"], serializer2.data)
 
     def test_list_ingredients_assigned_distinct(self):
         '''when a ingredient has over 2 recipes associated, and when you request
@@ -136,8 +178,10 @@ class PrivateAPITests(APITestCase):
         recipe2 = create_recipe(user=self.user, **{'title': 'recipe2'})
         ingredient1.recipe_set.set([recipe1, recipe2])
         r = self.client.get(ingredients_url, {'assigned_only': 1})
-        self.assertEqual(r.data, IngredientSerializer([ingredient1], many=True).data)
-        self.assertEqual(len(r.data), 1)
+        self.assertEqual(
+            r.data["results"], IngredientSerializer([ingredient1], many=True).data
+        )
+        self.assertEqual(len(r.data["results"]), 1)
 
     def test_create_ingredient(self):
         r = self.client.post(ingredients_url, {"name": "test_ingredient"})
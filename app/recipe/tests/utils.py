@@ -0,0 +1,30 @@
+'''helpers shared by the recipe tests'''
+from rest_framework.test import APITestCase, APIClient
+from recipe.models import Recipe
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+
+
+def create_recipe(user, tags=(), ingredients=(), **updates):
+    defaults = {"title": "recipe", "price": 3.56, "time_minutes": 5}
+    defaults.update(updates)
+    recipe = Recipe.objects.create(user=user, **defaults)
+    # adding nothing still sends m2m_changed, whose receivers query
+    if tags:
+        recipe.tags.add(*tags)
+    if ingredients:
+        recipe.ingredients.add(*ingredients)
+    return recipe
+
+
+class AuthenticatedAPITestCase(APITestCase):
+    '''tests of the API with a client authenticated as self.user, starting
+    from an empty cache'''
+
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(
+            email="testuser@email.com", password="testing321"
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
@@ -1,6 +1,7 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from recipe.views import TagViewSet, IngredientViewSet, RecipeViewSet
+from recipe.views import TagViewSet, IngredientViewSet, RecipeViewSet, FeedView
+from recipe import async_views
 
 app_name = "recipe"
 
@@ -10,5 +11,24 @@ router.register("ingredients", IngredientViewSet)
 router.register('recipes', RecipeViewSet)
 
 urlpatterns = [
-    path("", include(router.urls))
+    path("", include(router.urls)),
+    path("feed/", FeedView.as_view(), name="feed"),
+    path(
+        "async/recipes/",
+        async_views.AsyncRecipeListView.as_view(),
+        name="async-recipe-list",
+    ),
+    path(
+        "async/recipes/<int:pk>/",
+        async_views.AsyncRecipeDetailView.as_view(),
+        name="async-recipe-detail",
+    ),
+    path(
+        "async/tags/", async_views.AsyncTagListView.as_view(), name="async-tag-list"
+    ),
+    path(
+        "async/ingredients/",
+        async_views.AsyncIngredientListView.as_view(),
+        name="async-ingredient-list",
+    ),
 ]
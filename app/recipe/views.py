@@ -1,32 +1,141 @@
 from django.shortcuts import render
-from rest_framework import viewsets, mixins, status
+from rest_framework import viewsets, mixins, status, generics
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from recipe.models import Tag, Ingredient, Recipe
-from recipe import serializers
+from recipe import autocomplete, matching, serializers, similarity
+from recipe.cache import cache_response, invalidate_responses
+from recipe.pagination import RecipeCursorPagination, RecipeAttrCursorPagination
+from recipe.search import search_recipes
+from recipe.signals import deleting_in_bulk
+from recipe.feed import get_feed
+from recipe.importer import content_key, import_recipes, read_rows
+from rest_framework.exceptions import ValidationError
+from rest_framework.parsers import MultiPartParser
+from rest_framework.utils.urls import replace_query_param
 from rest_framework.permissions import IsAuthenticated
-from rest_framework_simplejwt.authentication import JWTAuthentication
+from users.authentication import StatelessJWTAuthentication
+from users.throttling import WriteRateThrottle
 import base64
+import itertools
 import json
 from django.core.files.base import ContentFile
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Prefetch, Count, Max, prefetch_related_objects
+from django.http import StreamingHttpResponse
+from django.utils.decorators import method_decorator
+from django.views.decorators.gzip import gzip_page
+
+
+class BulkDestroyMixin:
+    '''delete many of the user's objects by id in one transaction'''
+
+    def bulk_destroy(self, request):
+        serializer = serializers.BulkDestroySerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = serializer.validated_data["ids"]
+        with transaction.atomic():
+            queryset = self.queryset.filter(user_id=request.user.id, id__in=ids)
+            found = set(queryset.values_list("id", flat=True))
+            with deleting_in_bulk(queryset.model, found):
+                queryset.delete()
+        return Response([{"id": pk, "deleted": pk in found} for pk in ids])
+
+
+class RecipeAttrQueryMixin:
+    '''the user's tags or ingredients, shared by the viewsets and the async
+    views of recipe.async_views'''
+
+    # the serializers rendering the number of recipes, with the with_counts
+    # query param
+    count_serializer_classes = {
+        Tag: serializers.TagCountSerializer,
+        Ingredient: serializers.IngredientCountSerializer,
+    }
+
+    def get_flag_param(self, name):
+        return bool(int(self.request.query_params.get(name, 0)))
+
+    def get_queryset(self):
+        queryset = self.queryset
+        if self.get_flag_param("assigned_only"):
+            # counted by recipe.signals, so no join with the recipes
+            queryset = queryset.filter(recipe_count__gt=0)
+        prefix = self.request.query_params.get("prefix")
+        if prefix:
+            queryset = autocomplete.filter_prefix(queryset, prefix)
+        return queryset.filter(user_id=self.request.user.id).all().order_by("name")
+
+    def get_serializer_class(self):
+        if self.get_flag_param("with_counts"):
+            return self.count_serializer_classes[self.queryset.model]
+        return super().get_serializer_class()
+
+    def get_change_stamp(self):
+        stamp = self.get_queryset().order_by().aggregate(Count("id"), Max("updated_at"))
+        return tuple(stamp.values())
+
+    async def aget_change_stamp(self):
+        stamp = await self.get_queryset().order_by().aaggregate(
+            Count("id"), Max("updated_at")
+        )
+        return tuple(stamp.values())
 
 
 class BaseRecipeAttrViewSet(
-    viewsets.GenericViewSet, mixins.CreateModelMixin, mixins.ListModelMixin
+    RecipeAttrQueryMixin,
+    BulkDestroyMixin,
+    viewsets.GenericViewSet,
+    mixins.CreateModelMixin,
+    mixins.ListModelMixin,
 ):
     '''Base class for Tag and Ingredient ViewSets'''
     permission_classes = [IsAuthenticated]
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [StatelessJWTAuthentication]
+    throttle_classes = [WriteRateThrottle]
+    throttle_scope = "recipe_write"
+    pagination_class = RecipeAttrCursorPagination
 
-    def get_queryset(self):
-        assigned_only = bool(int(self.request.query_params.get("assigned_only", 0)))
-        queryset = self.queryset
-        if assigned_only:
-            queryset = queryset.filter(recipe__isnull=False).distinct()
-        return queryset.filter(user=self.request.user).all().order_by("name")
+    @cache_response
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
 
-    def perform_create(self, serializer):
-        serializer.save(user=self.request.user)
+    def create(self, request, *args, **kwargs):
+        '''get or create one ({"name": ...}) or many ([{"name": ...}, ...])
+        objects by name, names match the user's objects case-insensitively so
+        repeating a request creates nothing more'''
+        many = isinstance(request.data, list)
+        kwargs = {"many": True, "max_length": settings.BULK_MAX_ITEMS} if many else {}
+        serializer = self.get_serializer(data=request.data, **kwargs)
+        serializer.is_valid(raise_exception=True)
+        items = serializer.validated_data if many else [serializer.validated_data]
+        objs = self.queryset.model.objects.get_or_create_many(
+            request.user.id, [item["name"] for item in items]
+        )
+        # bulk_create sends no post_save
+        invalidate_responses(request.user.id)
+        data = self.get_serializer(objs, many=True).data
+        return Response(data if many else data[0], status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=["POST", "DELETE"])
+    def bulk(self, request):
+        '''get or create (POST) or delete (DELETE) many objects in one request'''
+        if request.method == "DELETE":
+            return self.bulk_destroy(request)
+        return self.create(request)
+
+    @action(detail=False, methods=["GET"])
+    def autocomplete(self, request):
+        '''the names and ids of the objects starting with the prefix param,
+        whatever its case, the ones with the most recipes first'''
+        params = serializers.AutocompleteSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        return Response(
+            autocomplete.complete(
+                self.queryset.model, request.user.id, **params.validated_data
+            )
+        )
 
 
 class TagViewSet(BaseRecipeAttrViewSet):
@@ -39,14 +148,23 @@ class IngredientViewSet(BaseRecipeAttrViewSet):
     queryset = Ingredient.objects.all()
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
-    queryset = Recipe.objects.all()
-    serializer_class = serializers.RecipeSerializer
-    permission_classes = [IsAuthenticated]
-    authentication_classes = [JWTAuthentication]
-
-    def perform_create(self, serializer):
-        serializer.save(user=self.request.user)
+class RecipeQueryMixin:
+    '''the user's recipes, filtered by the query params, shared by the viewset
+    and the async views of recipe.async_views'''
+    # the search vector is only read by the database
+    queryset = Recipe.objects.defer("search_vector")
+    # actions whose response renders the tags and ingredients of the recipes
+    prefetch_actions = ("list", "retrieve", "update", "partial_update")
+    # actions whose response can be narrowed to the fields query param, and
+    # the list's tags and ingredients nested by the expand param
+    sparse_actions = ("list", "retrieve")
+    expandable_fields = ("tags", "ingredients")
+    # the columns read for the fields that aren't a column of their own
+    field_columns = {
+        "image_renditions": ("image", "image_status"),
+        "tags": (),
+        "ingredients": (),
+    }
 
     def str_to_int(self, ids_str):
         id_ints = [int(id) for id in ids_str.split(",")]
@@ -57,20 +175,313 @@ class RecipeViewSet(viewsets.ModelViewSet):
         ingredients = self.request.query_params.get("ingredients")
         queryset = self.queryset
         if tags:
-            tags = self.str_to_int(tags)
-            queryset = queryset.filter(tags__in=tags).distinct()
+            queryset = queryset.with_any_tags(self.str_to_int(tags))
         if ingredients:
-            ingredients = self.str_to_int(ingredients)
-            queryset = queryset.filter(ingredients__in=ingredients).distinct()
-        return queryset.filter(user=self.request.user)
+            queryset = queryset.with_any_ingredients(self.str_to_int(ingredients))
+        queryset = queryset.filter(user_id=self.request.user.id)
+        search = self.request.query_params.get("search", "").strip()
+        if search:
+            queryset = search_recipes(queryset, search)
+        fields = self.get_fields()
+        if fields is not None:
+            queryset = queryset.only(
+                "id",
+                *(
+                    column
+                    for field in fields
+                    for column in self.field_columns.get(field, (field,))
+                ),
+            )
+        if self.action in self.prefetch_actions:
+            queryset = queryset.prefetch_related(*self.get_prefetches())
+        return queryset
+
+    def get_prefetches(self):
+        '''list serializes tags and ingredients as ids and retrieve, or list
+        expanding them, as {name, id}, so only load the columns each of them
+        renders, and none of the relations left out of the fields'''
+        fields = self.get_fields()
+        expand = self.get_expand()
+        prefetches = []
+        for field, model in (("tags", Tag), ("ingredients", Ingredient)):
+            if fields is not None and field not in fields:
+                continue
+            nested = self.action == "retrieve" or field in expand
+            columns = ["id", "name"] if nested else ["id"]
+            prefetches.append(Prefetch(field, queryset=model.objects.only(*columns)))
+        return prefetches
+
+    def get_names_param(self, name, allowed):
+        '''the comma separated names of a query param, None without it'''
+        value = self.request.query_params.get(name)
+        if value is None:
+            return None
+        names = [item.strip() for item in value.split(",") if item.strip()]
+        unknown = [item for item in names if item not in allowed]
+        if unknown:
+            raise ValidationError({name: [f"Unknown fields: {', '.join(unknown)}."]})
+        return names
+
+    def get_fields(self):
+        '''the fields the response renders, None for all of them'''
+        if self.action not in self.sparse_actions:
+            return None
+        readable = [
+            name
+            for name, field in self.serializer_class().fields.items()
+            if not field.write_only
+        ]
+        return self.get_names_param("fields", readable)
+
+    def get_expand(self):
+        '''the relations the list nests, retrieve always nests them'''
+        if self.action not in self.sparse_actions:
+            return []
+        expand = self.get_names_param("expand", self.expandable_fields) or []
+        return expand if self.action == "list" else []
+
+    def get_serializer(self, *args, **kwargs):
+        if self.action in self.sparse_actions:
+            kwargs.setdefault("fields", self.get_fields())
+            kwargs.setdefault("expand", self.get_expand())
+        return super().get_serializer(*args, **kwargs)
+
+    def get_change_stamp_query(self):
+        '''the queryset and the aggregates of the change stamp: the number and
+        the latest update of the recipes of the response, a detail also
+        renders the names of its tags and ingredients, and the list those it
+        expands'''
+        queryset = self.get_queryset().order_by()
+        if not self.detail:
+            expand = self.get_expand()
+            if not expand:
+                return queryset, [Count("id"), Max("updated_at")]
+            return queryset, [
+                Count("id", distinct=True),
+                Max("updated_at"),
+                *(Max(f"{field}__updated_at") for field in expand),
+            ]
+        try:
+            queryset = queryset.filter(pk=self.kwargs["pk"])
+        except ValueError:
+            # not an id, retrieve answers with a 404
+            return None, None
+        return queryset, [
+            Count("id", distinct=True),
+            Max("updated_at"),
+            Max("tags__updated_at"),
+            Max("ingredients__updated_at"),
+        ]
+
+    def to_change_stamp(self, stamp):
+        if stamp is None:
+            return 0, None
+        count, *updates = stamp.values()
+        return count, max(filter(None, updates), default=None)
+
+    def get_change_stamp(self):
+        queryset, aggregates = self.get_change_stamp_query()
+        if queryset is None:
+            return self.to_change_stamp(None)
+        return self.to_change_stamp(queryset.aggregate(*aggregates))
+
+    async def aget_change_stamp(self):
+        queryset, aggregates = self.get_change_stamp_query()
+        if queryset is None:
+            return self.to_change_stamp(None)
+        return self.to_change_stamp(await queryset.aaggregate(*aggregates))
+
+
+class RecipeViewSet(RecipeQueryMixin, BulkDestroyMixin, viewsets.ModelViewSet):
+    serializer_class = serializers.RecipeSerializer
+    permission_classes = [IsAuthenticated]
+    authentication_classes = [StatelessJWTAuthentication]
+    throttle_classes = [WriteRateThrottle]
+    throttle_scope = "recipe_write"
+    pagination_class = RecipeCursorPagination
+
+    @cache_response
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @cache_response
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
+    def perform_create(self, serializer):
+        serializer.save(user_id=self.request.user.id)
 
     def get_serializer_class(self):
         if self.action == "retrieve":
             return serializers.RecipeDetailSerializer
         if self.action == "upload_image":
             return serializers.RecipeUploadImageSerializer
+        if self.action == "bulk":
+            return serializers.RecipeBulkSerializer
         return self.serializer_class
 
+    @action(detail=False, methods=["POST", "PATCH", "DELETE"])
+    def bulk(self, request):
+        '''create (POST), partially update (PATCH, each item with its id) or
+        delete (DELETE, {"ids": [...]}) many recipes in one transaction, the
+        response has the result of each item in the order they were given'''
+        if request.method == "DELETE":
+            return self.bulk_destroy(request)
+        creating = request.method == "POST"
+        serializer = self.get_serializer(
+            None if creating else self.get_queryset(),
+            data=request.data,
+            many=True,
+            partial=not creating,
+            max_length=settings.BULK_MAX_ITEMS,
+        )
+        serializer.is_valid(raise_exception=True)
+        if creating:
+            recipes = serializer.save(user_id=request.user.id)
+        else:
+            recipes = serializer.save()
+        # bulk_create and bulk_update send no post_save
+        invalidate_responses(request.user.id)
+        ids = [recipe.id for recipe in recipes]
+        saved = self.queryset.prefetch_related(*self.get_prefetches()).in_bulk(ids)
+        serializer = serializers.RecipeSerializer(
+            [saved[pk] for pk in ids], many=True, context=self.get_serializer_context()
+        )
+        return Response(
+            serializer.data,
+            status.HTTP_201_CREATED if creating else status.HTTP_200_OK,
+        )
+
+    @action(detail=False, methods=["GET"])
+    @cache_response
+    def facets(self, request):
+        '''the number of the recipes matching the filters with each tag and
+        each ingredient, the most common first'''
+        counts = self.get_queryset().facet_counts()
+        return Response(
+            {
+                facet: [
+                    {"id": pk, "count": count}
+                    for pk, count in sorted(
+                        facet_counts.items(), key=lambda item: (-item[1], item[0])
+                    )
+                ]
+                for facet, facet_counts in counts.items()
+            }
+        )
+
+    @action(detail=False, methods=["GET"])
+    def cook(self, request):
+        '''the recipes matching the ingredients param, the ones using the
+        largest share of them first, with the ids of the ingredients each
+        recipe misses'''
+        params = serializers.RecipeMatchSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        count, matches = matching.match_recipes(
+            request.user.id, **params.validated_data
+        )
+        recipes = self.render_recipes([m.recipe_id for m in matches])
+        return Response(
+            {
+                "count": count,
+                "results": [
+                    {
+                        **recipes[m.recipe_id],
+                        "matched": m.matched,
+                        "missing": m.missing_ids,
+                        "coverage": round(m.coverage, 4),
+                    }
+                    for m in matches
+                    # deleted since the index was read
+                    if m.recipe_id in recipes
+                ],
+            }
+        )
+
+    @action(detail=True, methods=["GET"])
+    def similar(self, request, pk=None):
+        '''the recipes most similar to the recipe by their tags, ingredients,
+        price and time, with their cosine similarity'''
+        recipe = self.get_object()
+        params = serializers.SimilarRecipesSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        neighbours = similarity.similar_recipes(
+            request.user.id, recipe.id, params.validated_data["limit"]
+        )
+        # None when created since the index was read
+        neighbours = neighbours or []
+        recipes = self.render_recipes([pk for pk, score in neighbours])
+        return Response(
+            [
+                {**recipes[pk], "similarity": round(score, 4)}
+                for pk, score in neighbours
+                if pk in recipes
+            ]
+        )
+
+    def render_recipes(self, ids):
+        '''the user's recipes of the ids rendered like the list, by id'''
+        recipes = (
+            self.queryset.filter(user_id=self.request.user.id)
+            .prefetch_related(*self.get_prefetches())
+            .in_bulk(ids)
+        )
+        serializer = self.get_serializer(list(recipes.values()), many=True)
+        return {data["id"]: data for data in serializer.data}
+
+    @method_decorator(gzip_page)
+    @action(detail=False, methods=["GET"])
+    def export(self, request):
+        '''stream all the user's recipes, or those matching the filters, as
+        NDJSON, gzipped when the client accepts it'''
+        queryset = (
+            self.get_queryset()
+            .order_by("id")
+            .prefetch_related(
+                Prefetch("tags", queryset=Tag.objects.only("id", "name")),
+                Prefetch("ingredients", queryset=Ingredient.objects.only("id", "name")),
+            )
+        )
+        response = StreamingHttpResponse(
+            self.export_lines(queryset), content_type="application/x-ndjson"
+        )
+        response["Content-Disposition"] = 'attachment; filename="recipes.ndjson"'
+        return response
+
+    def export_lines(self, queryset):
+        '''the recipes a chunk at a time: iterator() reads them from a
+        server-side cursor and prefetches the tags and ingredients of each
+        chunk, so memory doesn't grow with the number of recipes'''
+        chunk_size = settings.RECIPE_EXPORT_CHUNK_SIZE
+        recipes = queryset.iterator(chunk_size=chunk_size)
+        while chunk := list(itertools.islice(recipes, chunk_size)):
+            data = serializers.RecipeExportSerializer(chunk, many=True).data
+            yield "".join(json.dumps(item) + "\n" for item in data).encode()
+
+    @action(
+        detail=False,
+        methods=["POST"],
+        url_path="import",
+        parser_classes=[MultiPartParser],
+    )
+    def import_recipes(self, request):
+        '''import the recipes of an uploaded NDJSON or CSV file, see
+        recipe.importer, uploading it again with the same key carries on
+        after the rows already imported, a 409 tells the key was already
+        imported in full'''
+        serializer = serializers.RecipeImportFileSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        upload = serializer.validated_data["file"]
+        result = import_recipes(
+            request.user.id,
+            read_rows(upload, upload.name, serializer.validated_data.get("format")),
+            serializer.validated_data.get("key") or content_key(upload),
+            restart=serializer.validated_data["restart"],
+        )
+        if result["already_imported"]:
+            return Response(result, status.HTTP_409_CONFLICT)
+        return Response(result, status.HTTP_201_CREATED)
+
     @action(detail=True, methods=["POST"], url_path="upload-image")
     def upload_image(self, request, pk=None):
         recipe = self.get_object()
@@ -79,3 +490,40 @@ class RecipeViewSet(viewsets.ModelViewSet):
             serialzer.save()
             return Response(serialzer.data, status.HTTP_200_OK)
         return Response(serialzer.errors, status.HTTP_400_BAD_REQUEST)
+
+
+class FeedView(generics.GenericAPIView):
+    '''the latest recipes of the users one follows, newest first, a page at a
+    time: the next link asks for the recipes before the last one of the page'''
+    serializer_class = serializers.FeedRecipeSerializer
+    permission_classes = [IsAuthenticated]
+    authentication_classes = [StatelessJWTAuthentication]
+    pagination_class = RecipeCursorPagination
+
+    def get(self, request):
+        params = serializers.FeedParamsSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        paginator = self.paginator
+        page_size = min(
+            params.validated_data.get("page_size", paginator.page_size),
+            paginator.max_page_size,
+        )
+        recipes = get_feed(
+            request.user.id, page_size + 1, params.validated_data.get("before")
+        )
+        next_url = None
+        if len(recipes) > page_size:
+            recipes = recipes[:page_size]
+            next_url = replace_query_param(
+                request.build_absolute_uri(), "before", recipes[-1].id
+            )
+        # the feed merges two queries, its recipes are prefetched together
+        prefetch_related_objects(recipes, *self.get_prefetches())
+        serializer = self.get_serializer(recipes, many=True)
+        return Response({"next": next_url, "results": serializer.data})
+
+    def get_prefetches(self):
+        return [
+            Prefetch("tags", queryset=Tag.objects.only("id")),
+            Prefetch("ingredients", queryset=Ingredient.objects.only("id")),
+        ]
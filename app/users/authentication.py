@@ -0,0 +1,100 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.utils.functional import cached_property
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings
+import time
+
+
+# the claim of the time a token was issued at in nanoseconds, iat is in whole
+# seconds, so a token issued earlier in the second of a revocation would pass
+ISSUED_AT_CLAIM = "iat_ns"
+
+
+def revoked_key(user_id):
+    return f"users:tokens_revoked_ns:{user_id}"
+
+
+def revoke_tokens(user_id):
+    '''reject the tokens issued to a user until now, the mark is kept as long as
+    a refresh token lives, after that the tokens have expired anyway'''
+    cache.set(
+        revoked_key(user_id),
+        time.time_ns(),
+        timeout=settings.SIMPLE_JWT["REFRESH_TOKEN_LIFETIME"].total_seconds(),
+    )
+
+
+def issued_at(token):
+    '''the nanosecond a token was issued at, a token issued without the claim
+    is taken as issued at the start of its second'''
+    if ISSUED_AT_CLAIM in token:
+        return token[ISSUED_AT_CLAIM]
+    return token.get("iat", 0) * 1_000_000_000
+
+
+def is_revoked(token):
+    '''a token is revoked when it was issued before its user was revoked'''
+    revoked_at = cache.get(revoked_key(token.get(api_settings.USER_ID_CLAIM)))
+    return revoked_at is not None and issued_at(token) < revoked_at
+
+
+async def ais_revoked(token):
+    revoked_at = await cache.aget(revoked_key(token.get(api_settings.USER_ID_CLAIM)))
+    return revoked_at is not None and issued_at(token) < revoked_at
+
+
+class ClaimsUser(TokenUser):
+    '''user built from the claims of an access token rather than from the DB,
+    the claims are added to the tokens by users.serializers.TokenObtainSerializer'''
+
+    @cached_property
+    def email(self):
+        return self.token.get("email", "")
+
+    @cached_property
+    def is_active(self):
+        return self.token.get("is_active", True)
+
+    @cached_property
+    def instance(self):
+        '''the user model, only loaded when a view really needs it'''
+        return get_user_model().objects.get(pk=self.id)
+
+
+class StatelessJWTAuthentication(JWTAuthentication):
+    '''authenticate with a JWT without looking the user up in the DB,
+    only checking in the cache whether the tokens of the user were revoked'''
+
+    def get_user(self, validated_token):
+        self.check_user_claim(validated_token)
+        return self.make_user(validated_token, is_revoked(validated_token))
+
+    async def aauthenticate(self, request):
+        '''authenticate for the async views: checking the token is CPU work,
+        only the revocation is awaited from the cache'''
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+        validated_token = self.get_validated_token(raw_token)
+        self.check_user_claim(validated_token)
+        revoked = await ais_revoked(validated_token)
+        return self.make_user(validated_token, revoked), validated_token
+
+    def check_user_claim(self, validated_token):
+        if api_settings.USER_ID_CLAIM not in validated_token:
+            raise InvalidToken("Token contained no recognizable user identification")
+
+    def make_user(self, validated_token, revoked):
+        if revoked:
+            raise AuthenticationFailed("Token has been revoked", code="token_revoked")
+        user = ClaimsUser(validated_token)
+        if not user.is_active:
+            raise AuthenticationFailed("User is inactive", code="user_inactive")
+        return user
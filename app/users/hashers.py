@@ -0,0 +1,78 @@
+'''Password hashers tuned by settings and optionally run in a bounded pool.
+
+Hashing a password is slow on purpose, and signups and logins hash on the
+request thread, so a burst of them can take all the CPU of a worker. The
+hashers here are Django's, but:
+
+- Argon2PasswordHasher reads its costs from the PASSWORD_ARGON2_* settings.
+  Django rehashes a password on the next successful login when the hasher
+  that made it isn't the first of PASSWORD_HASHERS or its costs changed, so
+  retuning or switching hashers needs no migration.
+- with PASSWORD_HASH_POOL_SIZE set, the hashes of all the requests of a
+  process are computed by a pool of that many threads. argon2 and hashlib
+  release the GIL while hashing, so the threads run in parallel, but at most
+  that many cores hash at once and other requests keep the rest. Requests
+  waiting for a hash sleep rather than spin.'''
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.contrib.auth import hashers
+import threading
+
+_pools = {}
+_pools_lock = threading.Lock()
+# set in the threads of the pools, PBKDF2's verify calls encode, which must
+# not wait for another thread of a full pool
+_local = threading.local()
+
+
+def get_pool():
+    '''the pool of the process, None when hashing on the calling thread'''
+    size = settings.PASSWORD_HASH_POOL_SIZE
+    if not size:
+        return None
+    with _pools_lock:
+        if size not in _pools:
+            _pools[size] = ThreadPoolExecutor(
+                max_workers=size, thread_name_prefix="password-hash"
+            )
+        return _pools[size]
+
+
+def run_in_pool(func, *args, **kwargs):
+    pool = get_pool()
+    if pool is None or getattr(_local, "in_pool", False):
+        return func(*args, **kwargs)
+    return pool.submit(run_in_thread, func, *args, **kwargs).result()
+
+
+def run_in_thread(func, *args, **kwargs):
+    _local.in_pool = True
+    return func(*args, **kwargs)
+
+
+class PooledHasherMixin:
+    '''run the hashing of encode and verify in the pool'''
+
+    def encode(self, password, salt, *args, **kwargs):
+        return run_in_pool(super().encode, password, salt, *args, **kwargs)
+
+    def verify(self, password, encoded):
+        return run_in_pool(super().verify, password, encoded)
+
+
+class Argon2PasswordHasher(PooledHasherMixin, hashers.Argon2PasswordHasher):
+    @property
+    def time_cost(self):
+        return settings.PASSWORD_ARGON2_TIME_COST
+
+    @property
+    def memory_cost(self):
+        return settings.PASSWORD_ARGON2_MEMORY_COST
+
+    @property
+    def parallelism(self):
+        return settings.PASSWORD_ARGON2_PARALLELISM
+
+
+class PBKDF2PasswordHasher(PooledHasherMixin, hashers.PBKDF2PasswordHasher):
+    pass
@@ -0,0 +1,97 @@
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+from users.serializers import TokenObtainSerializer
+import os
+import statistics
+import time
+
+BENCHMARK_EMAIL = "benchmark-login@recipe.invalid"
+BENCHMARK_PASSWORD = "benchmark-password"
+HASHERS = {
+    "argon2": "users.hashers.Argon2PasswordHasher",
+    "pbkdf2": "users.hashers.PBKDF2PasswordHasher",
+}
+
+
+class Command(BaseCommand):
+    '''Django command to time logins, the password check and the tokens the
+    token view makes, with concurrent clients, and print the logins per second
+    and per core of each password hasher'''
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--hasher",
+            action="append",
+            dest="hashers",
+            choices=sorted(HASHERS),
+            help="hasher to time, can be repeated, by default all",
+        )
+        parser.add_argument("--logins", type=int, default=200)
+        parser.add_argument("--concurrency", type=int, default=os.cpu_count())
+        parser.add_argument(
+            "--pool-size",
+            type=int,
+            default=settings.PASSWORD_HASH_POOL_SIZE,
+            help="threads hashing the passwords, 0 to hash on the client threads",
+        )
+        parser.add_argument(
+            "--min-rate",
+            type=float,
+            help="fail when a hasher makes fewer logins per second and core",
+        )
+
+    def handle(self, *args, **options):
+        # the cores hashing at once
+        cores = min(
+            options["concurrency"], options["pool_size"] or os.cpu_count()
+        )
+        cores = min(cores, os.cpu_count())
+        for name in options["hashers"] or sorted(HASHERS):
+            hashers = [HASHERS[name]] + [
+                path for path in settings.PASSWORD_HASHERS if path != HASHERS[name]
+            ]
+            with override_settings(
+                PASSWORD_HASHERS=hashers,
+                PASSWORD_HASH_POOL_SIZE=options["pool_size"],
+            ):
+                rate = self.run(name, cores, options)
+            if options["min_rate"] is not None and rate < options["min_rate"]:
+                raise CommandError(
+                    f"{name}: {rate:.1f} logins/s per core is below "
+                    f"{options['min_rate']}"
+                )
+
+    def run(self, name, cores, options):
+        User = get_user_model()
+        user = User.objects.filter(email=BENCHMARK_EMAIL).first()
+        if user is None:
+            user = User.objects.create_user(email=BENCHMARK_EMAIL)
+        # hashed by the hasher timed, so the logins don't rehash it
+        user.set_password(BENCHMARK_PASSWORD)
+        user.save(update_fields=["password"])
+        data = {"email": BENCHMARK_EMAIL, "password": BENCHMARK_PASSWORD}
+
+        def login(i):
+            start = time.perf_counter()
+            try:
+                TokenObtainSerializer(data=data).is_valid(raise_exception=True)
+            finally:
+                connection.close()
+            return time.perf_counter() - start
+
+        with ThreadPoolExecutor(options["concurrency"]) as pool:
+            start = time.perf_counter()
+            times = list(pool.map(login, range(options["logins"])))
+            elapsed = time.perf_counter() - start
+        rate = len(times) / elapsed
+        self.stdout.write(
+            f"{name}: {len(times)} logins in {elapsed:.2f}s with "
+            f"{options['concurrency']} clients, p50 "
+            f"{statistics.median(times) * 1000:.1f} ms, {rate:.1f} logins/s, "
+            f"{rate / cores:.1f} logins/s per core on {cores}"
+        )
+        return rate / cores
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0007_customuser_following_delete_profile'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='fanout_on_read',
+            field=models.BooleanField(default=False),
+        ),
+    ]
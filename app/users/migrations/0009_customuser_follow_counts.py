@@ -0,0 +1,45 @@
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def count_follows(apps, schema_editor):
+    CustomUser = apps.get_model("users", "CustomUser")
+    Follow = CustomUser.following.through
+
+    def count(field):
+        return Coalesce(
+            Subquery(
+                Follow.objects.filter(**{field: OuterRef("pk")})
+                .values(field)
+                .annotate(count=Count("id"))
+                .values("count")
+            ),
+            Value(0),
+        )
+
+    CustomUser.objects.update(
+        followers_count=count("to_customuser"),
+        following_count=count("from_customuser"),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0008_customuser_fanout_on_read"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="customuser",
+            name="followers_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="customuser",
+            name="following_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(count_follows, migrations.RunPython.noop),
+    ]
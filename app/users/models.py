@@ -4,6 +4,7 @@ from django.contrib.auth.models import (
     BaseUserManager,
 )
 from django.db import models
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 
 
@@ -29,6 +30,29 @@ class CustomUserManager(BaseUserManager):
 
         return user
 
+    def update_follow_counts(self, pks):
+        """recount the followers and followed users of the users after their
+        follows changed, with one UPDATE counting their rows of the through
+        table, so a follow whose insert was ignored isn't counted twice"""
+        through = self.model.following.through
+
+        def count(field):
+            return Coalesce(
+                models.Subquery(
+                    through.objects.filter(**{field: models.OuterRef("pk")})
+                    .order_by()
+                    .values(field)
+                    .annotate(count=models.Count("*"))
+                    .values("count")
+                ),
+                0,
+            )
+
+        self.filter(pk__in=pks).update(
+            followers_count=count("to_customuser"),
+            following_count=count("from_customuser"),
+        )
+
 
 class CustomUser(AbstractBaseUser, PermissionsMixin):
     email = models.EmailField(unique=True)
@@ -38,6 +62,14 @@ class CustomUser(AbstractBaseUser, PermissionsMixin):
     following = models.ManyToManyField(
         "self", related_name="followers", symmetrical=False
     )
+    # kept by users.signals as follows are added and removed, so profiles
+    # never count the follows
+    followers_count = models.PositiveIntegerField(default=0)
+    following_count = models.PositiveIntegerField(default=0)
+    # set once the user has too many followers to add each new recipe to all
+    # of their timelines, the followers' feeds then read the user's recipes
+    # directly, see recipe.feed
+    fanout_on_read = models.BooleanField(default=False)
 
     objects = CustomUserManager()
 
@@ -0,0 +1,10 @@
+from django.conf import settings
+from rest_framework.pagination import CursorPagination
+
+
+class UserCursorPagination(CursorPagination):
+    '''paginate users by a cursor on their id'''
+
+    ordering = ("id",)
+    page_size_query_param = "page_size"
+    max_page_size = settings.MAX_PAGE_SIZE
@@ -1,14 +1,31 @@
 from django.contrib.auth import get_user_model, authenticate
 from rest_framework import serializers
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.serializers import (
+    TokenObtainPairSerializer,
+    TokenRefreshSerializer,
+)
+from rest_framework_simplejwt.tokens import RefreshToken
+from users.authentication import ISSUED_AT_CLAIM, is_revoked
+import time
 
 
 class CustomUserSerializer(serializers.ModelSerializer):
     class Meta:
         model = get_user_model()
-        fields = ["email", "name", "id", "password"]
+        fields = [
+            "email",
+            "name",
+            "id",
+            "password",
+            "followers_count",
+            "following_count",
+        ]
         extra_kwargs = {
             "password": {"write_only": True, "min_length": 8},
             "id": {"read_only": True},
+            "followers_count": {"read_only": True},
+            "following_count": {"read_only": True},
         }
 
     def create(self, validated_data):
@@ -21,3 +38,36 @@ class CustomUserSerializer(serializers.ModelSerializer):
             user.set_password(password)
             user.save()
         return user
+
+
+class PublicUserSerializer(serializers.ModelSerializer):
+    """what other users see of a user"""
+
+    class Meta:
+        model = get_user_model()
+        fields = ["id", "name", "followers_count", "following_count"]
+        read_only_fields = fields
+
+
+class TokenObtainSerializer(TokenObtainPairSerializer):
+    """add the claims users.authentication.ClaimsUser is built from, and the
+    time revocations are compared with, to the tokens, the access tokens
+    created from the refresh token copy them"""
+
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        token["email"] = user.email
+        token["is_active"] = user.is_active
+        token["is_staff"] = user.is_staff
+        token[ISSUED_AT_CLAIM] = time.time_ns()
+        return token
+
+
+class TokenRefreshWithRevokeSerializer(TokenRefreshSerializer):
+    """refuse to create access tokens from a revoked refresh token"""
+
+    def validate(self, attrs):
+        if is_revoked(RefreshToken(attrs["refresh"])):
+            raise InvalidToken("Token has been revoked")
+        return super().validate(attrs)
@@ -0,0 +1,50 @@
+from django.contrib.auth import get_user_model
+from django.db.models import F
+from django.db.models.signals import post_save, post_delete, pre_delete, m2m_changed
+from django.dispatch import receiver
+from users.authentication import revoke_tokens
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=User)
+def revoke_changed_user_tokens(sender, instance, created, **kwargs):
+    '''tokens carry the user's claims, so they are revoked when the user is
+    deactivated or changes the password'''
+    # set_password keeps the new raw password in _password until saved
+    password_changed = getattr(instance, "_password", None) is not None
+    if not created and (password_changed or not instance.is_active):
+        revoke_tokens(instance.id)
+
+
+@receiver(post_delete, sender=User)
+def revoke_deleted_user_tokens(sender, instance, **kwargs):
+    revoke_tokens(instance.id)
+
+
+@receiver(m2m_changed, sender=User.following.through)
+def update_follow_counts(sender, instance, action, reverse, pk_set, **kwargs):
+    '''recount the follows of both sides from the through table, concurrent
+    identical follows both send the ids but only one inserted them'''
+    if action == "pre_clear":
+        # clearing sends no ids, the ones followed or following are read
+        # before they go
+        related = instance.followers if reverse else instance.following
+        instance.uncounted_follow_ids = set(related.values_list("pk", flat=True))
+        return
+    if action == "post_clear":
+        pk_set = instance.uncounted_follow_ids
+    elif action not in ("post_add", "post_remove"):
+        return
+    User.objects.update_follow_counts({instance.pk, *pk_set})
+
+
+@receiver(pre_delete, sender=User)
+def update_follow_counts_of_deleted(sender, instance, **kwargs):
+    # the follows are deleted by the cascade, which sends no m2m_changed
+    User.objects.filter(followers=instance).update(
+        followers_count=F("followers_count") - 1
+    )
+    User.objects.filter(following=instance).update(
+        following_count=F("following_count") - 1
+    )
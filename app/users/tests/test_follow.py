@@ -0,0 +1,131 @@
+from rest_framework.test import APITestCase, APIClient
+from django.contrib.auth import get_user_model
+from django.db.models.signals import m2m_changed
+from django.urls import reverse
+from rest_framework import status
+
+User = get_user_model()
+
+
+def get_follow_url(pk):
+    return reverse("users:follow", args=[pk])
+
+
+def get_followers_url(pk):
+    return reverse("users:followers", args=[pk])
+
+
+def get_following_url(pk):
+    return reverse("users:following", args=[pk])
+
+
+def create_user(name):
+    return User.objects.create_user(
+        email=f"{name}@email.com", name=name, password="testing321"
+    )
+
+
+class FollowTests(APITestCase):
+    """test following and unfollowing users, with the follows counted on both
+    sides"""
+
+    def setUp(self):
+        self.user = create_user("testuser")
+        self.other = create_user("other")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def assertCounts(self, user, followers, following):
+        user.refresh_from_db()
+        self.assertEqual(
+            (user.followers_count, user.following_count), (followers, following)
+        )
+
+    def test_follow(self):
+        """test following a user counts it once, however often it's asked"""
+        for i in range(2):
+            r = self.client.post(get_follow_url(self.other.id))
+            self.assertEqual(r.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            r.data,
+            {"id": self.other.id, "name": "other", "followers_count": 1,
+             "following_count": 0},
+        )
+        self.assertCounts(self.user, 0, 1)
+        self.assertEqual(list(self.user.following.all()), [self.other])
+
+    def test_unfollow(self):
+        """test unfollowing a user, or one not followed, keeps the counts"""
+        self.client.post(get_follow_url(self.other.id))
+        for i in range(2):
+            r = self.client.delete(get_follow_url(self.other.id))
+            self.assertEqual(r.status_code, status.HTTP_200_OK)
+        self.assertEqual(r.data["followers_count"], 0)
+        self.assertCounts(self.user, 0, 0)
+        self.assertFalse(self.user.following.exists())
+
+    def test_follow_self_or_missing(self):
+        r = self.client.post(get_follow_url(self.user.id))
+        self.assertEqual(r.status_code, status.HTTP_400_BAD_REQUEST)
+        r = self.client.post(get_follow_url(self.other.id + 1))
+        self.assertEqual(r.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_counts_follow_orm_changes(self):
+        """test follows changed from either side of the relation are counted"""
+        third = create_user("third")
+        self.user.following.add(self.other, third)
+        self.other.followers.add(third)
+        self.assertCounts(self.user, 0, 2)
+        self.assertCounts(self.other, 2, 0)
+        self.other.followers.remove(self.user, self.other)
+        self.assertCounts(self.user, 0, 1)
+        self.assertCounts(self.other, 1, 0)
+        third.following.clear()
+        self.assertCounts(self.other, 0, 0)
+        self.assertCounts(third, 1, 0)
+        self.user.following.set([self.other])
+        third.delete()
+        self.assertCounts(self.user, 0, 1)
+
+    def test_concurrent_identical_follows(self):
+        """test a follow sent again by a concurrent request, whose insert was
+        ignored, isn't counted twice"""
+        self.user.following.add(self.other)
+        m2m_changed.send(
+            sender=User.following.through,
+            instance=self.user,
+            action="post_add",
+            reverse=False,
+            model=User,
+            pk_set={self.other.id},
+            using="default",
+        )
+        self.assertCounts(self.user, 0, 1)
+        self.assertCounts(self.other, 1, 0)
+
+    def test_profile_counts_without_aggregating(self):
+        """test the counts are read with the user"""
+        self.user.following.add(self.other)
+        self.user.refresh_from_db()
+        self.client.force_authenticate(self.user)
+        with self.assertNumQueries(0):
+            r = self.client.get(reverse("users:manage"))
+        self.assertEqual(r.data["following_count"], 1)
+
+    def test_list_followers_and_following(self):
+        """test the follows of a user are listed a page at a time"""
+        followers = [create_user(f"follower{i}") for i in range(3)]
+        self.other.followers.add(*followers)
+        self.other.following.add(self.user)
+        r = self.client.get(get_followers_url(self.other.id), {"page_size": 2})
+        self.assertEqual(r.status_code, status.HTTP_200_OK)
+        ids = [item["id"] for item in r.data["results"]]
+        r = self.client.get(r.data["next"])
+        ids += [item["id"] for item in r.data["results"]]
+        self.assertEqual(ids, [follower.id for follower in followers])
+        self.assertNotIn("email", r.data["results"][0])
+
+        r = self.client.get(get_following_url(self.other.id))
+        self.assertEqual([item["id"] for item in r.data["results"]], [self.user.id])
+        r = self.client.get(get_following_url(self.other.id + 10))
+        self.assertEqual(r.status_code, status.HTTP_404_NOT_FOUND)
@@ -1,5 +1,6 @@
 from rest_framework.test import APITestCase, APIClient
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.urls import reverse
 from rest_framework import status
 from freezegun import freeze_time
@@ -49,6 +50,10 @@ class CreateUserTests(APITestCase):
 class TokenTests(APITestCase):
     """test getting tokens and use them to authenticate with protected views"""
 
+    def setUp(self):
+        # tokens revoked by other tests' users are remembered in the cache
+        cache.clear()
+
     @freeze_time("2023-01-01 00:00:00")
     def test_token(self):
         # test creating a token pair successfully
@@ -0,0 +1,118 @@
+from rest_framework.test import APITestCase
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.urls import reverse
+from rest_framework import status
+from freezegun import freeze_time
+
+User = get_user_model()
+token_url = reverse("users:token_obtain_pair")
+refresh_url = reverse("users:token_refresh")
+tags_url = reverse("recipe:tag-list")
+
+
+class StatelessAuthTests(APITestCase):
+    """test recipe endpoints authenticate from the token claims without
+    loading the user from the DB"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            email="testuser@email.com", name="testuser", password="testing321"
+        )
+
+    def get_tokens(self):
+        payload = {"email": self.user.email, "password": "testing321"}
+        return self.client.post(token_url, payload).data
+
+    def get_tags(self, access):
+        return self.client.get(tags_url, HTTP_AUTHORIZATION=f"Bearer {access}")
+
+    def test_no_user_query(self):
+        """test listing tags with a token only queries the tags and their etag"""
+        access = self.get_tokens()["access"]
+        with self.assertNumQueries(2):
+            r = self.get_tags(access)
+        self.assertEqual(r.status_code, status.HTTP_200_OK)
+
+    def test_create_with_token_user(self):
+        """test objects created with a token are owned by the token's user"""
+        access = self.get_tokens()["access"]
+        r = self.client.post(
+            tags_url, {"name": "tag1"}, HTTP_AUTHORIZATION=f"Bearer {access}"
+        )
+        self.assertEqual(r.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.user.tag_set.get().name, "tag1")
+
+    @freeze_time("2023-01-01 00:00:00")
+    def test_password_change_revokes_tokens(self):
+        """test tokens issued before a password change are rejected, and new
+        tokens are accepted"""
+        tokens = self.get_tokens()
+        with freeze_time("2023-01-01 00:00:01"):
+            self.user.set_password("testing4321")
+            self.user.save()
+        with freeze_time("2023-01-01 00:00:02"):
+            r = self.get_tags(tokens["access"])
+            self.assertEqual(r.status_code, status.HTTP_401_UNAUTHORIZED)
+            r = self.client.post(refresh_url, {"refresh": tokens["refresh"]})
+            self.assertEqual(r.status_code, status.HTTP_401_UNAUTHORIZED)
+
+            payload = {"email": self.user.email, "password": "testing4321"}
+            access = self.client.post(token_url, payload).data["access"]
+            r = self.get_tags(access)
+            self.assertEqual(r.status_code, status.HTTP_200_OK)
+
+    def test_login_after_password_change_same_second(self):
+        """test tokens issued in the second of a password change, after it,
+        are accepted"""
+        with freeze_time("2023-01-01 00:00:00.400"):
+            self.user.set_password("testing4321")
+            self.user.save()
+        with freeze_time("2023-01-01 00:00:00.700"):
+            payload = {"email": self.user.email, "password": "testing4321"}
+            tokens = self.client.post(token_url, payload).data
+            r = self.get_tags(tokens["access"])
+            self.assertEqual(r.status_code, status.HTTP_200_OK)
+            r = self.client.post(refresh_url, {"refresh": tokens["refresh"]})
+            self.assertEqual(r.status_code, status.HTTP_200_OK)
+
+    def test_password_change_same_second_revokes_tokens(self):
+        """test tokens issued earlier in the second of a password change are
+        rejected"""
+        with freeze_time("2023-01-01 00:00:00.400"):
+            tokens = self.get_tokens()
+        with freeze_time("2023-01-01 00:00:00.700"):
+            self.user.set_password("testing4321")
+            self.user.save()
+            r = self.get_tags(tokens["access"])
+            self.assertEqual(r.status_code, status.HTTP_401_UNAUTHORIZED)
+            r = self.client.post(refresh_url, {"refresh": tokens["refresh"]})
+            self.assertEqual(r.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    @freeze_time("2023-01-01 00:00:00")
+    def test_deactivate_revokes_tokens(self):
+        """test tokens of a deactivated user are rejected"""
+        access = self.get_tokens()["access"]
+        with freeze_time("2023-01-01 00:00:01"):
+            self.user.is_active = False
+            self.user.save()
+            r = self.get_tags(access)
+        self.assertEqual(r.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    @freeze_time("2023-01-01 00:00:00")
+    def test_delete_revokes_tokens(self):
+        """test tokens of a deleted user are rejected"""
+        access = self.get_tokens()["access"]
+        with freeze_time("2023-01-01 00:00:01"):
+            self.user.delete()
+            r = self.get_tags(access)
+        self.assertEqual(r.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_profile_update_keeps_tokens(self):
+        """test saving the user without changing the password keeps tokens"""
+        access = self.get_tokens()["access"]
+        self.user.name = "updated_testuser"
+        self.user.save()
+        r = self.get_tags(access)
+        self.assertEqual(r.status_code, status.HTTP_200_OK)
@@ -0,0 +1,114 @@
+from django.contrib.auth import get_user_model, hashers
+from django.core.cache import cache
+from django.core.management import call_command, CommandError
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from unittest import mock
+from io import StringIO
+import threading
+
+User = get_user_model()
+token_url = reverse("users:token_obtain_pair")
+me_url = reverse("users:manage")
+
+
+class PasswordHasherTests(TestCase):
+    '''test passwords are hashed by the configured hasher and rehashed on
+    login when it changed'''
+
+    def setUp(self):
+        # the logins are throttled
+        cache.clear()
+
+    def create_user(self, hasher="default"):
+        user = User.objects.create_user(email="testuser@email.com")
+        user.password = hashers.make_password("testing321", hasher=hasher)
+        user.save()
+        return user
+
+    def login(self):
+        payload = {"email": "testuser@email.com", "password": "testing321"}
+        return self.client.post(token_url, payload)
+
+    def test_argon2_with_settings_costs(self):
+        user = User.objects.create_user(
+            email="testuser@email.com", password="testing321"
+        )
+        algorithm, params = user.password.split("$")[1:3]
+        self.assertEqual(algorithm, "argon2id")
+        self.assertEqual(params, "v=19")
+        self.assertIn("m=19456,t=2,p=1", user.password)
+        self.assertTrue(user.check_password("testing321"))
+
+    def test_pbkdf2_rehashed_on_login(self):
+        '''test a password hashed before argon2 still logs in and is rehashed,
+        without revoking the tokens of the login'''
+        user = self.create_user("pbkdf2_sha256")
+        r = self.login()
+        self.assertEqual(r.status_code, status.HTTP_200_OK)
+        user.refresh_from_db()
+        self.assertTrue(user.password.startswith("argon2$argon2id$"))
+        r = self.client.get(me_url, HTTP_AUTHORIZATION=f"Bearer {r.data['access']}")
+        self.assertEqual(r.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.login().status_code, status.HTTP_200_OK)
+
+    def test_rehashed_when_costs_change(self):
+        user = self.create_user()
+        with override_settings(PASSWORD_ARGON2_TIME_COST=3):
+            self.assertEqual(self.login().status_code, status.HTTP_200_OK)
+        user.refresh_from_db()
+        self.assertIn("t=3", user.password)
+
+    def test_wrong_password_not_rehashed(self):
+        user = self.create_user("pbkdf2_sha256")
+        r = self.client.post(
+            token_url, {"email": user.email, "password": "wrong-password"}
+        )
+        self.assertEqual(r.status_code, status.HTTP_401_UNAUTHORIZED)
+        user.refresh_from_db()
+        self.assertTrue(user.password.startswith("pbkdf2_sha256$"))
+
+    @override_settings(PASSWORD_HASH_POOL_SIZE=1)
+    def test_hashed_in_pool(self):
+        '''test the hashes are computed by the pool's threads, PBKDF2 calling
+        encode from verify in a pool of one'''
+        threads = []
+        encode = hashers.Argon2PasswordHasher.encode
+
+        def record(self, *args):
+            threads.append(threading.current_thread().name)
+            return encode(self, *args)
+
+        with mock.patch.object(hashers.Argon2PasswordHasher, "encode", record):
+            user = User.objects.create_user(
+                email="testuser@email.com", password="testing321"
+            )
+        self.assertTrue(threads[0].startswith("password-hash"))
+        self.assertTrue(user.check_password("testing321"))
+        user.password = hashers.make_password("testing321", hasher="pbkdf2_sha256")
+        self.assertTrue(user.check_password("testing321"))
+        self.assertFalse(user.check_password("wrong-password"))
+
+
+class BenchmarkLoginsTests(TransactionTestCase):
+    '''test the login benchmark, the logins are run by other threads'''
+
+    def test_benchmark_logins(self):
+        out = StringIO()
+        call_command("benchmark_logins", logins=4, concurrency=2, stdout=out)
+        output = out.getvalue()
+        self.assertIn("argon2: 4 logins", output)
+        self.assertIn("pbkdf2: 4 logins", output)
+        self.assertIn("logins/s per core", output)
+
+    def test_benchmark_logins_min_rate(self):
+        with self.assertRaises(CommandError):
+            call_command(
+                "benchmark_logins",
+                hashers=["argon2"],
+                logins=1,
+                pool_size=1,
+                min_rate=10**9,
+                stdout=StringIO(),
+            )
@@ -0,0 +1,136 @@
+from rest_framework.test import APITestCase, APIClient
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework import status
+from users.throttling import SlidingWindowThrottle
+from unittest import mock
+
+User = get_user_model()
+create_url = reverse("users:create")
+token_url = reverse("users:token_obtain_pair")
+refresh_url = reverse("users:token_refresh")
+tags_url = reverse("recipe:tag-list")
+
+
+def throttle_rates(**rates):
+    '''override some of the throttle rates'''
+    return override_settings(
+        REST_FRAMEWORK={
+            **settings.REST_FRAMEWORK,
+            "DEFAULT_THROTTLE_RATES": {
+                **settings.REST_FRAMEWORK["DEFAULT_THROTTLE_RATES"],
+                **rates,
+            },
+        }
+    )
+
+
+def frozen_timer(now):
+    return mock.patch.object(SlidingWindowThrottle, "timer", lambda self: now)
+
+
+class ThrottlingTests(APITestCase):
+    '''test the rate limits of the users and recipe endpoints'''
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            email="testuser@email.com", password="testing321"
+        )
+
+    def login(self, email="testuser@email.com", ip="10.0.0.1"):
+        payload = {"email": email, "password": "testing321"}
+        return self.client.post(token_url, payload, REMOTE_ADDR=ip)
+
+    @throttle_rates(login="3/min")
+    def test_login_per_ip(self):
+        for i in range(3):
+            r = self.login(email=f"user{i}@email.com")
+            self.assertEqual(r.status_code, status.HTTP_401_UNAUTHORIZED)
+        r = self.login()
+        self.assertEqual(r.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertIn("Retry-After", r)
+        self.assertEqual(self.login(ip="10.0.0.2").status_code, status.HTTP_200_OK)
+
+    @throttle_rates(login_email="2/min")
+    def test_login_per_email(self):
+        '''test the attempts for an email are counted from any IP, whatever
+        the case of the email, and rejected without querying the database'''
+        self.assertEqual(self.login(ip="10.0.0.1").status_code, status.HTTP_200_OK)
+        self.assertEqual(self.login(ip="10.0.0.2").status_code, status.HTTP_200_OK)
+        with self.assertNumQueries(0):
+            r = self.login(email="TestUser@email.com", ip="10.0.0.3")
+        self.assertEqual(r.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        other = self.login(email="other@email.com", ip="10.0.0.3")
+        self.assertEqual(other.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_login_body_not_an_object(self):
+        '''test a JSON body that isn't an object is rejected by the serializer
+        rather than the email throttle'''
+        payload = [{"email": "testuser@email.com", "password": "testing321"}]
+        r = self.client.post(token_url, payload, format="json")
+        self.assertEqual(r.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @throttle_rates(login_email="2/min")
+    def test_sliding_window(self):
+        '''test the requests of the previous window still count for the part
+        of it the sliding window covers'''
+        start = 1_700_000_040  # the start of a minute
+        with frozen_timer(start):
+            self.login()
+            self.login()
+        with frozen_timer(start + 59):
+            r = self.login()
+            self.assertEqual(r.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        with frozen_timer(start + 60):
+            r = self.login()
+            self.assertEqual(r.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+            self.assertEqual(r["Retry-After"], "30")
+        with frozen_timer(start + 90):
+            self.assertEqual(self.login().status_code, status.HTTP_200_OK)
+            r = self.login()
+            self.assertEqual(r.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        with frozen_timer(start + 180):
+            self.assertEqual(self.login().status_code, status.HTTP_200_OK)
+
+    @throttle_rates(token_refresh="1/min")
+    def test_token_refresh(self):
+        refresh = self.login().data["refresh"]
+        r = self.client.post(refresh_url, {"refresh": refresh})
+        self.assertEqual(r.status_code, status.HTTP_200_OK)
+        r = self.client.post(refresh_url, {"refresh": refresh})
+        self.assertEqual(r.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    @throttle_rates(signup="1/min")
+    def test_signup(self):
+        payload = {"email": "new@email.com", "password": "testing321", "name": "new"}
+        r = self.client.post(create_url, payload)
+        self.assertEqual(r.status_code, status.HTTP_201_CREATED)
+        r = self.client.post(create_url, {**payload, "email": "new2@email.com"})
+        self.assertEqual(r.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    @throttle_rates(recipe_write="2/min")
+    def test_recipe_writes(self):
+        '''test the writes of each user are limited, the reads aren't'''
+        client = APIClient()
+        client.force_authenticate(self.user)
+        for name in ("vegan", "winter"):
+            r = client.post(tags_url, {"name": name})
+            self.assertEqual(r.status_code, status.HTTP_201_CREATED)
+        r = client.post(tags_url, {"name": "summer"})
+        self.assertEqual(r.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(client.get(tags_url).status_code, status.HTTP_200_OK)
+        user2 = User.objects.create_user(email="testuser2@email.com")
+        client.force_authenticate(user2)
+        r = client.post(tags_url, {"name": "summer"})
+        self.assertEqual(r.status_code, status.HTTP_201_CREATED)
+
+    def test_recipe_writes_unlimited(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        for i in range(5):
+            r = client.post(tags_url, {"name": f"tag{i}"})
+            self.assertEqual(r.status_code, status.HTTP_201_CREATED)
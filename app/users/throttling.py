@@ -0,0 +1,136 @@
+'''Sliding window rate limits kept in the Django cache.
+
+DRF's SimpleRateThrottle keeps the time of each request of the window in a
+cached list, which grows with the rate and is read, filtered and written back
+whole on every request. These throttles keep a counter per fixed window
+instead, and estimate the requests of the sliding window ending now from the
+current window's count and the previous one's, weighted by how much of the
+previous window the sliding one still covers. A check is one get_many of two
+keys per ident and an add and incr, whatever the rate, and never queries the
+database, so rejecting a burst of logins costs no password hashing either.
+
+The rates are the DEFAULT_THROTTLE_RATES of REST_FRAMEWORK, a scope without a
+rate isn't throttled. The cache must be shared by the workers for the limits
+to hold across them, see app.settings_production.'''
+from collections.abc import Mapping
+from django.core.cache import cache
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.settings import api_settings
+from rest_framework.throttling import SimpleRateThrottle
+import hashlib
+import math
+
+
+class SlidingWindowThrottle(SimpleRateThrottle):
+    '''allow a request when, for each of its idents, fewer than the rate's
+    requests were made in the last duration'''
+
+    cache = cache
+    wait_seconds = None
+
+    def get_rate(self):
+        # read on each request rather than once when DRF is imported, so the
+        # rates follow the settings
+        return api_settings.DEFAULT_THROTTLE_RATES.get(self.scope)
+
+    def get_idents(self, request, view):
+        '''the clients the request counts for, by default its IP'''
+        return [self.get_ident(request)]
+
+    def get_cache_key(self, ident, window):
+        # idents can be emails, hashed so any is a valid cache key
+        digest = hashlib.sha256(str(ident).encode()).hexdigest()[:32]
+        return f"throttle:{self.scope}:{digest}:{window}"
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+        idents = [ident for ident in self.get_idents(request, view) if ident]
+        if not idents:
+            return True
+        now = self.timer()
+        window, elapsed = divmod(now, self.duration)
+        window = int(window)
+        keys = [
+            (self.get_cache_key(ident, window), self.get_cache_key(ident, window - 1))
+            for ident in idents
+        ]
+        counts = self.cache.get_many([key for pair in keys for key in pair])
+        # the share of the previous window still in the sliding one
+        weight = 1 - elapsed / self.duration
+        for current, previous in keys:
+            count = counts.get(current, 0) + counts.get(previous, 0) * weight
+            if count >= self.num_requests:
+                self.wait_seconds = self.get_wait(
+                    counts.get(current, 0), counts.get(previous, 0), elapsed
+                )
+                return False
+        for current, previous in keys:
+            # kept until the next window is done with it
+            self.cache.add(current, 0, timeout=2 * self.duration)
+            try:
+                self.cache.incr(current)
+            except ValueError:
+                # expired between the add and the incr
+                self.cache.set(current, 1, timeout=2 * self.duration)
+        return True
+
+    def get_wait(self, current, previous, elapsed):
+        '''the seconds until the weighted count is below the rate, when the
+        current window's requests alone reach it that's after the next window
+        starts'''
+        if current >= self.num_requests or not previous:
+            return self.duration - elapsed
+        # solve current + previous * (1 - (elapsed + wait) / duration) < rate
+        over = current + previous - self.num_requests + 1
+        return max(over / previous * self.duration - elapsed, 0)
+
+    def wait(self):
+        return None if self.wait_seconds is None else math.ceil(self.wait_seconds)
+
+
+class LoginRateThrottle(SlidingWindowThrottle):
+    '''token requests of an IP'''
+
+    scope = "login"
+
+
+class LoginEmailRateThrottle(SlidingWindowThrottle):
+    '''token requests for an email, from any IP, so a password can't be
+    guessed from many addresses'''
+
+    scope = "login_email"
+
+    def get_idents(self, request, view):
+        # the body can be any JSON, the serializer rejects it when it isn't an
+        # object
+        if not isinstance(request.data, Mapping):
+            return []
+        email = request.data.get("email")
+        return [email.strip().lower()] if isinstance(email, str) else []
+
+
+class TokenRefreshRateThrottle(SlidingWindowThrottle):
+    scope = "token_refresh"
+
+
+class SignupRateThrottle(SlidingWindowThrottle):
+    scope = "signup"
+
+
+class WriteRateThrottle(SlidingWindowThrottle):
+    '''the writes of a user to a view, in the throttle_scope of the view like
+    DRF's ScopedRateThrottle, reads aren't throttled'''
+
+    def allow_request(self, request, view):
+        if request.method in SAFE_METHODS:
+            return True
+        self.scope = getattr(view, "throttle_scope", None)
+        if not self.scope:
+            return True
+        self.rate = self.get_rate()
+        self.num_requests, self.duration = self.parse_rate(self.rate)
+        return super().allow_request(request, view)
+
+    def get_idents(self, request, view):
+        return [request.user.id] if request.user.is_authenticated else []
@@ -1,12 +1,38 @@
 from django.urls import path, include
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
-from users.views import CreateUserView, ManageUserView
+from users.views import CreateUserView, ManageUserView, FollowView, FollowListView
+from users.throttling import (
+    LoginRateThrottle,
+    LoginEmailRateThrottle,
+    TokenRefreshRateThrottle,
+)
 
 app_name = "users"
 
 urlpatterns = [
     path("create/", CreateUserView.as_view(), name="create"),
     path("me/", ManageUserView.as_view(), name="manage"),
-    path("token/", TokenObtainPairView.as_view(), name="token_obtain_pair"),
-    path("token/refresh/", TokenRefreshView.as_view(), name="token_refresh"),
+    path(
+        "token/",
+        TokenObtainPairView.as_view(
+            throttle_classes=[LoginRateThrottle, LoginEmailRateThrottle]
+        ),
+        name="token_obtain_pair",
+    ),
+    path(
+        "token/refresh/",
+        TokenRefreshView.as_view(throttle_classes=[TokenRefreshRateThrottle]),
+        name="token_refresh",
+    ),
+    path("users/<int:pk>/follow/", FollowView.as_view(), name="follow"),
+    path(
+        "users/<int:pk>/followers/",
+        FollowListView.as_view(relation="followers"),
+        name="followers",
+    ),
+    path(
+        "users/<int:pk>/following/",
+        FollowListView.as_view(relation="following"),
+        name="following",
+    ),
 ]
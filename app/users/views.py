@@ -1,5 +1,12 @@
-from rest_framework import generics
-from users.serializers import CustomUserSerializer
+from django.contrib.auth import get_user_model
+from django.shortcuts import get_object_or_404
+from rest_framework import generics, status
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+from users.serializers import CustomUserSerializer, PublicUserSerializer
+from users.pagination import UserCursorPagination
+from users.authentication import StatelessJWTAuthentication
+from users.throttling import SignupRateThrottle
 from rest_framework.permissions import IsAuthenticated
 from rest_framework_simplejwt.authentication import JWTAuthentication
 
@@ -8,6 +15,7 @@ class CreateUserView(generics.CreateAPIView):
     """create a new user"""
 
     serializer_class = CustomUserSerializer
+    throttle_classes = [SignupRateThrottle]
 
 
 class ManageUserView(generics.RetrieveUpdateDestroyAPIView):
@@ -19,3 +27,49 @@ class ManageUserView(generics.RetrieveUpdateDestroyAPIView):
 
     def get_object(self):
         return self.request.user
+
+
+class FollowView(generics.GenericAPIView):
+    """follow (POST) or unfollow (DELETE) a user, both answer with the
+    user's profile and are idempotent"""
+
+    serializer_class = PublicUserSerializer
+    permission_classes = (IsAuthenticated,)
+    authentication_classes = (StatelessJWTAuthentication,)
+    queryset = get_user_model().objects.filter(is_active=True)
+
+    def post(self, request, pk):
+        if pk == request.user.id:
+            raise ValidationError({"detail": "You can't follow yourself."})
+        user = self.get_object()
+        # counted by users.signals
+        user.followers.add(request.user.id)
+        return self.get_response(user)
+
+    def delete(self, request, pk):
+        user = self.get_object()
+        user.followers.remove(request.user.id)
+        return self.get_response(user)
+
+    def get_response(self, user):
+        user.refresh_from_db(fields=["followers_count", "following_count"])
+        return Response(self.get_serializer(user).data, status.HTTP_200_OK)
+
+
+class FollowListView(generics.ListAPIView):
+    """the followers or the users followed of a user, by a cursor on their id"""
+
+    serializer_class = PublicUserSerializer
+    permission_classes = (IsAuthenticated,)
+    authentication_classes = (StatelessJWTAuthentication,)
+    pagination_class = UserCursorPagination
+    # "followers" lists who follows the user, "following" whom the user follows
+    relation = None
+
+    def get_queryset(self):
+        User = get_user_model()
+        user = get_object_or_404(User, pk=self.kwargs["pk"])
+        lookup = "following" if self.relation == "followers" else "followers"
+        return User.objects.filter(**{lookup: user}).only(
+            *PublicUserSerializer.Meta.fields
+        )